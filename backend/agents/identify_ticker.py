@@ -1,9 +1,17 @@
 import re
 import nltk
-import requests
+import time
 import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from nltk.tokenize import word_tokenize
 from utils.nlp import extract_timeframe
+from api import http_client
+from utils.singleflight import single_flight
+from utils.symbol_index import get_symbol_index
+from utils.cache_backend import make_cache
+from utils.rate_limiter import get_limiter
+from utils import deadline as request_deadline
+from utils.metrics import STAGE_SECONDS
 from dotenv import load_dotenv
 import os
 
@@ -11,6 +19,19 @@ import os
 load_dotenv()
 API_KEY = os.getenv("FMP_API_KEY")
 
+# Ticker validation cache settings
+TICKER_CACHE_SIZE = int(os.getenv("TICKER_CACHE_SIZE", "4096"))
+VALID_TICKER_TTL = float(os.getenv("VALID_TICKER_TTL", "86400"))
+INVALID_TICKER_TTL = float(os.getenv("INVALID_TICKER_TTL", "21600"))
+
+# Concurrent phrase search settings
+PHRASE_SEARCH_MAX_IN_FLIGHT = int(os.getenv("PHRASE_SEARCH_MAX_IN_FLIGHT", "4"))
+PHRASE_SEARCH_BUDGET = float(os.getenv("PHRASE_SEARCH_BUDGET", "8"))
+PHRASE_SEARCH_WORKERS = int(os.getenv("PHRASE_SEARCH_WORKERS", "16"))
+
+# Uppercase words often found in queries that are not tickers
+COMMON_NON_TICKERS = {"I", "CEO", "CFO", "YTD"}
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -27,76 +48,110 @@ class IdentifyTickerAgent:
         self.ticker_pattern = re.compile(r'[$]?([A-Z]{1,5})\b')
         self.skip_words = {"why", "how", "what", "when", "the", "a", "an", "is", "are", "was", "were", "in", "on", "at", "to", "for", "with", "by", "about", "of"}
         self.stock_keywords = {"stock", "shares", "share", "price"}
-        self.common_companies = {
-            'apple': 'AAPL',
-            'tesla': 'TSLA',
-            'microsoft': 'MSFT',
-            'amazon': 'AMZN',
-            'google': 'GOOGL',
-            'alphabet': 'GOOGL',
-            'meta': 'META',
-            'facebook': 'META',
-            'netflix': 'NFLX',
-            'nvidia': 'NVDA',
-            'amd': 'AMD',
-            'intel': 'INTC',
-            'ibm': 'IBM',
-            'oracle': 'ORCL',
-            'cisco': 'CSCO',
-            'walmart': 'WMT',
-            'disney': 'DIS',
-            'coca-cola': 'KO',
-            'coke': 'KO',
-            'pepsi': 'PEP',
-            'nike': 'NKE',
-            'mcdonalds': 'MCD',
-            'starbucks': 'SBUX',
-            'boeing': 'BA'
-        }
-        self.company_names = {
-            'AAPL': 'Apple Inc.',
-            'TSLA': 'Tesla, Inc.',
-            'MSFT': 'Microsoft Corporation',
-            'AMZN': 'Amazon.com, Inc.',
-            'GOOGL': 'Alphabet Inc.',
-            'META': 'Meta Platforms, Inc.',
-            'NFLX': 'Netflix, Inc.',
-            'NVDA': 'NVIDIA Corporation',
-            'AMD': 'Advanced Micro Devices, Inc.',
-            'INTC': 'Intel Corporation',
-            'IBM': 'International Business Machines',
-            'ORCL': 'Oracle Corporation',
-            'CSCO': 'Cisco Systems, Inc.',
-            'WMT': 'Walmart Inc.',
-            'DIS': 'The Walt Disney Company',
-            'KO': 'The Coca-Cola Company',
-            'PEP': 'PepsiCo, Inc.',
-            'NKE': 'Nike, Inc.',
-            'MCD': "McDonald's Corporation",
-            'SBUX': 'Starbucks Corporation',
-            'BA': 'The Boeing Company'
-        }
+        # Local company-name index; resolves most queries without a network call
+        self.symbol_index = get_symbol_index()
+        # Ticker validation results: known tickers and words known not to be tickers
+        self.valid_tickers = make_cache("valid_tickers", maxsize=TICKER_CACHE_SIZE, ttl=VALID_TICKER_TTL)
+        self.invalid_tickers = make_cache("invalid_tickers", maxsize=TICKER_CACHE_SIZE, ttl=INVALID_TICKER_TTL)
+        # Company-name search results, including names that matched nothing
+        self.search_results = make_cache("ticker_search", maxsize=TICKER_CACHE_SIZE, ttl=VALID_TICKER_TTL)
+        self.seed_validation_cache(invalid=COMMON_NON_TICKERS)
+        self.phrase_executor = ThreadPoolExecutor(
+            max_workers=PHRASE_SEARCH_WORKERS,
+            thread_name_prefix="phrase-search"
+        )
+        
+    def seed_validation_cache(self, valid=None, invalid=()):
+        """
+        Pre-populate the ticker validation cache.
+        
+        Args:
+            valid (dict): Ticker symbol -> company name for known tickers
+            invalid (iterable): Words known not to be tickers
+        """
+        for ticker, company_name in (valid or {}).items():
+            self.valid_tickers.set(ticker, company_name)
+        for word in invalid:
+            self.invalid_tickers.set(word, True)
+    
+    @single_flight("fmp_profile")
+    def validate_ticker(self, ticker):
+        """
+        Check that a directly mentioned ticker exists, with positive and negative caching.
+        
+        Args:
+            ticker (str): Candidate ticker symbol
+            
+        Returns:
+            str: The company name if the ticker is valid, otherwise None
+        """
+        company_name = self.valid_tickers.get(ticker)
+        if company_name:
+            return company_name
+        if self.invalid_tickers.get(ticker):
+            return None
+        
+        # Listed symbols are known to be valid without asking the API
+        company_name = self.symbol_index.company_name(ticker)
+        if company_name:
+            self.valid_tickers.set(ticker, company_name)
+            return company_name
+        
+        # Validate the ticker using the API; a rate-limited check is inconclusive, so nothing is cached
+        if not get_limiter("fmp").acquire():
+            logger.warning(f"FMP rate limit reached, skipping validation of {ticker}")
+            return None
         
+        try:
+            url = f"https://financialmodelingprep.com/api/v3/profile/{ticker}?apikey={self.api_key}"
+            response = http_client.get(url, timeout=10)
+            if response.status_code != 200:
+                # Not conclusive, so don't cache
+                logger.error(f"API error {response.status_code} validating ticker {ticker}")
+                return None
+            
+            data = response.json()
+            if data:
+                company_name = data[0].get("companyName") or f"{ticker} Inc."
+                self.valid_tickers.set(ticker, company_name)
+                return company_name
+            
+            self.invalid_tickers.set(ticker, True)
+        except Exception as e:
+            logger.error(f"Error validating ticker {ticker}: {str(e)}")
+        return None
+    
+    @single_flight("fmp_search_ticker")
     def get_ticker_from_api(self, company_name):
         """Fetch ticker using the Financial Modeling Prep search endpoint."""
         try:
-            # Check if it's in our common companies first
-            if company_name.lower() in self.common_companies:
-                ticker = self.common_companies[company_name.lower()]
-                return ticker, f"{company_name.title()}, Inc."
+            # Check the local symbol index first
+            ticker = self.symbol_index.lookup(company_name)
+            if ticker:
+                return ticker, self.symbol_index.company_name(ticker)
+            
+            cached = self.search_results.get(company_name.lower())
+            if cached is not None:
+                return tuple(cached) if cached else (None, None)
                 
+            if not get_limiter("fmp").acquire():
+                logger.warning(f"FMP rate limit reached, skipping search for {company_name}")
+                return None, None
+            
             # Search across multiple exchanges, not just NASDAQ
             url = f"https://financialmodelingprep.com/api/v3/search?query={company_name}&limit=5&apikey={self.api_key}"
             logger.info(f"Querying API for: {company_name}")
-            response = requests.get(url, timeout=10)
+            response = http_client.get(url, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
                 if data:
                     logger.info(f"API returned data for {company_name}: {data[0]['symbol']}")
+                    self.search_results.set(company_name.lower(), [data[0]["symbol"], data[0]["name"]])
                     return data[0]["symbol"], data[0]["name"]
                 else:
                     logger.warning(f"API returned empty data for {company_name}")
+                    self.search_results.set(company_name.lower(), [], ttl=INVALID_TICKER_TTL)
             else:
                 logger.error(f"API error {response.status_code} for {company_name}")
                 
@@ -105,6 +160,71 @@ class IdentifyTickerAgent:
             
         return None, None
 
+    def _resolve_phrases(self, phrases):
+        """
+        Look up candidate phrases concurrently and return the highest-priority hit.
+        
+        Phrases are given in priority order. At most PHRASE_SEARCH_MAX_IN_FLIGHT
+        lookups run at once; once a phrase resolves and every phrase ahead of it
+        has missed, it wins and the remaining lookups are abandoned. The whole
+        search is bounded by PHRASE_SEARCH_BUDGET seconds, or by the enclosing
+        deadline if that is sooner.
+        
+        Args:
+            phrases (list): Candidate company-name phrases, highest priority first
+            
+        Returns:
+            tuple: (ticker, company_name), or (None, None) if nothing resolved
+        """
+        budget = PHRASE_SEARCH_BUDGET
+        left = request_deadline.remaining()
+        if left is not None:
+            budget = min(budget, max(left, 0))
+        deadline = time.monotonic() + budget
+        lookup = request_deadline.bind(self.get_ticker_from_api)
+        results = {}
+        in_flight = {}
+        next_index = 0
+        
+        while True:
+            # Winner: the first phrase that hit, once everything ahead of it has missed
+            for index in range(len(phrases)):
+                if index not in results:
+                    break
+                if results[index][0]:
+                    for future in in_flight:
+                        future.cancel()
+                    return results[index]
+            
+            best_hit = min((i for i, result in results.items() if result[0]), default=None)
+            
+            # Keep the pipeline full, but never start phrases ranked below a known hit
+            while len(in_flight) < PHRASE_SEARCH_MAX_IN_FLIGHT and next_index < len(phrases):
+                if best_hit is not None and next_index > best_hit:
+                    break
+                future = self.phrase_executor.submit(lookup, phrases[next_index])
+                in_flight[future] = next_index
+                next_index += 1
+            
+            if not in_flight:
+                return (None, None)
+            
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.warning(f"Phrase search budget exhausted with {len(in_flight)} lookups outstanding")
+                for future in in_flight:
+                    future.cancel()
+                return results[best_hit] if best_hit is not None else (None, None)
+            
+            done, _ = wait(in_flight, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = in_flight.pop(future)
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    logger.error(f"Error resolving phrase '{phrases[index]}': {str(e)}")
+                    results[index] = (None, None)
+    
     def _extract_timeframe(self, query_text):
         """
         Extract timeframe from query text.
@@ -188,6 +308,7 @@ class IdentifyTickerAgent:
     
         return 'today'
 
+    @STAGE_SECONDS.time("identify")
     def identify(self, query):
         """
         Identify ticker symbol from the query.
@@ -216,22 +337,28 @@ class IdentifyTickerAgent:
         if ticker_matches:
             ticker = ticker_matches[0]
             if ticker.lower() not in self.skip_words:
-                # Validate the ticker using the API
-                try:
-                    url = f"https://financialmodelingprep.com/api/v3/profile/{ticker}?apikey={self.api_key}"
-                    response = requests.get(url, timeout=10)
-                    if response.status_code == 200 and response.json():
-                        company_data = response.json()[0]
-                        timeframe = self._extract_timeframe(query_lower)
-                        logger.info(f"Found ticker via direct mention: {ticker}")
-                        return {
-                            "ticker": ticker,
-                            "company_name": company_data.get("companyName", f"{ticker} Inc."),
-                            "timeframe": timeframe,
-                            "confidence": 0.9
-                        }
-                except Exception as e:
-                    logger.error(f"Error validating ticker {ticker}: {str(e)}")
+                company_name = self.validate_ticker(ticker)
+                if company_name:
+                    timeframe = self._extract_timeframe(query_lower)
+                    logger.info(f"Found ticker via direct mention: {ticker}")
+                    return {
+                        "ticker": ticker,
+                        "company_name": company_name,
+                        "timeframe": timeframe,
+                        "confidence": 0.9
+                    }
+        
+        # Check for known company names and aliases anywhere in the query
+        match = self.symbol_index.best_match(query_lower)
+        if match:
+            timeframe = self._extract_timeframe(query_lower)
+            logger.info(f"Found ticker via symbol index match: {match['symbol']}")
+            return {
+                "ticker": match["symbol"], 
+                "company_name": match["company_name"],
+                "timeframe": timeframe,
+                "confidence": 0.9
+            }
         
         # Extract potential company names
         tokens = word_tokenize(query_lower)
@@ -239,22 +366,11 @@ class IdentifyTickerAgent:
         # Remove stock keywords to help isolate company name
         cleaned_tokens = [t for t in tokens if t not in self.stock_keywords]
         
-        # Check for common company names directly in the query
-        for company, ticker in self.common_companies.items():
-            if company in query_lower:
-                timeframe = self._extract_timeframe(query_lower)
-                logger.info(f"Found ticker via common company match: {ticker}")
-                return {
-                    "ticker": ticker, 
-                    "company_name": f"{company.title()}, Inc.",
-                    "timeframe": timeframe,
-                    "confidence": 0.9
-                }
-        
-        # Try multi-word company names 
+        # Try multi-word company names, longest phrases first
         n = len(cleaned_tokens)
         max_phrase_length = min(5, n) 
         
+        phrases = []
         for phrase_length in range(max_phrase_length, 0, -1):
             for i in range(n - phrase_length + 1):
                 phrase_tokens = cleaned_tokens[i:i+phrase_length]
@@ -262,23 +378,32 @@ class IdentifyTickerAgent:
                 # Skip if phrase consists mainly of skip words
                 if sum(1 for t in phrase_tokens if t not in self.skip_words) <= 1:
                     continue
-                    
-                phrase = " ".join(phrase_tokens)
-                ticker, full_name = self.get_ticker_from_api(phrase)
                 
-                if ticker:
-                    timeframe = self._extract_timeframe(query_lower)
-                    logger.info(f"Found ticker via API phrase search: {ticker}")
-                    return {
-                        "ticker": ticker,
-                        "company_name": full_name,
-                        "timeframe": timeframe,
-                        "confidence": 0.95
-                    }
-
-        # Fallback - try the whole query without stock keywords
-        clean_query = ' '.join([t for t in tokens if t not in self.stock_keywords])
-        ticker, full_name = self.get_ticker_from_api(clean_query)
+                phrase = " ".join(phrase_tokens)
+                if phrase not in phrases:
+                    phrases.append(phrase)
+        
+        # The phrase search and the whole-query fallback share one budget, so HTTP
+        # timeouts inside are clamped to what is left of it
+        with request_deadline.deadline_scope(PHRASE_SEARCH_BUDGET):
+            ticker, full_name = self._resolve_phrases(phrases)
+            if ticker:
+                timeframe = self._extract_timeframe(query_lower)
+                logger.info(f"Found ticker via API phrase search: {ticker}")
+                return {
+                    "ticker": ticker,
+                    "company_name": full_name,
+                    "timeframe": timeframe,
+                    "confidence": 0.95
+                }
+            
+            # Fallback - try the whole query without stock keywords
+            clean_query = ' '.join([t for t in tokens if t not in self.stock_keywords])
+            if request_deadline.has_time_for(request_deadline.MIN_CALL_TIMEOUT):
+                ticker, full_name = self.get_ticker_from_api(clean_query)
+            else:
+                logger.warning("Phrase search budget spent, skipping whole query fallback")
+        
         if ticker:
             timeframe = self._extract_timeframe(query_lower)
             logger.info(f"Found ticker via whole query fallback: {ticker}")
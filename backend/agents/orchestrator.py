@@ -3,12 +3,26 @@ from agents.ticker_news import TickerNewsAgent
 from agents.ticker_price import TickerPriceAgent
 from agents.ticker_price_change import TickerPriceChangeAgent
 from agents.ticker_analysis import TickerAnalysisAgent
+from utils.metrics import STAGE_SECONDS
+from utils import deadline as request_deadline
+from utils.deadline import deadline_scope
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
+import functools
 import logging
+import os
+import time
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Default number of batch items worked on at once
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+# Most time one identification, fetch or analysis of a batch may take
+BATCH_ITEM_DEADLINE_SECONDS = float(os.getenv("BATCH_ITEM_DEADLINE_SECONDS", "30"))
+
 class StockOrchestratorAgent:
     """
     Main orchestrator agent that coordinates the subagents to process stock queries.
@@ -20,6 +34,11 @@ class StockOrchestratorAgent:
         self.ticker_price_agent = TickerPriceAgent()
         self.ticker_price_change_agent = TickerPriceChangeAgent()
         self.ticker_analysis_agent = TickerAnalysisAgent()
+        # Thread pool used by the async path to run the blocking agent calls
+        self.executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("ORCHESTRATOR_MAX_WORKERS", "32")),
+            thread_name_prefix="orchestrator"
+        )
     
     def process_query(self, query_text):
         """
@@ -31,22 +50,7 @@ class StockOrchestratorAgent:
         Returns:
             dict: A dictionary containing the answer and metadata
         """
-        # Default response for errors
-        default_response = {
-            "answer": "Unable to analyze the stock due to insufficient data.",
-            "metadata": {
-                "ticker": None,
-                "company_name": None,
-                "current_price": None,
-                "price_change": {"success": False, "error": "Processing error"},
-                "news": [],
-                "analysis": {
-                    "summary": "Analysis unavailable",
-                    "detailed_analysis": "",
-                    "details": {}
-                }
-            }
-        }
+        default_response = self._default_response()
         
         try:
             # Parse query to identify ticker symbol and query intent
@@ -63,95 +67,369 @@ class StockOrchestratorAgent:
             logger.info(f"Processing query for ticker: {ticker}, timeframe: {timeframe}")
             
             # Collect data based on identified ticker - with error handling
-            try:
-                news_data = self.ticker_news_agent.get_news(ticker)
-            except Exception as e:
-                logger.error(f"Error getting news for {ticker}: {str(e)}")
-                news_data = {"headlines": [], "success": False}
+            news_data = self._collect_news(ticker)
+            price_data = self._collect_price(ticker)
+            price_change, series = self._collect_price_change(ticker, timeframe)
             
-            try:
-                price_data = self.ticker_price_agent.get_price(ticker)
-                # Ensure we always have a valid price value to display
-                if not price_data.get("price"):
-                    logger.warning(f"No price returned for {ticker}, using fallback method")
-                    # Try alternative price source if primary failed
-                    alt_price_data = self._get_fallback_price(ticker)
-                    if alt_price_data and alt_price_data.get("price"):
-                        price_data = alt_price_data
-            except Exception as e:
-                logger.error(f"Error getting price for {ticker}: {str(e)}")
-                price_data = {"price": 0.0, "success": False}
+            # Generate comprehensive analysis
+            analysis = self._run_analysis(ticker, query_text, news_data, price_data, price_change, timeframe, series)
             
-            try:
-                price_change = self.ticker_price_change_agent.get_price_change(ticker, timeframe)
-            except Exception as e:
-                logger.error(f"Error getting price change for {ticker}: {str(e)}")
-                price_change = {
-                    "change": None, 
-                    "change_percent": None, 
-                    "timeframe": timeframe,
-                    "success": False,
-                    "error": str(e)
-                }
+            return self._build_response(ticker_info, news_data, price_data, price_change, analysis)
             
-            # Generate comprehensive analysis
-            try:
-                analysis = self.ticker_analysis_agent.analyze(
-                    ticker=ticker,
-                    query=query_text,
-                    news=news_data,
-                    price=price_data,
-                    price_change=price_change,
-                    timeframe=timeframe
-                )
-            except Exception as e:
-                logger.error(f"Error analyzing {ticker}: {str(e)}")
-                analysis = {
-                    "summary": "Unable to generate analysis", 
-                    "detailed_analysis": "", 
-                    "details": {}, 
-                    "success": False
-                }
+        except Exception as e:
+            logger.error(f"Error in orchestrator: {str(e)}")
+            return default_response
+    
+    async def process_query_async(self, query_text):
+        """
+        Process a natural language query without blocking the event loop.
+        
+        News, price and price change are fetched concurrently, so the latency
+        of the data-collection phase is that of the slowest upstream call
+        rather than the sum of all of them.
+        
+        Args:
+            query_text (str): The natural language query text
             
-            # Add company name if missing
-            if "company_name" not in price_data:
-                price_data["company_name"] = ticker_info.get("company_name", f"{ticker} Inc.")
+        Returns:
+            dict: A dictionary containing the answer and metadata
+        """
+        default_response = self._default_response()
+        
+        try:
+            ticker_info = await self._run_in_thread(self.identify_ticker_agent.identify, query_text)
+            ticker = ticker_info.get("ticker")
+            timeframe = ticker_info.get("timeframe", "today")
             
-            return {
-                "answer": analysis.get("summary", "Analysis unavailable"),
-                "metadata": {
-                    "ticker": ticker,
-                    "company_name": price_data.get("company_name", ticker_info.get("company_name")),
-                    "current_price": price_data.get("price"),  # This should now be more reliable
-                    "price_change": price_change,
-                    "news": news_data.get("headlines", []),
-                    "analysis": {
-                        "summary": analysis.get("summary", "No analysis available"),
-                        "detailed_analysis": analysis.get("detailed_analysis", ""),
-                        "details": analysis.get("details", {})
-                    }
-                }
-            }
+            if not ticker:
+                logger.warning("No ticker identified for query: %s", query_text)
+                default_response["metadata"]["error"] = "No ticker identified"
+                return default_response
+            
+            logger.info(f"Processing query for ticker: {ticker}, timeframe: {timeframe}")
+            
+            # Fan out the independent data fetches
+            news_data, price_data, (price_change, series) = await asyncio.gather(
+                self._run_in_thread(self._collect_news, ticker),
+                self._run_in_thread(self._collect_price, ticker),
+                self._run_in_thread(self._collect_price_change, ticker, timeframe),
+            )
+            
+            analysis = await self._run_in_thread(
+                self._run_analysis, ticker, query_text, news_data, price_data, price_change, timeframe, series
+            )
+            
+            return self._build_response(ticker_info, news_data, price_data, price_change, analysis)
             
         except Exception as e:
             logger.error(f"Error in orchestrator: {str(e)}")
             return default_response
+    
+    async def process_batch_async(self, queries, max_concurrency=BATCH_MAX_CONCURRENCY,
+                                  deadline_seconds=BATCH_ITEM_DEADLINE_SECONDS):
+        """
+        Process many queries, sharing the upstream data between queries about the same ticker.
+        
+        All tickers are identified first; then each distinct ticker's news and
+        price are fetched once, its price changes are computed once per
+        timeframe from one history load, and the analyses run with at most
+        max_concurrency items in flight.
+        
+        The request deadline bounds the whole batch. Each identification, fetch
+        and analysis gets deadline_seconds from when it starts, or whatever the
+        batch has left if that is less; work the batch has no time left for is
+        not started, and its items are answered with an error.
+        
+        Args:
+            queries (list): Natural language query texts
+            max_concurrency (int): Maximum concurrent fetches and analyses
+            deadline_seconds (float): Time budget of each piece of work
+            
+        Returns:
+            list: One dict per query, in order, with the query, its result
+                (as process_query returns it, or None) and an error message (or None)
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        
+        async def bounded(func, *args):
+            async with semaphore:
+                with deadline_scope(deadline_seconds):
+                    left = request_deadline.remaining()
+                    if left <= 0:
+                        raise request_deadline.DeadlineExceeded("Batch deadline exceeded")
+                    try:
+                        # Stop waiting at the deadline even if the call ignores it
+                        return await asyncio.wait_for(self._run_in_thread(func, *args), timeout=left)
+                    except asyncio.TimeoutError:
+                        raise request_deadline.DeadlineExceeded("Batch deadline exceeded")
+        
+        # Identify every ticker first
+        identified = await asyncio.gather(
+            *(bounded(self.identify_ticker_agent.identify, query) for query in queries),
+            return_exceptions=True
+        )
+        
+        items = []
+        timeframes = {}
+        for query, ticker_info in zip(queries, identified):
+            item = {"query": query, "result": None, "error": None, "ticker_info": None}
+            if isinstance(ticker_info, Exception):
+                logger.error(f"Error identifying ticker for batch query: {str(ticker_info)}")
+                item["error"] = str(ticker_info)
+            elif not ticker_info.get("ticker"):
+                item["error"] = "No ticker identified"
+            else:
+                item["ticker_info"] = ticker_info
+                timeframes.setdefault(ticker_info["ticker"], set()).add(ticker_info.get("timeframe", "today"))
+            items.append(item)
+        
+        logger.info(f"Batch of {len(queries)} queries covers {len(timeframes)} distinct tickers")
+        
+        # Fetch each distinct ticker's data exactly once
+        def collect_price_changes(ticker, ticker_timeframes):
+            # One history load serves every timeframe and the analyses
+            series = self._collect_series(ticker, ticker_timeframes)
+            return {
+                timeframe: self._collect_price_change(ticker, timeframe, series)
+                for timeframe in sorted(ticker_timeframes)
+            }
+        
+        tickers = list(timeframes)
+        news, prices, price_changes = await asyncio.gather(
+            asyncio.gather(*(bounded(self._collect_news, ticker) for ticker in tickers), return_exceptions=True),
+            asyncio.gather(*(bounded(self._collect_price, ticker) for ticker in tickers), return_exceptions=True),
+            asyncio.gather(*(bounded(collect_price_changes, ticker, timeframes[ticker]) for ticker in tickers),
+                           return_exceptions=True),
+        )
+        news = dict(zip(tickers, news))
+        prices = dict(zip(tickers, prices))
+        price_changes = dict(zip(tickers, price_changes))
+        
+        async def analyze(item):
+            ticker_info = item["ticker_info"]
+            ticker = ticker_info["ticker"]
+            timeframe = ticker_info.get("timeframe", "today")
+            failed = next((data for data in (news[ticker], prices[ticker], price_changes[ticker])
+                           if isinstance(data, Exception)), None)
+            if failed is not None:
+                logger.error(f"Error fetching data for batch query for {ticker}: {str(failed)}")
+                item["error"] = str(failed)
+                return
+            # Each item gets its own copies since _build_response annotates them
+            news_data = dict(news[ticker])
+            price_data = dict(prices[ticker])
+            price_change, series = price_changes[ticker][timeframe]
+            price_change = dict(price_change)
+            try:
+                analysis = await bounded(
+                    self._run_analysis, ticker, item["query"], news_data, price_data, price_change, timeframe, series
+                )
+                item["result"] = self._build_response(ticker_info, news_data, price_data, price_change, analysis)
+            except Exception as e:
+                logger.error(f"Error processing batch query for {ticker}: {str(e)}")
+                item["error"] = str(e)
+        
+        await asyncio.gather(*(analyze(item) for item in items if item["ticker_info"]))
+        
+        return [{"query": item["query"], "result": item["result"], "error": item["error"]} for item in items]
+    
+    async def stream_query_async(self, query_text):
+        """
+        Process a query, yielding each piece of the answer as soon as it is available.
+        
+        Args:
+            query_text (str): The natural language query text
+            
+        Yields:
+            tuple: (event, data) pairs in order: "ticker", then "price", "price_change"
+                and "news" as each arrives, then "summary_token" and
+                "detailed_analysis_token" while the LLM writes, then "analysis" and a
+                final "result" with the same payload process_query returns
+        """
+        try:
+            ticker_info = await self._run_in_thread(self.identify_ticker_agent.identify, query_text)
+        except Exception as e:
+            logger.error(f"Error identifying ticker: {str(e)}")
+            ticker_info = {}
+        ticker = ticker_info.get("ticker")
+        timeframe = ticker_info.get("timeframe", "today")
         
-    def _get_fallback_price(self, ticker):
-        """Try alternative methods to get stock price if primary method fails."""
+        if not ticker:
+            logger.warning("No ticker identified for query: %s", query_text)
+            default_response = self._default_response()
+            default_response["metadata"]["error"] = "No ticker identified"
+            yield "error", {"error": "No ticker identified"}
+            yield "result", default_response
+            return
+        
+        yield "ticker", {
+            "ticker": ticker,
+            "company_name": ticker_info.get("company_name"),
+            "timeframe": timeframe
+        }
+        
+        async def fetch(name, func, *args):
+            return name, await self._run_in_thread(func, *args)
+        
+        collected = {}
+        for next_result in asyncio.as_completed([
+            fetch("news", self._collect_news, ticker),
+            fetch("price", self._collect_price, ticker),
+            fetch("price_change", self._collect_price_change, ticker, timeframe),
+        ]):
+            name, data = await next_result
+            if name == "price_change":
+                data, series = data
+            collected[name] = data
+            if name == "news":
+                # Full articles are only needed server-side
+                yield name, {k: v for k, v in data.items() if k != "full_articles"}
+            else:
+                yield name, data
+        
+        news_data, price_data, price_change = collected["news"], collected["price"], collected["price_change"]
+        analysis = None
+        started = time.perf_counter()
         try:
-            import yfinance as yf
-            ticker_data = yf.Ticker(ticker)
-            info = ticker_data.info
-            if info and "regularMarketPrice" in info:
-                return {
-                    "price": info["regularMarketPrice"],
-                    "currency": "USD",
-                    "success": True,
-                    "source": "yfinance"
+            async for event, data in self.ticker_analysis_agent.analyze_stream(
+                ticker, query_text, news_data, price_data, price_change, timeframe, series
+            ):
+                if event == "analysis":
+                    analysis = data
+                yield event, data
+        except Exception as e:
+            logger.error(f"Error analyzing {ticker}: {str(e)}")
+        if analysis is not None:
+            STAGE_SECONDS.observe(time.perf_counter() - started, "analysis")
+        
+        if analysis is None:
+            analysis = await self._run_in_thread(
+                self._run_analysis, ticker, query_text, news_data, price_data, price_change, timeframe, series
+            )
+            yield "analysis", analysis
+        
+        yield "result", self._build_response(ticker_info, news_data, price_data, price_change, analysis)
+    
+    async def _run_in_thread(self, func, *args):
+        """Run a blocking agent call on the orchestrator's thread pool."""
+        loop = asyncio.get_running_loop()
+        # Carry context variables over to the worker thread
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self.executor, functools.partial(context.run, func, *args))
+    
+    def _default_response(self):
+        """Build the response returned when a query cannot be processed."""
+        return {
+            "answer": "Unable to analyze the stock due to insufficient data.",
+            "metadata": {
+                "ticker": None,
+                "company_name": None,
+                "current_price": None,
+                "price_change": {"success": False, "error": "Processing error"},
+                "news": [],
+                "analysis": {
+                    "summary": "Analysis unavailable",
+                    "detailed_analysis": "",
+                    "details": {}
                 }
-        except:
-            pass
+            }
+        }
+    
+    @STAGE_SECONDS.time("news")
+    def _collect_news(self, ticker):
+        """Get news for a ticker, never raising."""
+        try:
+            return self.ticker_news_agent.get_news(ticker)
+        except Exception as e:
+            logger.error(f"Error getting news for {ticker}: {str(e)}")
+            return {"headlines": [], "success": False}
+    
+    @STAGE_SECONDS.time("price")
+    def _collect_price(self, ticker):
+        """Get the current price for a ticker, never raising."""
+        try:
+            # The price agent's router already falls back across providers
+            return self.ticker_price_agent.get_price(ticker)
+        except Exception as e:
+            logger.error(f"Error getting price for {ticker}: {str(e)}")
+            return {"price": 0.0, "success": False}
+    
+    @STAGE_SECONDS.time("price_change")
+    def _collect_price_change(self, ticker, timeframe, series=None):
+        """
+        Get the price change for a ticker, never raising.
+        
+        The daily bars are loaded here unless given, and returned so the
+        analysis stage reuses them instead of loading them again.
         
-        # Additional fallback could be added here
-        return None
+        Returns:
+            tuple: (price change dict, DailySeries or None)
+        """
+        if series is None:
+            series = self._collect_series(ticker, [timeframe])
+        try:
+            return self.ticker_price_change_agent.get_price_change(ticker, timeframe, series=series), series
+        except Exception as e:
+            logger.error(f"Error getting price change for {ticker}: {str(e)}")
+            return {
+                "change": None, 
+                "change_percent": None, 
+                "timeframe": timeframe,
+                "success": False,
+                "error": str(e)
+            }, series
+    
+    def _collect_series(self, ticker, timeframes):
+        """Get enough daily bars for the timeframes and indicators from the local history store, or None."""
+        agent = self.ticker_price_change_agent
+        try:
+            return agent.get_series(ticker, bars=max(agent.history_bars(timeframe) for timeframe in timeframes))
+        except Exception as e:
+            logger.error(f"Error loading price history for {ticker}: {str(e)}")
+            return None
+    
+    @STAGE_SECONDS.time("analysis")
+    def _run_analysis(self, ticker, query_text, news_data, price_data, price_change, timeframe, series=None):
+        """Generate the analysis from the bars loaded for the price change, never raising."""
+        try:
+            return self.ticker_analysis_agent.analyze(
+                ticker=ticker,
+                query=query_text,
+                news=news_data,
+                price=price_data,
+                price_change=price_change,
+                timeframe=timeframe,
+                series=series
+            )
+        except Exception as e:
+            logger.error(f"Error analyzing {ticker}: {str(e)}")
+            return {
+                "summary": "Unable to generate analysis", 
+                "detailed_analysis": "", 
+                "details": {}, 
+                "success": False
+            }
+    
+    def _build_response(self, ticker_info, news_data, price_data, price_change, analysis):
+        """Assemble the final answer and metadata from the collected agent results."""
+        ticker = ticker_info.get("ticker")
+        
+        # Add company name if missing
+        if "company_name" not in price_data:
+            price_data["company_name"] = ticker_info.get("company_name", f"{ticker} Inc.")
+        
+        return {
+            "answer": analysis.get("summary", "Analysis unavailable"),
+            "metadata": {
+                "ticker": ticker,
+                "company_name": price_data.get("company_name", ticker_info.get("company_name")),
+                "current_price": price_data.get("price"),  # This should now be more reliable
+                "price_change": price_change,
+                "news": news_data.get("headlines", []),
+                "analysis": {
+                    "summary": analysis.get("summary", "No analysis available"),
+                    "detailed_analysis": analysis.get("detailed_analysis", ""),
+                    "details": analysis.get("details", {})
+                }
+            }
+        }
@@ -1,7 +1,10 @@
 from datetime import datetime
 import re
 import logging
-from utils.llm import generate_analysis_with_llm  # Updated import
+from utils.llm import generate_analysis_with_llm, stream_analysis_with_llm
+from utils.singleflight import single_flight
+from utils.data_processing import compute_indicators, find_price_correlation
+from utils.sentiment import get_sentiment_scorer
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -16,49 +19,165 @@ class TickerAnalysisAgent:
     def __init__(self):
         pass
     
-    def analyze(self, ticker, query, news, price, price_change, timeframe):
+    @single_flight("analysis", key=lambda self, ticker, query, news, price, price_change, timeframe, series=None: (
+        ticker, timeframe, " ".join(query.lower().split())
+    ))
+    def analyze(self, ticker, query, news, price, price_change, timeframe, series=None):
         """
         Analyze stock data and news to explain price movements.
+        
+        Args:
+            series (DailySeries): Optional daily bars; when given, technical
+                indicators and support/resistance levels are derived from them
         """
         logger.info(f"Analyzing {ticker} with data: price_success={price.get('success')}, price_change_success={price_change.get('success')}")
         
         # Only require ticker, don't fail if price data is incomplete
         if not ticker:
-            return {
-                "summary": "Unable to analyze without a valid stock ticker.",
-                "detailed_analysis": "",
-                "details": {},
-                "success": False
-            }
+            return self._no_ticker_result()
         
-        # Get key data points - with fallbacks for missing data
-        current_price = price.get("price")
-        change = price_change.get("change")
-        change_percent = price_change.get("change_percent")
-        company_name = price.get("company_name", ticker)
-        from_price = price_change.get("from_price")
-        to_price = price_change.get("to_price")
+        context = self._prepare(ticker, query, news, price, price_change, timeframe, series)
         
+        # Try to generate a summary and detailed analysis using the LLM
+        llm_result = generate_analysis_with_llm(ticker, query, context["enhanced_price"], news, price_change)
+        
+        return self._finalize(context, llm_result)
+    
+    async def analyze_stream(self, ticker, query, news, price, price_change, timeframe, series=None):
+        """
+        Analyze like analyze(), streaming the LLM output as it is generated.
+        
+        Yields:
+            tuple: ("summary_token" | "detailed_analysis_token", text) while the LLM
+                writes, then ("analysis", dict) with the same result analyze() returns
+        """
+        if not ticker:
+            yield "analysis", self._no_ticker_result()
+            return
+        
+        context = self._prepare(ticker, query, news, price, price_change, timeframe, series)
+        
+        llm_result = None
+        async for kind, payload in stream_analysis_with_llm(ticker, query, context["enhanced_price"], news, price_change):
+            if kind == "result":
+                llm_result = payload
+            else:
+                yield kind, payload
+        
+        yield "analysis", self._finalize(context, llm_result)
+    
+    def _no_ticker_result(self):
+        return {
+            "summary": "Unable to analyze without a valid stock ticker.",
+            "detailed_analysis": "",
+            "details": {},
+            "success": False
+        }
+    
+    def _prepare(self, ticker, query, news, price, price_change, timeframe, series=None):
+        """Collect the data points, indicators and news sentiment the analysis is built from."""
         # Process news for analysis
         headlines = news.get("headlines", [])
         news_analysis = []
         
-        for headline in headlines:
-            sentiment = self._analyze_sentiment(headline)
+        # Score every headline and description in one batch; shared stories come from the memo
+        scorer = get_sentiment_scorer()
+        scores = scorer.score_articles(headlines, news.get("summaries"))
+        source_counts = news.get("source_counts") or [1] * len(headlines)
+        for headline, score, source_count in zip(headlines, scores, source_counts):
             news_analysis.append({
                 "headline": headline,
-                "sentiment": sentiment
+                "sentiment": scorer.label(score),
+                "sentiment_score": round(score, 2),
+                "source_count": source_count
             })
         
+        if series is not None and len(series) > 1:
+            try:
+                news_analysis = self._align_news(news, price_change, series, news_analysis)
+            except Exception as e:
+                logger.error(f"Error aligning news with prices for {ticker}: {str(e)}")
+        
         # Add news_analysis to price object for LLM processing
         enhanced_price = dict(price)
         enhanced_price["news_analysis"] = {
             "headlines": [item["headline"] for item in news_analysis[:10]],
-            "sentiments": [item["sentiment"] for item in news_analysis[:10]]
+            "sentiments": [item["sentiment"] for item in news_analysis[:10]],
+            "sessions": [self._describe_session(item) for item in news_analysis[:10]],
+            "source_counts": [item["source_count"] for item in news_analysis[:10]]
         }
         
-        # Try to generate a summary and detailed analysis using the LLM
-        llm_result = generate_analysis_with_llm(ticker, query, enhanced_price, news, price_change)
+        indicators = None
+        if series is not None and len(series) > 1:
+            try:
+                indicators = compute_indicators(series)
+                enhanced_price["indicators"] = indicators
+            except Exception as e:
+                logger.error(f"Error computing indicators for {ticker}: {str(e)}")
+        
+        # Get key data points - with fallbacks for missing data
+        return {
+            "ticker": ticker,
+            "query": query,
+            "timeframe": timeframe,
+            "current_price": price.get("price"),
+            "change": price_change.get("change"),
+            "change_percent": price_change.get("change_percent"),
+            "company_name": price.get("company_name", ticker),
+            "from_price": price_change.get("from_price"),
+            "to_price": price_change.get("to_price"),
+            "headlines": headlines,
+            "raw_news_count": news.get("raw_count", len(headlines)),
+            "news_analysis": news_analysis,
+            "indicators": indicators,
+            "enhanced_price": enhanced_price
+        }
+    
+    def _align_news(self, news, price_change, series, news_analysis):
+        """
+        Tag each headline with the trading session it could first move, and put
+        headlines whose session falls inside the price change window first,
+        largest session move first.
+        """
+        articles = news.get("full_articles") or []
+        if len(articles) != len(news_analysis):
+            return news_analysis
+        
+        from_date, to_date = price_change.get("from_date"), price_change.get("to_date")
+        for move in find_price_correlation(series, [article.get("publishedAt") for article in articles]):
+            item = news_analysis[move["news_index"]]
+            item["trading_day"] = move["trading_day"]
+            if move["change_from_previous_close"] is not None:
+                item["session_change_percent"] = round(move["change_from_previous_close"] * 100, 2)
+            item["in_window"] = bool(from_date and to_date and from_date < move["trading_day"] <= to_date)
+        
+        return sorted(news_analysis, key=lambda item: (
+            not item.get("in_window", False),
+            -abs(item.get("session_change_percent") or 0) if item.get("in_window") else 0
+        ))
+    
+    def _describe_session(self, item):
+        """Describe the session a headline was aligned to, e.g. '2026-10-15, session move +2.10%'."""
+        if "trading_day" not in item:
+            return ""
+        if "session_change_percent" in item:
+            return f"{item['trading_day']}, session move {item['session_change_percent']:+.2f}%"
+        return item["trading_day"]
+    
+    def _finalize(self, context, llm_result):
+        """Build the analysis result from the LLM output, or from templates without it."""
+        ticker = context["ticker"]
+        query = context["query"]
+        timeframe = context["timeframe"]
+        current_price = context["current_price"]
+        change = context["change"]
+        change_percent = context["change_percent"]
+        company_name = context["company_name"]
+        from_price = context["from_price"]
+        to_price = context["to_price"]
+        headlines = context["headlines"]
+        news_analysis = context["news_analysis"]
+        indicators = context["indicators"]
         
         # If LLM analysis is available, use it
         if llm_result and "summary" in llm_result and "detailed_analysis" in llm_result:
@@ -87,7 +206,7 @@ class TickerAnalysisAgent:
             detailed_analysis = self._generate_detailed_analysis(ticker, company_name, timeframe,
                                                            current_price, change, change_percent,
                                                            from_price, to_price,
-                                                           news_analysis)
+                                                           news_analysis, indicators)
             llm_used = False
         
         # Create details with whatever data we have
@@ -113,12 +232,18 @@ class TickerAnalysisAgent:
         if to_price is not None:
             details["price_analysis"]["to_price"] = to_price
         
+        if indicators:
+            details["technical_indicators"] = indicators
+        
         # Add news analysis to details
         if headlines:
             details["news_analysis"] = {
                 "headlines": [item["headline"] for item in news_analysis[:5]],
                 "sentiments": [item["sentiment"] for item in news_analysis[:5]],
-                "news_count": len(headlines)
+                "aligned_headlines": [item["headline"] for item in news_analysis if item.get("in_window")][:5],
+                "news_count": len(headlines),
+                "raw_news_count": context["raw_news_count"],
+                "source_counts": [item["source_count"] for item in news_analysis[:5]]
             }
         
         return {
@@ -128,23 +253,6 @@ class TickerAnalysisAgent:
             "success": True
         }
     
-    def _analyze_sentiment(self, headline):
-        """Simple keyword-based sentiment analysis."""
-        headline_lower = headline.lower()
-        
-        positive_keywords = ["up", "rise", "gain", "growth", "profit", "success", "positive", "bullish", "recover"]
-        negative_keywords = ["down", "drop", "fall", "loss", "decline", "risk", "bearish", "concern", "layoff"]
-        
-        positive_score = sum(1 for word in positive_keywords if word in headline_lower)
-        negative_score = sum(1 for word in negative_keywords if word in headline_lower)
-        
-        if positive_score > negative_score:
-            return "positive"
-        elif negative_score > positive_score:
-            return "negative"
-        else:
-            return "neutral"
-    
     def _generate_why_summary(self, ticker, company_name, timeframe, has_price, price, 
                             has_change, change, change_percent, has_news, news_analysis):
         """Generate summary for 'why' questions."""
@@ -159,6 +267,9 @@ class TickerAnalysisAgent:
                 
                 if matching_news:
                     summary += f"This appears to be related to recent news: {matching_news[0]['headline']}"
+                    if matching_news[0].get("in_window") and "session_change_percent" in matching_news[0]:
+                        summary += (f" (published ahead of the {matching_news[0]['session_change_percent']:+.2f}% "
+                                    f"session on {matching_news[0]['trading_day']})")
                 else:
                     summary += f"Recent news includes: {news_analysis[0]['headline']}"
             else:
@@ -213,9 +324,50 @@ class TickerAnalysisAgent:
         
         return summary
     
+    def _describe_indicators(self, ticker, indicators):
+        """Describe trend, momentum and support/resistance from computed indicators."""
+        close = indicators.get("close")
+        text = ""
+        
+        sma_50, sma_200 = indicators.get("sma_50"), indicators.get("sma_200")
+        if close and sma_50:
+            text += f"{ticker} closed at ${close:.2f}, {'above' if close > sma_50 else 'below'} its 50-day average of ${sma_50:.2f}"
+            if sma_200:
+                text += f" and {'above' if close > sma_200 else 'below'} its 200-day average of ${sma_200:.2f}"
+            text += ". "
+        
+        rsi = indicators.get("rsi_14")
+        if rsi is not None:
+            state = "overbought" if rsi >= 70 else "oversold" if rsi <= 30 else "neutral"
+            text += f"The 14-day RSI is {rsi:.1f} ({state}). "
+        
+        macd, signal = indicators.get("macd"), indicators.get("macd_signal")
+        if macd is not None and signal is not None:
+            text += f"MACD ({macd:.2f}) is {'above' if macd > signal else 'below'} its signal line ({signal:.2f}), "
+            text += f"a {'bullish' if macd > signal else 'bearish'} momentum reading. "
+        
+        support, resistance = indicators.get("support"), indicators.get("resistance")
+        if support is not None and resistance is not None:
+            text += f"Nearest support is ${support:.2f} and nearest resistance is ${resistance:.2f}. "
+        
+        lower, upper = indicators.get("bollinger_lower"), indicators.get("bollinger_upper")
+        if lower is not None and upper is not None:
+            text += f"Bollinger bands span ${lower:.2f} to ${upper:.2f}. "
+        
+        atr, volatility = indicators.get("atr_14"), indicators.get("volatility_20d")
+        if atr is not None:
+            text += f"The average true range is ${atr:.2f} per day"
+            text += f", with 20-day annualized volatility of {volatility:.1f}%. " if volatility is not None else ". "
+        
+        volume_ratio = indicators.get("volume_ratio")
+        if volume_ratio is not None:
+            text += f"The latest session traded {volume_ratio:.1f}x its 20-day average volume."
+        
+        return text.strip()
+    
     def _generate_detailed_analysis(self, ticker, company_name, timeframe, 
                                   current_price, change, change_percent, from_price, to_price,
-                                  news_analysis):
+                                  news_analysis, indicators=None):
         """Generate a detailed analysis for the popup view."""
         analysis = f"## {company_name} ({ticker}) - Detailed Analysis\n\n"
         
@@ -239,16 +391,10 @@ class TickerAnalysisAgent:
         
         # Technical Analysis
         analysis += "\n### Technical Analysis\n"
-        analysis += f"Based on recent price action, {ticker} "
-        if change is not None:
-            if change > 0:
-                analysis += f"is showing bullish momentum with potential resistance at ${(to_price * 1.05):.2f}. "
-                analysis += f"Support levels appear to be forming near ${(to_price * 0.95):.2f}. "
-                analysis += "The trading volume has been above average, indicating strong buyer interest."
-            else:
-                analysis += f"is displaying bearish momentum with support around ${(to_price * 0.95):.2f}. "
-                analysis += f"The stock may face resistance at ${(to_price * 1.05):.2f} on any recovery attempts. "
-                analysis += "Trading volume trends suggest continued selling pressure in the near term."
+        if indicators:
+            analysis += self._describe_indicators(ticker, indicators)
+        else:
+            analysis += f"Not enough price history is available to compute technical levels for {ticker}."
         
         # News Impact Analysis
         analysis += "\n\n### News Impact\n"
@@ -1,4 +1,8 @@
+import logging
 from api.news_api import NewsAPI
+from utils.news_dedup import dedupe_articles
+
+logger = logging.getLogger(__name__)
 
 class TickerNewsAgent:
     """
@@ -17,7 +21,9 @@ class TickerNewsAgent:
             days (int): Number of days to look back for news
             
         Returns:
-            dict: News data including headlines, sources, and summaries
+            dict: News data including headlines, sources, and summaries, one entry
+                per distinct story; source_counts holds how many syndicated copies
+                each story had and raw_count the number of articles before dedup
         """
         if not ticker:
             return {
@@ -30,17 +36,25 @@ class TickerNewsAgent:
         
         try:
             # Get news articles from the API
-            articles = self.news_api.get_company_news(ticker, days)
+            raw_articles = self.news_api.get_company_news(ticker, days)
+            
+            # Collapse syndicated copies of the same story
+            articles = dedupe_articles(raw_articles)
+            if len(articles) < len(raw_articles):
+                logger.info(f"Collapsed {len(raw_articles)} articles for {ticker} into {len(articles)} stories")
             
             # Extract relevant information from articles
             headlines = [article.get("title", "") for article in articles]
             sources = [article.get("source", {}).get("name", "") for article in articles]
             summaries = [article.get("description", "") for article in articles]
+            source_counts = [article["source_count"] for article in articles]
             
             return {
                 "headlines": headlines,
                 "sources": sources,
                 "summaries": summaries,
+                "source_counts": source_counts,
+                "raw_count": len(raw_articles),
                 "full_articles": articles,
                 "success": True
             }
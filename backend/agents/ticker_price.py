@@ -1,11 +1,27 @@
 import logging
-import requests
+from concurrent.futures import ThreadPoolExecutor
+from api import http_client
+from api.fmp_api import FinancialModelingPrepAPI
+from utils.singleflight import single_flight
+from utils.cache_backend import make_cache
+from utils.provider_router import ProviderRouter, ProviderUnavailable
+from utils.rate_limiter import get_limiter, RateLimitExceeded
+from utils import deadline
+from utils.metrics import FALLBACKS
+from utils.market_hours import is_market_open, seconds_until_next_open
 from dotenv import load_dotenv
 import os
 
 logger = logging.getLogger(__name__)
 load_dotenv()
 
+# Quote cache settings: short TTL while the market trades, long TTL when it is closed
+QUOTE_CACHE_SIZE = int(os.getenv("QUOTE_CACHE_SIZE", "2048"))
+QUOTE_CACHE_TTL_OPEN = float(os.getenv("QUOTE_CACHE_TTL_OPEN", "15"))
+QUOTE_CACHE_TTL_CLOSED = float(os.getenv("QUOTE_CACHE_TTL_CLOSED", "21600"))
+# Concurrent single-symbol lookups for symbols a batched quote did not cover
+QUOTE_FALLBACK_WORKERS = int(os.getenv("QUOTE_FALLBACK_WORKERS", "8"))
+
 class TickerPriceAgent:
     """
     Agent for retrieving current stock prices.
@@ -13,6 +29,14 @@ class TickerPriceAgent:
     
     def __init__(self):
         self.fmp_api_key = os.getenv("FMP_API_KEY")
+        self.quote_cache = make_cache("quotes", maxsize=QUOTE_CACHE_SIZE, ttl=QUOTE_CACHE_TTL_OPEN)
+        # Live quote sources in order of preference; slow ones are hedged, failing ones skipped
+        providers = [
+            ("fmp_api", lambda ticker: self._get_fmp_quote(ticker)),
+            ("yahoo_finance", lambda ticker: self._get_yahoo_finance_price(ticker)),
+            ("yfinance", lambda ticker: self._get_yfinance_price(ticker))
+        ]
+        self.quote_router = ProviderRouter("quote", providers, is_valid=lambda data: bool(data and data.get("price")))
         # Fallback mock prices only used when API fails
         self.mock_prices = {
             'AAPL': 175.32,
@@ -39,27 +63,34 @@ class TickerPriceAgent:
         """
         logger.info(f"Getting price for ticker: {ticker}")
         
+        cached = self.quote_cache.get(ticker)
+        if cached:
+            price_data = dict(cached)
+            price_data["source"] = f"cache:{cached['source']}"
+            return price_data
+        
         try:
-            # First try the FMP real-time quote endpoint
-            if self.fmp_api_key:
-                price_data = self._get_real_time_price(ticker)
-                if price_data and price_data.get("price"):
-                    return price_data
-            
-            # Fall back to Yahoo Finance API if FMP fails or is unavailable
-            yahoo_price = self._get_yahoo_finance_price(ticker)
-            if yahoo_price:
-                return yahoo_price
+            # FMP, Yahoo chart and yfinance, hedged: the first valid quote wins
+            price_data, provider = self.quote_router.call(ticker)
+            if price_data:
+                # FMP is the primary source when configured, otherwise the Yahoo chart
+                primary = "fmp_api" if self.fmp_api_key else "yahoo_finance"
+                if provider != primary:
+                    FALLBACKS.inc(provider)
+                self._cache_quote(ticker, price_data)
+                return price_data
             
             # Last resort: use mock data
             if ticker in self.mock_prices:
                 price = self.mock_prices[ticker]
+                FALLBACKS.inc("mock_data")
                 logger.warning(f"Using mock price data for {ticker}: ${price}")
             else:
                 # Generate a sensible price based on ticker symbol hash
                 import hashlib
                 hash_value = int(hashlib.md5(ticker.encode()).hexdigest(), 16)
                 price = 50.0 + (hash_value % 950)  # Price between $50 and $1000
+                FALLBACKS.inc("generated_price")
                 logger.warning(f"Using generated price for {ticker}: ${price}")
             
             return {
@@ -76,11 +107,87 @@ class TickerPriceAgent:
                 "error": str(e)
             }
     
+    def get_prices(self, tickers):
+        """
+        Get current prices for many ticker symbols.
+        
+        Cached quotes are served locally; the rest are fetched with FMP's
+        batched quote endpoint, and only symbols it does not cover fall back
+        to the per-symbol sources of get_price.
+        
+        Args:
+            tickers (list): Ticker symbols
+            
+        Returns:
+            dict: Ticker -> price data as returned by get_price, in request order
+        """
+        tickers = list(dict.fromkeys(ticker.upper() for ticker in tickers if ticker))
+        prices = {}
+        missing = []
+        for ticker in tickers:
+            cached = self.quote_cache.get(ticker)
+            if cached:
+                price_data = dict(cached)
+                price_data["source"] = f"cache:{cached['source']}"
+                prices[ticker] = price_data
+            else:
+                missing.append(ticker)
+        
+        if missing and self.fmp_api_key:
+            try:
+                quotes = FinancialModelingPrepAPI(self.fmp_api_key).get_quotes(missing, raw=True)
+            except Exception as e:
+                logger.error(f"Error retrieving batched quotes: {str(e)}")
+                quotes = {}
+            for ticker, quote in quotes.items():
+                if ticker not in missing or not quote.get("price"):
+                    continue
+                price_data = {
+                    "price": quote["price"],
+                    "company_name": quote.get("name") or self._get_company_name(ticker),
+                    "volume": quote.get("volume", 0),
+                    "change": quote.get("change"),
+                    "change_percent": quote.get("changesPercentage"),
+                    "currency": "USD",
+                    "success": True,
+                    "source": "fmp_api"
+                }
+                self._cache_quote(ticker, price_data)
+                prices[ticker] = price_data
+            missing = [ticker for ticker in missing if ticker not in prices]
+        
+        if missing:
+            logger.info(f"Falling back to single-symbol lookups for {len(missing)} tickers")
+            with ThreadPoolExecutor(max_workers=min(len(missing), QUOTE_FALLBACK_WORKERS)) as executor:
+                prices.update(zip(missing, executor.map(deadline.bind(self.get_price), missing)))
+        
+        return {ticker: prices[ticker] for ticker in tickers}
+    
+    def _cache_quote(self, ticker, price_data):
+        """Cache a live quote until it can next change."""
+        if is_market_open():
+            ttl = QUOTE_CACHE_TTL_OPEN
+        else:
+            # The price cannot move before the next open
+            ttl = max(min(seconds_until_next_open(), QUOTE_CACHE_TTL_CLOSED), QUOTE_CACHE_TTL_OPEN)
+        self.quote_cache.set(ticker, dict(price_data), ttl=ttl)
+    
+    def _get_fmp_quote(self, ticker):
+        """FMP quote for the router; the key is checked per call so FMP is skipped while unset."""
+        if not self.fmp_api_key:
+            raise ProviderUnavailable("FMP_API_KEY not set")
+        return self._get_real_time_price(ticker)
+    
+    @single_flight("fmp_quote_short")
     def _get_real_time_price(self, ticker):
         """Get real-time price from Financial Modeling Prep API."""
+        # Don't wait for FMP's rate limit; the router skips FMP without counting a failure
+        if not get_limiter("fmp").try_acquire():
+            raise RateLimitExceeded(f"FMP rate limit reached, skipping quote for {ticker}")
+        
         try:
             url = f"https://financialmodelingprep.com/api/v3/quote-short/{ticker}?apikey={self.fmp_api_key}"
-            response = requests.get(url, timeout=5)
+            response = http_client.get(url, timeout=5)
             
             if response.status_code == 200:
                 data = response.json()
@@ -98,6 +205,7 @@ class TickerPriceAgent:
             logger.error(f"FMP API error for {ticker}: {str(e)}")
             return None
     
+    @single_flight("yahoo_chart")
     def _get_yahoo_finance_price(self, ticker):
         """Get price from Yahoo Finance (no API key needed)."""
         try:
@@ -105,7 +213,7 @@ class TickerPriceAgent:
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
             }
-            response = requests.get(url, headers=headers, timeout=5)
+            response = http_client.get(url, headers=headers, timeout=5)
             
             if response.status_code == 200:
                 data = response.json()
@@ -126,6 +234,24 @@ class TickerPriceAgent:
             logger.error(f"Yahoo Finance API error for {ticker}: {str(e)}")
             return None
     
+    def _get_yfinance_price(self, ticker):
+        """Get price through the yfinance library."""
+        try:
+            import yfinance as yf
+            info = yf.Ticker(ticker).info
+            if info and info.get("regularMarketPrice"):
+                return {
+                    "price": info["regularMarketPrice"],
+                    "company_name": info.get("longName") or self._get_company_name(ticker),
+                    "currency": info.get("currency", "USD"),
+                    "success": True,
+                    "source": "yfinance"
+                }
+            return None
+        except Exception as e:
+            logger.error(f"yfinance error for {ticker}: {str(e)}")
+            return None
+    
     def _get_company_name(self, ticker):
         """Get company name from ticker symbol."""
         companies = {
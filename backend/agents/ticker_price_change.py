@@ -1,8 +1,15 @@
 from api.fmp_api import FinancialModelingPrepAPI  # Change import
-from datetime import datetime, timedelta
+from utils.history_store import HistoryStore
+from utils.price_change import compute_timeframe_change, window_for_timeframe
+from dotenv import load_dotenv
 import logging
+import os
 
 logger = logging.getLogger(__name__)
+load_dotenv()
+
+# Bars loaded per query: the 1Y window (about 253 sessions) plus warm-up for the 200-day SMA and EMAs
+PRICE_HISTORY_BARS = int(os.getenv("PRICE_HISTORY_BARS", "320"))
 
 class TickerPriceChangeAgent:
     """
@@ -11,10 +18,41 @@ class TickerPriceChangeAgent:
     
     def __init__(self):
         self.stock_api = FinancialModelingPrepAPI()  # Use FMP instead of Alpha Vantage
+        self.history_store = HistoryStore()
+    
+    def history_bars(self, timeframe="today"):
+        """Return the number of bars a timeframe's change and the technical indicators need."""
+        window = window_for_timeframe(timeframe)
+        if window.endswith("D") and window[:-1].isdigit():
+            # Custom windows such as '400D' may reach back further than a year
+            return max(PRICE_HISTORY_BARS, int(window[:-1]) + 10)
+        return PRICE_HISTORY_BARS
     
-    def get_price_change(self, ticker, timeframe="today"):
+    def get_series(self, ticker, bars=PRICE_HISTORY_BARS):
+        """
+        Get the newest daily bars for a ticker, served from the local store when up to date.
+        
+        The first request still backfills the full history into the store; only
+        the bars returned are limited.
+        
+        Args:
+            ticker (str): The ticker symbol
+            bars (int): Number of bars to load; the whole stored history if None
+            
+        Returns:
+            DailySeries: The bars in ascending date order
+        """
+        return self.history_store.get_daily_time_series(
+            ticker, self.stock_api.get_daily_time_series, outputsize="full", bars=bars
+        )
+    
+    def get_price_change(self, ticker, timeframe="today", series=None):
         """
         Calculate price change for the given ticker over the specified timeframe.
+        
+        The change over every standard window (1D, 5D, 1W, 1M, 3M, 6M, YTD, 1Y)
+        is included under "windows", so follow-up questions about another
+        timeframe need no new fetch. Pass series to reuse bars already loaded.
         """
         if not ticker:
             return {
@@ -26,11 +64,11 @@ class TickerPriceChangeAgent:
             }
         
         try:
-            # Get daily time series data from the API
-            time_series = self.stock_api.get_daily_time_series(ticker, outputsize="compact")
+            if series is None:
+                series = self.get_series(ticker, self.history_bars(timeframe))
             
             # Check if we have data
-            if not time_series or len(time_series) == 0:
+            if not series or len(series) == 0:
                 logger.error(f"No historical data available for {ticker}")
                 return {
                     "change": None,
@@ -40,11 +78,7 @@ class TickerPriceChangeAgent:
                     "error": "No historical data available"
                 }
             
-            # Convert to a more usable format
-            dates = list(time_series.keys())
-            dates.sort(reverse=True)  # Most recent first
-            
-            if len(dates) < 2:
+            if len(series) < 2:
                 return {
                     "change": None,
                     "change_percent": None,
@@ -53,43 +87,24 @@ class TickerPriceChangeAgent:
                     "error": "Insufficient historical data points"
                 }
             
-            # Get today's close and previous close
-            latest = time_series[dates[0]]
-            latest_close = float(latest["4. close"])
-            
-            # Handle different timeframes
-            if timeframe == "today":
-                # For today, compare to previous day's close
-                previous = time_series[dates[1]]
-                previous_close = float(previous["4. close"])
-                
-            elif timeframe in ["week", "7days"]:
-                # Find data point ~7 days ago
-                index = min(7, len(dates) - 1)
-                previous = time_series[dates[index]]
-                previous_close = float(previous["4. close"])
-                
-            elif timeframe in ["month", "30days"]:
-                # Find data point ~30 days ago
-                index = min(30, len(dates) - 1)
-                previous = time_series[dates[index]]
-                previous_close = float(previous["4. close"])
-                
-            else:
-                # Default to previous day
-                previous = time_series[dates[1]]
-                previous_close = float(previous["4. close"])
+            window, selected, windows = compute_timeframe_change(series, timeframe)
             
-            # Calculate changes
-            change = latest_close - previous_close
-            change_percent = (change / previous_close) * 100
+            if selected is None:
+                return {
+                    "change": None,
+                    "change_percent": None,
+                    "timeframe": timeframe,
+                    "window": window,
+                    "windows": windows,
+                    "success": False,
+                    "error": f"Insufficient history for the {window} window"
+                }
             
             return {
-                "change": round(change, 2),
-                "change_percent": round(change_percent, 2),
-                "from_price": previous_close,
-                "to_price": latest_close,
+                **selected,
                 "timeframe": timeframe,
+                "window": window,
+                "windows": windows,
                 "success": True
             }
             
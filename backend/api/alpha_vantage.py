@@ -1,7 +1,9 @@
 import os
-import requests
+from api import http_client
+from utils.singleflight import single_flight
+from models.daily_series import DailySeries
+from utils.rate_limiter import get_limiter
 import logging
-import time
 from dotenv import load_dotenv
 
 # Ensure environment variables are loaded
@@ -18,27 +20,26 @@ class AlphaVantageAPI:
     def __init__(self, api_key=None):
         self.api_key = api_key or API_KEY
         self.base_url = "https://www.alphavantage.co/query"
-        self.last_call_time = 0
-        self.min_call_interval = 12  # seconds, to avoid hitting rate limits
+        # Shared by all workers, so the per-minute limit holds for the whole host
+        self.limiter = get_limiter("alpha_vantage")
         
         if not self.api_key:
             raise ValueError("Alpha Vantage API key not found in environment variables")
     
     def _rate_limit(self):
-        """Simple rate limiting to avoid hitting API limits."""
-        current_time = time.time()
-        elapsed = current_time - self.last_call_time
-        
-        if elapsed < self.min_call_interval:
-            time.sleep(self.min_call_interval - elapsed)
-        
-        self.last_call_time = time.time()
+        """Take a request token; False if the rate limit leaves none within RATE_LIMIT_ALPHA_VANTAGE_WAIT."""
+        if self.limiter.acquire():
+            return True
+        logger.warning("Alpha Vantage rate limit reached, skipping request")
+        return False
     
+    @single_flight("alpha_vantage_quote")
     def get_quote(self, symbol):
         """
         Get current quote data for a symbol.
         """
-        self._rate_limit()
+        if not self._rate_limit():
+            return None
         logger.info(f"Fetching quote for {symbol}")
         
         params = {
@@ -48,7 +49,7 @@ class AlphaVantageAPI:
         }
         
         try:
-            response = requests.get(self.base_url, params=params, timeout=10)
+            response = http_client.get(self.base_url, params=params, timeout=10)
             
             if response.status_code != 200:
                 logger.error(f"Error fetching quote: {response.status_code}")
@@ -67,6 +68,7 @@ class AlphaVantageAPI:
             logger.error(f"Exception fetching quote: {str(e)}")
             return None
     
+    @single_flight("alpha_vantage_daily_time_series")
     def get_daily_time_series(self, symbol, outputsize="compact"):
         """
         Get daily time series data for a symbol.
@@ -74,8 +76,12 @@ class AlphaVantageAPI:
         Args:
             symbol (str): Stock ticker symbol
             outputsize (str): 'compact' for last 100 data points, 'full' for 20+ years of data
+            
+        Returns:
+            DailySeries: The bars, or None if the provider returned none
         """
-        self._rate_limit()
+        if not self._rate_limit():
+            return None
         logger.info(f"Fetching daily time series for {symbol}")
         
         params = {
@@ -86,7 +92,7 @@ class AlphaVantageAPI:
         }
         
         try:
-            response = requests.get(self.base_url, params=params, timeout=10)
+            response = http_client.get(self.base_url, params=params, timeout=10)
             
             if response.status_code != 200:
                 logger.error(f"Error fetching time series: {response.status_code}")
@@ -103,12 +109,13 @@ class AlphaVantageAPI:
                     logger.error(f"API Information: {data['Information']}")
                 return None
                 
-            return data["Time Series (Daily)"]
+            return DailySeries.from_legacy_dict(data["Time Series (Daily)"], symbol=symbol)
             
         except Exception as e:
             logger.error(f"Exception fetching time series: {str(e)}")
             return None
     
+    @single_flight("alpha_vantage_search")
     def search_symbol(self, keywords):
         """
         Search for stock symbols based on keywords.
@@ -119,7 +126,8 @@ class AlphaVantageAPI:
         Returns:
             list: Matching stock symbols and companies
         """
-        self._rate_limit()
+        if not self._rate_limit():
+            return None
         logger.info(f"Searching for symbols with keywords: {keywords}")
         
         params = {
@@ -129,7 +137,7 @@ class AlphaVantageAPI:
         }
         
         try:
-            response = requests.get(self.base_url, params=params, timeout=10)
+            response = http_client.get(self.base_url, params=params, timeout=10)
             
             if response.status_code != 200:
                 logger.error(f"Error searching symbols: {response.status_code}")
@@ -1,6 +1,11 @@
 import os
-import requests
+from api import http_client
+from utils.singleflight import single_flight
+from models.daily_series import DailySeries
+from utils.rate_limiter import get_limiter
+from utils import deadline
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dotenv import load_dotenv
 
@@ -8,6 +13,10 @@ from dotenv import load_dotenv
 load_dotenv()
 API_KEY = os.getenv("FMP_API_KEY")
 
+# Symbols per batched quote request and batched requests sent at once
+FMP_QUOTE_BATCH_SIZE = int(os.getenv("FMP_QUOTE_BATCH_SIZE", "100"))
+FMP_QUOTE_MAX_CONCURRENCY = int(os.getenv("FMP_QUOTE_MAX_CONCURRENCY", "4"))
+
 logger = logging.getLogger(__name__)
 
 class FinancialModelingPrepAPI:
@@ -18,18 +27,23 @@ class FinancialModelingPrepAPI:
     def __init__(self, api_key=None):
         self.api_key = api_key or API_KEY
         self.base_url = "https://financialmodelingprep.com/api/v3"
+        self.limiter = get_limiter("fmp")
         
         if not self.api_key:
             raise ValueError("FMP API key not found in environment variables")
     
+    @single_flight("fmp_quote")
     def get_quote(self, symbol):
         """Get current quote data for a symbol."""
         logger.info(f"Fetching quote for {symbol}")
         
+        if not self._rate_limit(f"quote for {symbol}"):
+            return None
+        
         url = f"{self.base_url}/quote/{symbol}?apikey={self.api_key}"
         
         try:
-            response = requests.get(url, timeout=10)
+            response = http_client.get(url, timeout=10)
             
             if response.status_code != 200:
                 logger.error(f"Error fetching quote: {response.status_code}")
@@ -41,36 +55,117 @@ class FinancialModelingPrepAPI:
                 logger.warning(f"No quote data returned for {symbol}")
                 return None
             
-            # Format data to match Alpha Vantage structure for compatibility
-            quote_data = data[0]
-            return {
-                "01. symbol": quote_data["symbol"],
-                "02. open": str(quote_data["open"]),
-                "03. high": str(quote_data["dayHigh"]),
-                "04. low": str(quote_data["dayLow"]),
-                "05. price": str(quote_data["price"]),
-                "06. volume": str(quote_data["volume"]),
-                "07. latest trading day": quote_data["date"],
-                "08. previous close": str(quote_data["previousClose"]),
-                "09. change": str(quote_data["change"]),
-                "10. change percent": str(quote_data["changesPercentage"]) + "%"
-            }
+            return self._format_quote(data[0])
             
         except Exception as e:
             logger.error(f"Exception fetching quote: {str(e)}")
             return None
     
-    def get_daily_time_series(self, symbol, outputsize="compact"):
-        """Get daily time series data for a symbol."""
-        logger.info(f"Fetching daily time series for {symbol}")
+    def _rate_limit(self, what):
+        """Take a request token, waiting at most RATE_LIMIT_FMP_WAIT; False if none was available."""
+        if self.limiter.acquire():
+            return True
+        logger.warning(f"FMP rate limit reached, skipping {what}")
+        return False
+    
+    def _format_quote(self, quote_data):
+        """Format an FMP quote to match the Alpha Vantage structure for compatibility."""
+        return {
+            "01. symbol": quote_data["symbol"],
+            "02. open": str(quote_data["open"]),
+            "03. high": str(quote_data["dayHigh"]),
+            "04. low": str(quote_data["dayLow"]),
+            "05. price": str(quote_data["price"]),
+            "06. volume": str(quote_data["volume"]),
+            "07. latest trading day": quote_data.get("date", ""),
+            "08. previous close": str(quote_data["previousClose"]),
+            "09. change": str(quote_data["change"]),
+            "10. change percent": str(quote_data["changesPercentage"]) + "%"
+        }
+    
+    def get_quotes(self, symbols, raw=False):
+        """
+        Get current quotes for many symbols using FMP's comma-separated quote endpoint.
+        
+        The symbols are split into chunks of FMP_QUOTE_BATCH_SIZE, and the
+        chunks are fetched concurrently.
+        
+        Args:
+            symbols (list): Stock ticker symbols
+            raw (bool): Return FMP's own quote objects instead of the Alpha Vantage shape
+            
+        Returns:
+            dict: Symbol -> quote for every symbol the provider returned
+        """
+        symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols if symbol))
+        chunks = [tuple(symbols[i:i + FMP_QUOTE_BATCH_SIZE]) for i in range(0, len(symbols), FMP_QUOTE_BATCH_SIZE)]
+        if not chunks:
+            return {}
+        logger.info(f"Fetching quotes for {len(symbols)} symbols in {len(chunks)} requests")
+        
+        if len(chunks) == 1:
+            results = [self._get_quote_chunk(chunks[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(len(chunks), FMP_QUOTE_MAX_CONCURRENCY)) as executor:
+                results = list(executor.map(deadline.bind(self._get_quote_chunk), chunks))
+        
+        quotes = {}
+        for chunk_quotes in results:
+            for quote_data in chunk_quotes:
+                try:
+                    quotes[quote_data["symbol"]] = quote_data if raw else self._format_quote(quote_data)
+                except (KeyError, TypeError) as e:
+                    logger.warning(f"Skipping malformed quote {quote_data}: {str(e)}")
+        return quotes
+    
+    @single_flight("fmp_quote_batch")
+    def _get_quote_chunk(self, symbols):
+        """Fetch one comma-separated batch of quotes, returning FMP's quote objects."""
+        if not self._rate_limit(f"batched quotes for {len(symbols)} symbols"):
+            return []
+        
+        url = f"{self.base_url}/quote/{','.join(symbols)}?apikey={self.api_key}"
+        
+        try:
+            response = http_client.get(url, timeout=10)
+            
+            if response.status_code != 200:
+                logger.error(f"Error fetching batched quotes: {response.status_code}")
+                return []
+            
+            return response.json() or []
+            
+        except Exception as e:
+            logger.error(f"Exception fetching batched quotes: {str(e)}")
+            return []
+    
+    @single_flight("fmp_daily_time_series")
+    def get_daily_time_series(self, symbol, outputsize="compact", from_date=None):
+        """
+        Get daily time series data for a symbol.
+        
+        Args:
+            symbol (str): Stock ticker symbol
+            outputsize (str): 'compact' for last 100 data points, 'full' for 20+ years of data
+            from_date (str): Optional YYYY-MM-DD; only bars on or after this date are returned
+            
+        Returns:
+            DailySeries: The bars, or None if the provider returned none
+        """
+        logger.info(f"Fetching daily time series for {symbol}" + (f" from {from_date}" if from_date else ""))
         
         # Determine number of data points based on outputsize
         limit = 100 if outputsize == "compact" else 5000
         
         url = f"{self.base_url}/historical-price-full/{symbol}?apikey={self.api_key}&limit={limit}"
+        if from_date:
+            url += f"&from={from_date}"
+        
+        if not self._rate_limit(f"time series for {symbol}"):
+            return None
         
         try:
-            response = requests.get(url, timeout=10)
+            response = http_client.get(url, timeout=10)
             
             if response.status_code != 200:
                 logger.error(f"Error fetching time series: {response.status_code}")
@@ -82,32 +177,24 @@ class FinancialModelingPrepAPI:
                 logger.warning(f"No historical data returned for {symbol}")
                 return None
             
-            # Format data to match Alpha Vantage structure for compatibility
-            historical_data = {}
-            for item in data["historical"]:
-                date_str = item["date"]  # Format: YYYY-MM-DD
-                historical_data[date_str] = {
-                    "1. open": str(item["open"]),
-                    "2. high": str(item["high"]),
-                    "3. low": str(item["low"]),
-                    "4. close": str(item["close"]),
-                    "5. volume": str(item["volume"])
-                }
-            
-            return historical_data
+            return DailySeries.from_fmp_historical(data["historical"], symbol=symbol)
             
         except Exception as e:
             logger.error(f"Exception fetching time series: {str(e)}")
             return None
     
+    @single_flight("fmp_search")
     def search_symbol(self, keywords):
         """Search for stock symbols based on keywords."""
         logger.info(f"Searching for symbols with keywords: {keywords}")
         
+        if not self._rate_limit(f"search for {keywords}"):
+            return None
+        
         url = f"{self.base_url}/search?query={keywords}&limit=10&apikey={self.api_key}"
         
         try:
-            response = requests.get(url, timeout=10)
+            response = http_client.get(url, timeout=10)
             
             if response.status_code != 200:
                 logger.error(f"Error searching symbols: {response.status_code}")
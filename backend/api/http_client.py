@@ -0,0 +1,317 @@
+import os
+import socket
+import threading
+import time
+import logging
+import asyncio
+import weakref
+from collections import defaultdict
+from urllib.parse import urlsplit
+import anyio
+import requests
+import httpx
+import httpcore
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from dotenv import load_dotenv
+from utils import deadline
+from utils.metrics import observe_response
+
+# Ensure environment variables are loaded
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Number of per-host pools kept alive and connections kept per host
+POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+# Seconds a resolved address is reused by the pooled clients; 0 disables DNS caching.
+# The system resolver does not expose record TTLs, so this caps how stale an address can get.
+DNS_CACHE_TTL = float(os.getenv("HTTP_DNS_CACHE_TTL", "60"))
+DEFAULT_TIMEOUT = float(os.getenv("HTTP_DEFAULT_TIMEOUT", "10"))
+
+
+class DNSCache:
+    """
+    TTL cache in front of socket.getaddrinfo.
+
+    Only this module's clients resolve through it: the requests session via
+    its connection classes and the httpx clients via their network backend.
+    Name resolution in the rest of the process is left alone.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._resolve = socket.getaddrinfo
+
+    def cached(self, host, port, family=0, type=0, proto=0, flags=0):
+        """Return the cached resolution, or None if there is none or it expired."""
+        with self._lock:
+            entry = self._entries.get((host, port, family, type, proto, flags))
+            if entry and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+        return None
+
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0):
+        result = self.cached(host, port, family, type, proto, flags)
+        if result is not None:
+            return result
+
+        result = self._resolve(host, port, family, type, proto, flags)
+        with self._lock:
+            self.misses += 1
+            self._entries[(host, port, family, type, proto, flags)] = (time.monotonic() + self.ttl, result)
+        return result
+
+    @staticmethod
+    def addresses(infos):
+        """Distinct IP addresses of getaddrinfo results, in resolver order."""
+        return list(dict.fromkeys(info[4][0] for info in infos))
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+_dns_cache = DNSCache(DNS_CACHE_TTL)
+
+
+class _CachedDNSConnectionMixin:
+    """urllib3 connection that connects to the cached addresses of its host."""
+
+    def _new_conn(self):
+        host = self._dns_host
+        try:
+            addresses = DNSCache.addresses(_dns_cache.getaddrinfo(host, self.port, 0, socket.SOCK_STREAM))
+        except OSError:
+            # Let urllib3 resolve and report the failure itself
+            return super()._new_conn()
+
+        # TLS still verifies and sends SNI for self.host; only the connect address changes
+        error = None
+        try:
+            for address in addresses:
+                self._dns_host = address
+                try:
+                    return super()._new_conn()
+                except (NewConnectionError, ConnectTimeoutError) as e:
+                    error = e
+        finally:
+            self._dns_host = host
+        raise error
+
+
+class _CachedDNSHTTPConnection(_CachedDNSConnectionMixin, HTTPConnection):
+    pass
+
+
+class _CachedDNSHTTPSConnection(_CachedDNSConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _CachedDNSHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CachedDNSHTTPConnection
+
+
+class _CachedDNSHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CachedDNSHTTPSConnection
+
+
+class CachedDNSAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools resolve hosts through the DNS cache."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        if DNS_CACHE_TTL > 0:
+            self.poolmanager.pool_classes_by_scheme = {
+                "http": _CachedDNSHTTPConnectionPool,
+                "https": _CachedDNSHTTPSConnectionPool
+            }
+
+
+class CachedDNSNetworkBackend(httpcore.AsyncNetworkBackend):
+    """httpcore network backend that resolves hosts through the DNS cache."""
+
+    def __init__(self, backend=None):
+        self._backend = backend or httpcore.AnyIOBackend()
+
+    async def _resolve(self, host, port):
+        infos = _dns_cache.cached(host, port, 0, socket.SOCK_STREAM)
+        if infos is None:
+            # A miss resolves on a worker thread, as anyio itself would
+            infos = await anyio.to_thread.run_sync(_dns_cache.getaddrinfo, host, port, 0, socket.SOCK_STREAM)
+        return DNSCache.addresses(infos)
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        try:
+            addresses = await self._resolve(host, port)
+        except OSError:
+            addresses = [host]
+        # TLS is started later with the original hostname, so connecting by address is safe
+        error = None
+        for address in addresses:
+            try:
+                return await self._backend.connect_tcp(
+                    address, port, timeout=timeout, local_address=local_address, socket_options=socket_options
+                )
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                error = e
+        raise error
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self._backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds):
+        await self._backend.sleep(seconds)
+
+
+# Synchronous face: one session whose adapter keeps a keep-alive pool per host
+_adapter = CachedDNSAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+_session = requests.Session()
+_session.mount("https://", _adapter)
+_session.mount("http://", _adapter)
+
+# Asynchronous face: httpx clients are bound to an event loop, so keep one per loop
+_async_clients = weakref.WeakKeyDictionary()
+_async_requests = defaultdict(int)
+_stats_lock = threading.Lock()
+
+
+def _observe(url, started, response):
+    """Record a request's latency and outcome for its upstream host; response is None if it raised."""
+    observe_response(urlsplit(url).hostname, time.perf_counter() - started,
+                     response.status_code if response is not None else None)
+
+
+def _timed(url, send):
+    """Send a request with send() and record it."""
+    started = time.perf_counter()
+    response = None
+    try:
+        response = send()
+        return response
+    finally:
+        _observe(url, started, response)
+
+
+def get(url, params=None, headers=None, timeout=DEFAULT_TIMEOUT, **kwargs):
+    """Send a GET request over the shared connection pool, within the request deadline."""
+    timeout = deadline.clamp_timeout(timeout)
+    return _timed(url, lambda: _session.get(url, params=params, headers=headers, timeout=timeout, **kwargs))
+
+
+def post(url, data=None, json=None, headers=None, timeout=DEFAULT_TIMEOUT, **kwargs):
+    """Send a POST request over the shared connection pool, within the request deadline."""
+    timeout = deadline.clamp_timeout(timeout)
+    return _timed(url, lambda: _session.post(url, data=data, json=json, headers=headers, timeout=timeout, **kwargs))
+
+
+def get_async_client():
+    """Return the shared httpx client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        transport = httpx.AsyncHTTPTransport(limits=httpx.Limits(
+            max_connections=POOL_CONNECTIONS * POOL_MAXSIZE,
+            max_keepalive_connections=POOL_MAXSIZE
+        ))
+        if DNS_CACHE_TTL > 0:
+            # httpx has no public hook for the resolver; its pool takes a network backend
+            transport._pool._network_backend = CachedDNSNetworkBackend()
+        client = httpx.AsyncClient(transport=transport, timeout=DEFAULT_TIMEOUT)
+        _async_clients[loop] = client
+    return client
+
+
+async def aclose_async_client():
+    """Close the running event loop's shared httpx client, e.g. on application shutdown."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+
+def _count_async_request(url):
+    with _stats_lock:
+        _async_requests[urlsplit(url).hostname] += 1
+
+
+async def async_get(url, params=None, headers=None, timeout=DEFAULT_TIMEOUT, **kwargs):
+    """Send a GET request over the shared async connection pool, within the request deadline."""
+    timeout = deadline.clamp_timeout(timeout)
+    _count_async_request(url)
+    client = get_async_client()
+    started = time.perf_counter()
+    response = None
+    try:
+        response = await client.get(url, params=params, headers=headers, timeout=timeout, **kwargs)
+        return response
+    finally:
+        _observe(url, started, response)
+
+
+async def async_post(url, data=None, json=None, headers=None, timeout=DEFAULT_TIMEOUT, **kwargs):
+    """Send a POST request over the shared async connection pool, within the request deadline."""
+    timeout = deadline.clamp_timeout(timeout)
+    _count_async_request(url)
+    client = get_async_client()
+    started = time.perf_counter()
+    response = None
+    try:
+        response = await client.post(url, content=data, json=json, headers=headers, timeout=timeout, **kwargs)
+        return response
+    finally:
+        _observe(url, started, response)
+
+
+def async_stream(method, url, timeout=DEFAULT_TIMEOUT, data=None, **kwargs):
+    """
+    Open a streamed request over the shared async connection pool.
+
+    Use as `async with http_client.async_stream(...) as response:`. The timeout
+    applies per read, so it is clamped to the request deadline when opened.
+    """
+    timeout = deadline.clamp_timeout(timeout)
+    _count_async_request(url)
+    client = get_async_client()
+    return client.stream(method, url, content=data, timeout=timeout, **kwargs)
+
+
+def get_pool_stats():
+    """
+    Report connection reuse per upstream host.
+
+    Returns:
+        dict: Per-host request and connection counts for the sync pool, request
+            counts for the async pool, and DNS cache hit/miss counts
+    """
+    hosts = {}
+    pools = _adapter.poolmanager.pools
+    for key in list(pools.keys()):
+        pool = pools.get(key)
+        if pool is None:
+            continue
+        requests_sent = pool.num_requests
+        connections = pool.num_connections
+        hosts[pool.host] = {
+            "requests": requests_sent,
+            "connections_opened": connections,
+            "handshakes_saved": max(requests_sent - connections, 0)
+        }
+
+    with _stats_lock:
+        async_hosts = dict(_async_requests)
+
+    return {
+        "pool_connections": POOL_CONNECTIONS,
+        "pool_maxsize": POOL_MAXSIZE,
+        "hosts": hosts,
+        "async_requests": async_hosts,
+        "dns_cache": _dns_cache.stats()
+    }
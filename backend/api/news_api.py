@@ -1,23 +1,51 @@
 import os
-import requests
-from datetime import datetime, timedelta
+import time
+import logging
+from api import http_client
+from utils.singleflight import single_flight
+from utils.cache_backend import make_cache
+from utils.rate_limiter import get_limiter, RateLimitExceeded
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 
 # Ensure environment variables are loaded
 load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Seconds a ticker's stored articles are served before NewsAPI is asked for newer ones
+NEWS_REFRESH_SECONDS = float(os.getenv("NEWS_REFRESH_SECONDS", "300"))
+NEWS_STORE_SIZE = int(os.getenv("NEWS_STORE_SIZE", "1024"))
+NEWS_TIMEOUT = float(os.getenv("NEWS_TIMEOUT", "10"))
+
+# NewsAPI's publishedAt format
+PUBLISHED_AT_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
 
 class NewsAPI:
     """
     Client for interacting with a news API to get stock-related news.
+    
+    Articles are kept in a per-ticker store (memory, SQLite or Redis, see
+    utils.cache_backend). After the first request for a ticker, NewsAPI is
+    only asked for articles newer than the newest one stored, at most once
+    every NEWS_REFRESH_SECONDS.
+    
+    Articles are returned in NewsAPI's relevancy order. Each fetch is sorted
+    by relevancy, and an article keeps its relative position in the fetch it
+    came from as "relevance_rank" (0 for the most relevant, below 1 for the
+    rest), so refreshed articles interleave with the stored ones instead of
+    all ranking below them.
     """
     
     def __init__(self):
         self.api_key = os.getenv("NEWS_API_KEY")
         self.base_url = "https://newsapi.org/v2"
+        self.store = make_cache("news_articles", maxsize=NEWS_STORE_SIZE, ttl=7 * 86400)
+        self.limiter = get_limiter("newsapi")
         
         if not self.api_key:
             raise ValueError("News API key not found in environment variables")
     
+    @single_flight("newsapi_company_news")
     def get_company_news(self, ticker, days=7):
         """
         Get news articles about a company based on its ticker symbol.
@@ -25,36 +53,89 @@ class NewsAPI:
         Args:
             ticker (str): The stock ticker symbol
             days (int): Number of days to look back for news
-            
+        
         Returns:
-            list: News articles
+            list: News articles, most relevant first
         """
-        # Calculate date range
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
+        now = time.time()
+        cutoff = self._format_time(now - days * 86400)
+        entry = self.store.get(ticker)
+        
+        # The stored window must reach back as far as this request does
+        if entry is not None and entry["days"] < days:
+            entry = None
         
-        # Format dates for the API
-        from_date = start_date.strftime("%Y-%m-%d")
-        to_date = end_date.strftime("%Y-%m-%d")
+        if entry is not None and now - entry["fetched_at"] < NEWS_REFRESH_SECONDS:
+            return self._within(entry["articles"], cutoff)
         
-        # Construct query using the ticker symbol and company name
-        query = f"{ticker} stock"
+        try:
+            if entry is None:
+                articles = self._fetch(ticker, from_date=cutoff[:10])
+                window = days
+            else:
+                # Only what was published since the newest stored article
+                newer = self._fetch(ticker, from_date=entry["newest"])
+                window = entry["days"]
+                articles = self._merge(entry["articles"], newer)
+                logger.info(f"Fetched {len(newer)} new articles for {ticker} since {entry['newest']}")
+        except Exception as e:
+            if entry is None:
+                raise
+            # Serve what is stored if NewsAPI fails
+            logger.error(f"Error refreshing news for {ticker}, serving stored articles: {str(e)}")
+            return self._within(entry["articles"], cutoff)
+        
+        # Expire anything older than the stored lookback
+        articles = self._within(articles, self._format_time(now - window * 86400))
+        self.store.set(ticker, {
+            "articles": articles,
+            "newest": max((article.get("publishedAt") or "" for article in articles), default="") or cutoff,
+            "fetched_at": now,
+            "days": window
+        }, ttl=window * 86400)
+        return self._within(articles, cutoff)
+    
+    def _fetch(self, ticker, from_date):
+        """Request articles about a ticker published on or after from_date, ranked by relevancy."""
+        # Fail fast when the quota is spent; stored articles are served instead
+        if not self.limiter.try_acquire():
+            raise RateLimitExceeded("NewsAPI rate limit reached")
         
         params = {
-            "q": query,
+            "q": f"{ticker} stock",
             "from": from_date,
-            "to": to_date,
             "language": "en",
             "sortBy": "relevancy",
             "apiKey": self.api_key
         }
         
-        response = requests.get(f"{self.base_url}/everything", params=params)
+        response = http_client.get(f"{self.base_url}/everything", params=params, timeout=NEWS_TIMEOUT)
         data = response.json()
         
         # Check for error responses
         if response.status_code != 200:
             raise ValueError(f"API Error: {data.get('message', 'Unknown error')}")
         
-        # Return articles or empty list if none found
-        return data.get("articles", [])
+        articles = data.get("articles", [])
+        for position, article in enumerate(articles):
+            article["relevance_rank"] = position / len(articles)
+        return articles
+    
+    @staticmethod
+    def _merge(stored, newer):
+        """Merge newly fetched articles into the stored ones, newer copies replacing older ones."""
+        merged = {}
+        for article in stored + newer:
+            merged[article.get("url") or (article.get("title"), article.get("publishedAt"))] = article
+        return list(merged.values())
+    
+    @staticmethod
+    def _within(articles, cutoff):
+        """Return the articles published at or after cutoff, most relevant first and newest first among equals."""
+        recent = [article for article in articles if (article.get("publishedAt") or "") >= cutoff]
+        recent.sort(key=lambda article: article.get("publishedAt") or "", reverse=True)
+        return sorted(recent, key=lambda article: article.get("relevance_rank", 1.0))
+    
+    @staticmethod
+    def _format_time(timestamp):
+        return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime(PUBLISHED_AT_FORMAT)
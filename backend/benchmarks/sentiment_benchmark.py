@@ -0,0 +1,48 @@
+"""
+Compare the lexicon scorer and the hashed n-gram model on the bundled
+labelled headline set.
+
+Run from backend/:  python -m benchmarks.sentiment_benchmark [--texts 20000]
+"""
+import argparse
+import time
+import numpy as np
+from utils.sentiment import LexiconSentimentScorer
+from utils.sentiment_model import load_labelled_headlines, load_sentiment_model
+
+def accuracy(scorer, texts, labels):
+    return float(np.mean([predicted == label for predicted, label in zip(scorer.classify_batch(texts), labels)]))
+
+def throughput(scorer, texts, repeats=3):
+    """Texts per second of raw scoring, bypassing the memo."""
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        scorer._scan(texts)
+        best = min(best, time.perf_counter() - started)
+    return len(texts) / best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--texts", type=int, default=20000, help="Texts per throughput batch")
+    args = parser.parse_args()
+
+    test_texts, test_labels = load_labelled_headlines(split="test")
+    all_texts, _ = load_labelled_headlines()
+    # Distinct texts so nothing is served from a memo
+    batch = [f"{all_texts[i % len(all_texts)]} #{i}" for i in range(args.texts)]
+
+    started = time.perf_counter()
+    model = load_sentiment_model()
+    load_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    lexicon = LexiconSentimentScorer()
+    compile_ms = (time.perf_counter() - started) * 1000
+
+    print(f"{'scorer':<10} {'setup ms':>9} {'accuracy':>9} {'texts/s':>10}")
+    for name, scorer, setup_ms in (("lexicon", lexicon, compile_ms), ("model", model, load_ms)):
+        print(f"{name:<10} {setup_ms:>9.1f} {accuracy(scorer, test_texts, test_labels):>9.1%} {throughput(scorer, batch):>10,.0f}")
+    print(f"accuracy on {len(test_texts)} held-out headlines; throughput over {len(batch):,} texts")
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,35 @@
 import os
+import json
+import time
 import uvicorn
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from typing import List, Optional
+from contextlib import asynccontextmanager
+from functools import lru_cache
 from dotenv import load_dotenv
 from agents.orchestrator import StockOrchestratorAgent
+from api import http_client
+from utils.llm import analysis_cache
+from utils.singleflight import flights
+from utils.data_processing import indicator_engine
+from utils.rate_limiter import limiter_stats
+from utils.deadline import deadline_scope, parse_deadline
+from utils import metrics
 
 # Load environment variables
 load_dotenv()
 
-app = FastAPI(title="StockBot API", description="Multi-agent stock analysis system")
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    # Release the pooled async connections on shutdown
+    await http_client.aclose_async_client()
+
+app = FastAPI(title="StockBot API", description="Multi-agent stock analysis system", lifespan=lifespan)
 
 # Get frontend URL from environment or use the deployed Vercel URL
 frontend_url = os.environ.get("FRONTEND_URL", "https://stock-bot-google-adk.vercel.app")
@@ -35,20 +55,148 @@ class Response(BaseModel):
     answer: str
     metadata: dict = {}
 
+class BatchQuery(BaseModel):
+    queries: List[str]
+    max_concurrency: Optional[int] = None
+
+class BatchItem(BaseModel):
+    query: str
+    answer: Optional[str] = None
+    metadata: dict = {}
+    error: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    results: List[BatchItem]
+
+# Largest batch accepted by /query/batch and most symbols accepted by /quotes
+BATCH_MAX_QUERIES = int(os.environ.get("BATCH_MAX_QUERIES", "500"))
+QUOTES_MAX_SYMBOLS = int(os.environ.get("QUOTES_MAX_SYMBOLS", "500"))
+
 # Initialize the orchestrator agent
 orchestrator = StockOrchestratorAgent()
 
+# Cache hit and miss counters for /metrics
+metrics.watch_caches({
+    "quotes": orchestrator.ticker_price_agent.quote_cache,
+    "ticker_valid": orchestrator.identify_ticker_agent.valid_tickers,
+    "ticker_invalid": orchestrator.identify_ticker_agent.invalid_tickers,
+    "ticker_search": orchestrator.identify_ticker_agent.search_results,
+    "news_store": orchestrator.ticker_news_agent.news_api.store,
+    "llm_analysis": analysis_cache
+})
+
+@lru_cache(maxsize=1)
+def _route_paths():
+    return frozenset(route.path for route in app.routes)
+
+@app.middleware("http")
+async def track_requests(request: Request, call_next):
+    # Label by route so unknown paths cannot grow the label set; streamed
+    # responses are counted until their headers are sent
+    endpoint = request.url.path if request.url.path in _route_paths() else "other"
+    started = time.perf_counter()
+    with metrics.REQUESTS_IN_FLIGHT.track(endpoint):
+        try:
+            return await call_next(request)
+        finally:
+            metrics.REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint)
+
 @app.post("/query", response_model=Response)
-async def process_query(query: Query):
+async def process_query(query: Query, x_request_deadline: Optional[str] = Header(None)):
     try:
-        result = orchestrator.process_query(query.text)
+        with deadline_scope(parse_deadline(x_request_deadline)):
+            result = await orchestrator.process_query_async(query.text)
         return Response(answer=result["answer"], metadata=result["metadata"])
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/query/batch", response_model=BatchResponse)
+async def process_batch(batch: BatchQuery, x_request_deadline: Optional[str] = Header(None)):
+    if len(batch.queries) > BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_QUERIES} queries per batch")
+    try:
+        kwargs = {"max_concurrency": batch.max_concurrency} if batch.max_concurrency else {}
+        # The client's deadline bounds the whole batch; items it leaves no time for report an error
+        with deadline_scope(parse_deadline(x_request_deadline)):
+            items = await orchestrator.process_batch_async(batch.queries, **kwargs)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return BatchResponse(results=[
+        BatchItem(
+            query=item["query"],
+            answer=item["result"]["answer"] if item["result"] else None,
+            metadata=item["result"]["metadata"] if item["result"] else {},
+            error=item["error"]
+        )
+        for item in items
+    ])
+
+@app.get("/quotes")
+async def get_quotes(symbols: str, x_request_deadline: Optional[str] = Header(None)):
+    tickers = [symbol.strip().upper() for symbol in symbols.split(",") if symbol.strip()]
+    if not tickers:
+        raise HTTPException(status_code=400, detail="No symbols given")
+    if len(tickers) > QUOTES_MAX_SYMBOLS:
+        raise HTTPException(status_code=413, detail=f"At most {QUOTES_MAX_SYMBOLS} symbols per request")
+    try:
+        with deadline_scope(parse_deadline(x_request_deadline)):
+            quotes = await run_in_threadpool(orchestrator.ticker_price_agent.get_prices, tickers)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"quotes": quotes}
+
+async def _sse_events(text, deadline_seconds):
+    """Format the orchestrator's streamed results as server-sent events."""
+    try:
+        # The scope is set here because the body is streamed after the endpoint returns
+        with deadline_scope(deadline_seconds):
+            async for event, data in orchestrator.stream_query_async(text):
+                yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+    except Exception as e:
+        yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+    yield "event: done\ndata: {}\n\n"
+
+def _sse_response(text, x_request_deadline):
+    return StreamingResponse(
+        _sse_events(text, parse_deadline(x_request_deadline)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/query/stream")
+async def stream_query_get(text: str, x_request_deadline: Optional[str] = Header(None)):
+    # GET variant for browser EventSource clients
+    return _sse_response(text, x_request_deadline)
+
+@app.post("/query/stream")
+async def stream_query(query: Query, x_request_deadline: Optional[str] = Header(None)):
+    return _sse_response(query.text, x_request_deadline)
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/stats")
+async def stats():
+    return {
+        "http": http_client.get_pool_stats(),
+        "quote_cache": orchestrator.ticker_price_agent.quote_cache.stats(),
+        "quote_providers": orchestrator.ticker_price_agent.quote_router.stats(),
+        "ticker_validation": {
+            "valid": orchestrator.identify_ticker_agent.valid_tickers.stats(),
+            "invalid": orchestrator.identify_ticker_agent.invalid_tickers.stats(),
+            "search": orchestrator.identify_ticker_agent.search_results.stats()
+        },
+        "news_store": orchestrator.ticker_news_agent.news_api.store.stats(),
+        "llm_cache": analysis_cache.stats(),
+        "indicators": indicator_engine.stats(),
+        "singleflight": flights.stats(),
+        "rate_limits": limiter_stats()
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
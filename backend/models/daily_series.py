@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+
+# Field names of the Alpha Vantage daily shape the clients used to return
+LEGACY_FIELDS = ("1. open", "2. high", "3. low", "4. close", "5. volume")
+
+class DailySeries:
+    """
+    Columnar daily OHLCV bars for one symbol.
+
+    Dates are sorted ascending datetime64[D] values without duplicates; prices
+    are float64 and volumes int64 arrays of the same length. Index -1 is the
+    newest bar.
+    """
+
+    __slots__ = ("symbol", "dates", "open", "high", "low", "close", "volume")
+
+    def __init__(self, dates, open, high, low, close, volume, symbol=None):
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        columns = [
+            np.asarray(open, dtype=np.float64),
+            np.asarray(high, dtype=np.float64),
+            np.asarray(low, dtype=np.float64),
+            np.asarray(close, dtype=np.float64),
+            np.asarray(volume, dtype=np.float64).astype(np.int64)
+        ]
+        if len(dates) > 1 and not np.all(dates[1:] > dates[:-1]):
+            # Sort, keeping the last occurrence of a repeated date
+            order = np.argsort(dates, kind="stable")
+            dates = dates[order]
+            keep = np.append(dates[1:] != dates[:-1], True)
+            dates = dates[keep]
+            columns = [column[order][keep] for column in columns]
+        self.symbol = symbol
+        self.dates = dates
+        self.open, self.high, self.low, self.close, self.volume = columns
+
+    @classmethod
+    def empty(cls, symbol=None):
+        return cls([], [], [], [], [], [], symbol=symbol)
+
+    @classmethod
+    def from_fmp_historical(cls, items, symbol=None):
+        """
+        Build a series from FMP's historical-price-full "historical" list.
+
+        Args:
+            items (list): Dicts with date, open, high, low, close and volume
+            symbol (str): Stock ticker symbol
+        """
+        count = len(items)
+        return cls(
+            np.array([item["date"][:10] for item in items], dtype="datetime64[D]"),
+            np.fromiter((item["open"] for item in items), dtype=np.float64, count=count),
+            np.fromiter((item["high"] for item in items), dtype=np.float64, count=count),
+            np.fromiter((item["low"] for item in items), dtype=np.float64, count=count),
+            np.fromiter((item["close"] for item in items), dtype=np.float64, count=count),
+            np.fromiter((item.get("volume") or 0 for item in items), dtype=np.float64, count=count),
+            symbol=symbol
+        )
+
+    @classmethod
+    def from_rows(cls, rows, symbol=None):
+        """Build a series from (date, open, high, low, close, volume) tuples."""
+        if not rows:
+            return cls.empty(symbol)
+        dates, opens, highs, lows, closes, volumes = zip(*rows)
+        return cls(dates, opens, highs, lows, closes, volumes, symbol=symbol)
+
+    @classmethod
+    def from_legacy_dict(cls, time_series, symbol=None):
+        """Build a series from bars in the Alpha Vantage daily shape, keyed by date."""
+        return cls.from_rows([
+            (date_str,) + tuple(float(bar[field]) for field in LEGACY_FIELDS)
+            for date_str, bar in time_series.items()
+        ], symbol=symbol)
+
+    def to_legacy_dict(self):
+        """Return the bars in the Alpha Vantage daily shape, newest first."""
+        legacy = {}
+        for i in range(len(self) - 1, -1, -1):
+            legacy[str(self.dates[i])] = {
+                "1. open": str(self.open[i]),
+                "2. high": str(self.high[i]),
+                "3. low": str(self.low[i]),
+                "4. close": str(self.close[i]),
+                "5. volume": str(self.volume[i])
+            }
+        return legacy
+
+    def to_dataframe(self):
+        """Return a DataFrame indexed by date with open, high, low, close and volume columns."""
+        return pd.DataFrame(
+            {"open": self.open, "high": self.high, "low": self.low, "close": self.close, "volume": self.volume},
+            index=pd.DatetimeIndex(self.dates.astype("datetime64[ns]"), name="date")
+        )
+
+    def date_strings(self):
+        """Return the dates as YYYY-MM-DD strings."""
+        return np.datetime_as_string(self.dates, unit="D")
+
+    @property
+    def last_date(self):
+        """Date (YYYY-MM-DD) of the newest bar, or None if empty."""
+        return str(self.dates[-1]) if len(self) else None
+
+    def tail(self, count):
+        """Return the newest count bars."""
+        return self[max(len(self) - count, 0):]
+
+    def since(self, date_str):
+        """Return the bars on or after a YYYY-MM-DD date."""
+        return self[int(np.searchsorted(self.dates, np.datetime64(date_str, "D"))):]
+
+    def __getitem__(self, index):
+        """Slice the series by bar position."""
+        if not isinstance(index, slice):
+            raise TypeError("DailySeries only supports slicing; index the column arrays for single bars")
+        return DailySeries(
+            self.dates[index], self.open[index], self.high[index], self.low[index],
+            self.close[index], self.volume[index], symbol=self.symbol
+        )
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __eq__(self, other):
+        if not isinstance(other, DailySeries):
+            return NotImplemented
+        return all(
+            np.array_equal(getattr(self, name), getattr(other, name))
+            for name in ("dates", "open", "high", "low", "close", "volume")
+        )
+
+    def __repr__(self):
+        span = f"{self.dates[0]}..{self.dates[-1]}" if len(self) else "empty"
+        return f"DailySeries({self.symbol!r}, {len(self)} bars, {span})"
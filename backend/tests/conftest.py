@@ -0,0 +1,9 @@
+import pytest
+from utils import rate_limiter
+
+@pytest.fixture(autouse=True)
+def isolated_rate_limits(monkeypatch):
+    """Give every test fresh per-process buckets instead of the shared on-disk ones"""
+    monkeypatch.setattr(rate_limiter, "RATE_LIMIT_BACKEND", "memory")
+    monkeypatch.setattr(rate_limiter, "_limiters", {})
+    yield
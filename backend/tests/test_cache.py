@@ -0,0 +1,108 @@
+import time
+from datetime import date, datetime
+from agents.ticker_price import TickerPriceAgent
+from utils.cache import TTLCache
+from utils.market_hours import MARKET_TZ, is_market_open, nyse_holidays
+
+def test_ttl_cache_expiry():
+    """Test that entries expire after their TTL"""
+    cache = TTLCache(maxsize=10, ttl=0.05)
+    cache.set("AAPL", 1)
+    assert cache.get("AAPL") == 1
+    time.sleep(0.06)
+    assert cache.get("AAPL") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_ttl_cache_lru_eviction():
+    """Test that the least recently used entry is evicted first"""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("AAPL", 1)
+    cache.set("MSFT", 2)
+    cache.get("AAPL")
+    cache.set("TSLA", 3)
+    assert cache.get("MSFT") is None
+    assert cache.get("AAPL") == 1
+    assert cache.stats()["evictions"] == 1
+
+def test_market_hours():
+    """Test regular session detection around weekends and holidays"""
+    assert is_market_open(datetime(2026, 10, 16, 10, 0, tzinfo=MARKET_TZ))
+    assert not is_market_open(datetime(2026, 10, 16, 16, 30, tzinfo=MARKET_TZ))
+    assert not is_market_open(datetime(2026, 10, 17, 10, 0, tzinfo=MARKET_TZ))
+    assert date(2026, 11, 26) in nyse_holidays(2026)
+    assert date(2026, 7, 3) in nyse_holidays(2026)
+
+def test_price_agent_serves_repeat_quotes_from_cache(monkeypatch):
+    """Test that a second lookup is a cache hit and says so in the source"""
+    agent = TickerPriceAgent()
+    agent.fmp_api_key = "test"
+    calls = []
+    
+    def fake_quote(ticker):
+        calls.append(ticker)
+        return {"price": 123.45, "currency": "USD", "success": True, "source": "fmp_api"}
+    
+    monkeypatch.setattr(agent, "_get_real_time_price", fake_quote)
+    
+    first = agent.get_price("AAPL")
+    second = agent.get_price("AAPL")
+    
+    assert calls == ["AAPL"]
+    assert first["source"] == "fmp_api"
+    assert second["source"] == "cache:fmp_api"
+    assert second["price"] == 123.45
+
+def test_llm_analysis_cache(monkeypatch):
+    """Test that equivalent analysis inputs reuse one LLM response"""
+    from utils import llm
+    calls = []
+    
+    def fake_request(*args):
+        calls.append(args)
+        return {"summary": "Up on earnings", "detailed_analysis": "Details"}
+    
+    monkeypatch.setattr(llm, "OPENROUTER_API_KEY", "test")
+    monkeypatch.setattr(llm, "_request_analysis", fake_request)
+    llm.analysis_cache.clear()
+    
+    news = {"headlines": ["Apple beats estimates", "iPhone sales rise"]}
+    reordered_news = {"headlines": ["iPhone  sales rise", "Apple beats estimates"]}
+    change = {"timeframe": "today"}
+    
+    first = llm.generate_analysis_with_llm("AAPL", "Why did Apple rise?", {"price": 200.00}, news, change)
+    second = llm.generate_analysis_with_llm("AAPL", "why is apple up", {"price": 200.05}, reordered_news, change)
+    other_intent = llm.generate_analysis_with_llm("AAPL", "Should I buy Apple?", {"price": 200.00}, news, change)
+    
+    assert first == second == other_intent
+    assert len(calls) == 2
+
+def test_single_flight_coalesces_concurrent_calls():
+    """Test that concurrent callers with the same key share one execution"""
+    import threading
+    from utils.singleflight import SingleFlight
+    
+    flights = SingleFlight()
+    calls = []
+    release = threading.Event()
+    
+    def fetch(symbol):
+        calls.append(symbol)
+        release.wait(1)
+        return {"symbol": symbol, "price": 1.0}
+    
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(flights.do(("quote", "AAPL"), fetch, "AAPL")))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+    
+    assert calls == ["AAPL"]
+    assert results == [{"symbol": "AAPL", "price": 1.0}] * 5
+    assert flights.stats()["endpoints"]["quote"] == {"executed": 1, "deduplicated": 4}
@@ -0,0 +1,105 @@
+import socketserver
+import threading
+import time
+import pytest
+from utils.cache_backend import RedisBackend, SharedCache, SQLiteBackend
+
+class _RespHandler(socketserver.StreamRequestHandler):
+    """Minimal Redis stand-in supporting the commands the backend sends."""
+
+    def _read_command(self):
+        header = self.rfile.readline()
+        if not header:
+            return None
+        args = []
+        for _ in range(int(header[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2].decode())
+        return args
+
+    def handle(self):
+        store = self.server.store
+        while True:
+            args = self._read_command()
+            if args is None:
+                return
+            command = args[0].upper()
+            now = time.time()
+            if command == "GET":
+                value, expires_at = store.get(args[1], (None, 0))
+                if value is None or expires_at <= now:
+                    self.wfile.write(b"$-1\r\n")
+                else:
+                    self.wfile.write(b"$%d\r\n%s\r\n" % (len(value.encode()), value.encode()))
+            elif command == "SET":
+                store[args[1]] = (args[2], now + int(args[4]) / 1000)
+                self.wfile.write(b"+OK\r\n")
+            elif command == "DEL":
+                removed = sum(store.pop(key, None) is not None for key in args[1:])
+                self.wfile.write(b":%d\r\n" % removed)
+            elif command == "SCAN":
+                prefix = args[3].rstrip("*")
+                keys = [key for key in store if key.startswith(prefix)]
+                reply = b"*2\r\n$1\r\n0\r\n*%d\r\n" % len(keys)
+                reply += b"".join(b"$%d\r\n%s\r\n" % (len(k.encode()), k.encode()) for k in keys)
+                self.wfile.write(reply)
+            else:
+                self.wfile.write(b"-ERR unknown command\r\n")
+
+@pytest.fixture
+def resp_server():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _RespHandler)
+    server.daemon_threads = True
+    server.store = {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_redis_backend_shares_entries_between_caches(resp_server):
+    """Test that two workers' caches see each other's writes through the server"""
+    url = f"redis://127.0.0.1:{resp_server.server_address[1]}/0"
+    worker_a = SharedCache("quotes", RedisBackend(url), ttl=60)
+    worker_b = SharedCache("quotes", RedisBackend(url), ttl=60)
+
+    worker_a.set("AAPL", {"price": 175.3, "source": "fmp"})
+    assert worker_b.get("AAPL") == {"price": 175.3, "source": "fmp"}
+    assert "stockbot:quotes:AAPL" in resp_server.store
+
+    worker_a.set("TSLA", {"price": 1.0}, ttl=0.05)
+    time.sleep(0.08)
+    assert worker_b.get("TSLA") is None
+
+    worker_b.clear()
+    assert worker_a.get("AAPL") is None
+    assert worker_b.stats()["hits"] == 1
+
+def test_shared_cache_treats_backend_outage_as_miss():
+    """Test that an unreachable server degrades to cache misses"""
+    cache = SharedCache("quotes", RedisBackend("redis://127.0.0.1:1/0", timeout=0.2), ttl=60)
+    cache.set("AAPL", {"price": 1.0})
+    assert cache.get("AAPL", "missing") == "missing"
+    assert cache.stats()["errors"] == 2
+
+def test_shared_cache_treats_corrupt_value_as_miss(tmp_path):
+    """Test that a value that is not our JSON is a counted miss, not an exception"""
+    backend = SQLiteBackend(str(tmp_path / "cache.sqlite3"))
+    cache = SharedCache("quotes", backend, ttl=60)
+    backend.set("stockbot:quotes:AAPL", "{not json", 60)
+
+    assert cache.get("AAPL", "missing") == "missing"
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["errors"] == 1
+
+def test_sqlite_backend_shares_entries_between_processes(tmp_path):
+    """Test that separate backends on the same file share entries and expiry"""
+    path = str(tmp_path / "cache.sqlite3")
+    worker_a = SharedCache("llm_analysis", SQLiteBackend(path), ttl=60)
+    worker_b = SharedCache("llm_analysis", SQLiteBackend(path), ttl=60)
+
+    worker_a.set(("AAPL", "week"), {"summary": "Up on earnings"})
+    assert worker_b.get(("AAPL", "week")) == {"summary": "Up on earnings"}
+
+    worker_a.set("short", True, ttl=0.05)
+    time.sleep(0.08)
+    assert worker_b.get("short") is None
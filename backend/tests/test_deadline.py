@@ -0,0 +1,62 @@
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from utils import deadline, llm
+from utils.deadline import deadline_scope, parse_deadline, DeadlineExceeded, REQUEST_DEADLINE_MAX_SECONDS, REQUEST_DEADLINE_SECONDS
+from utils.rate_limiter import TokenBucket
+
+def test_parse_deadline():
+    """Test that header values are parsed, capped and defaulted"""
+    assert parse_deadline("5") == 5.0
+    assert parse_deadline(None) == REQUEST_DEADLINE_SECONDS
+    assert parse_deadline("soon") == REQUEST_DEADLINE_SECONDS
+    assert parse_deadline("-1") == REQUEST_DEADLINE_SECONDS
+    assert parse_deadline("100000") == REQUEST_DEADLINE_MAX_SECONDS
+
+def test_nested_scopes_keep_the_tighter_deadline():
+    """Test that an inner scope cannot extend the request's deadline"""
+    assert deadline.remaining() is None
+    with deadline_scope(1):
+        with deadline_scope(60):
+            assert deadline.remaining() <= 1
+        with deadline_scope(0.5):
+            assert deadline.remaining() <= 0.5
+    assert deadline.remaining() is None
+
+def test_clamp_timeout():
+    """Test that call timeouts shrink to the time left and fail once it is spent"""
+    assert deadline.clamp_timeout(10) == 10
+    with deadline_scope(2):
+        assert deadline.clamp_timeout(10) <= 2
+        assert deadline.clamp_timeout(1) == 1
+    with deadline_scope(0.01):
+        time.sleep(0.02)
+        with pytest.raises(DeadlineExceeded):
+            deadline.clamp_timeout(10)
+
+def test_bind_carries_the_deadline_to_executor_threads():
+    """Test that bound work sees the caller's deadline on a pool thread"""
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        with deadline_scope(5):
+            unbound = executor.submit(deadline.remaining).result()
+            bound = executor.submit(deadline.bind(deadline.remaining)).result()
+    assert unbound is None
+    assert 0 < bound <= 5
+
+def test_rate_limit_waits_end_at_the_deadline():
+    """Test that acquire gives up at the deadline instead of waiting out its timeout"""
+    bucket = TokenBucket("test", rate=1, burst=1)
+    assert bucket.try_acquire()
+    started = time.monotonic()
+    with deadline_scope(0.1):
+        assert not bucket.acquire(timeout=5)
+    assert time.monotonic() - started < 0.5
+
+def test_llm_is_skipped_near_the_deadline(monkeypatch):
+    """Test that the template analysis is used when the deadline leaves too little time for the LLM"""
+    def fail_post(*args, **kwargs):
+        raise AssertionError("LLM should not be called")
+
+    monkeypatch.setattr("utils.llm.http_client.post", fail_post)
+    with deadline_scope(llm.LLM_MIN_SECONDS / 2):
+        assert llm._request_analysis("AAPL", "query", {}, {}, {}) is None
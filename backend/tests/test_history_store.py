@@ -0,0 +1,107 @@
+from datetime import date
+import pytest
+from models.daily_series import DailySeries
+from utils import history_store
+from utils.history_store import HistoryStore
+
+def make_bars(dates, close=100.0):
+    return {
+        d: {"1. open": str(close), "2. high": str(close + 1), "3. low": str(close - 1),
+            "4. close": str(close), "5. volume": "1000"}
+        for d in dates
+    }
+
+class FakeFetcher:
+    def __init__(self, bars):
+        self.bars = bars
+        self.calls = []
+
+    def __call__(self, symbol, outputsize="compact", from_date=None):
+        self.calls.append(from_date)
+        series = DailySeries.from_legacy_dict(self.bars, symbol=symbol)
+        return series.since(from_date) if from_date else series
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_store, "is_market_open", lambda: False)
+    monkeypatch.setattr(history_store, "last_completed_session", lambda: date(2026, 10, 16))
+    return HistoryStore(path=str(tmp_path / "history.sqlite3"), recheck_seconds=0)
+
+def test_repeat_lookup_is_local(store):
+    """Test that an up-to-date symbol is served without calling the provider"""
+    fetch = FakeFetcher(make_bars(["2026-10-14", "2026-10-15", "2026-10-16"]))
+    first = store.get_daily_time_series("AAPL", fetch)
+    second = store.get_daily_time_series("AAPL", fetch)
+    
+    assert fetch.calls == [None]
+    assert first == second
+    assert second.date_strings().tolist() == ["2026-10-14", "2026-10-15", "2026-10-16"]
+
+def test_only_missing_tail_is_fetched(store, monkeypatch):
+    """Test that a stale symbol only fetches bars since the newest stored one"""
+    fetch = FakeFetcher(make_bars(["2026-10-14", "2026-10-15"]))
+    monkeypatch.setattr(history_store, "last_completed_session", lambda: date(2026, 10, 15))
+    store.get_daily_time_series("AAPL", fetch)
+    
+    fetch.bars.update(make_bars(["2026-10-16"], close=110.0))
+    monkeypatch.setattr(history_store, "last_completed_session", lambda: date(2026, 10, 16))
+    series = store.get_daily_time_series("AAPL", fetch)
+    
+    assert fetch.calls == [None, "2026-10-15"]
+    assert series.last_date == "2026-10-16"
+    assert series.close.tolist() == [100.0, 100.0, 110.0]
+
+def test_failed_backfill_waits_out_the_recheck_interval(tmp_path, monkeypatch):
+    """Test that an unknown symbol is not refetched on every request"""
+    store = HistoryStore(path=str(tmp_path / "history.sqlite3"), recheck_seconds=900)
+    calls = []
+
+    def failing_fetch(symbol, outputsize="compact", from_date=None):
+        calls.append(symbol)
+        raise ValueError("Unknown symbol")
+
+    assert len(store.get_daily_time_series("ZZZZ", failing_fetch)) == 0
+    assert len(store.get_daily_time_series("ZZZZ", lambda *args, **kwargs: None)) == 0
+    assert calls == ["ZZZZ"]
+
+    monkeypatch.setattr(history_store.time, "time", lambda: 10 ** 10)
+    store.get_daily_time_series("ZZZZ", failing_fetch)
+    assert calls == ["ZZZZ", "ZZZZ"]
+
+def test_failed_deep_backfill_waits_out_the_recheck_interval(store, monkeypatch):
+    """Test that a symbol short of the bars asked for is not backfilled again after a failure"""
+    fetch = FakeFetcher(make_bars(["2026-10-14", "2026-10-15", "2026-10-16"]))
+    store.get_daily_time_series("AAPL", fetch)
+    store.recheck_seconds = 900
+    calls = []
+
+    def rate_limited_fetch(symbol, outputsize="compact", from_date=None):
+        calls.append(outputsize)
+        raise ValueError("Rate limited")
+
+    assert len(store.get_daily_time_series("AAPL", rate_limited_fetch, outputsize="full")) == 3
+    assert len(store.get_daily_time_series("AAPL", rate_limited_fetch, outputsize="full")) == 3
+    assert calls == ["full"]
+
+    monkeypatch.setattr(history_store.time, "time", lambda: 10 ** 10)
+    series = store.get_daily_time_series("AAPL", fetch, outputsize="full")
+    assert fetch.calls == [None, None]
+    assert len(series) == 3
+
+def test_daily_series_adapters():
+    """Test that FMP rows are sorted and deduplicated and round-trip through the legacy shape"""
+    series = DailySeries.from_fmp_historical([
+        {"date": "2026-10-16", "open": 2, "high": 3, "low": 1, "close": 2.5, "volume": 10},
+        {"date": "2026-10-15", "open": 1, "high": 2, "low": 0.5, "close": 1.5, "volume": 20},
+        {"date": "2026-10-16", "open": 2, "high": 3, "low": 1, "close": 2.75, "volume": 30},
+    ], symbol="AAPL")
+    
+    assert series.date_strings().tolist() == ["2026-10-15", "2026-10-16"]
+    assert series.close.tolist() == [1.5, 2.75]
+    assert series.volume.dtype.name == "int64"
+    
+    legacy = series.to_legacy_dict()
+    assert list(legacy) == ["2026-10-16", "2026-10-15"]
+    assert legacy["2026-10-16"]["4. close"] == "2.75"
+    assert DailySeries.from_legacy_dict(legacy) == series
+    assert series.to_dataframe()["close"].tolist() == [1.5, 2.75]
@@ -0,0 +1,83 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from api import http_client
+
+class EchoHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self):
+        body = json.dumps({"path": self.path}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), EchoHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+def test_sync_requests_reuse_connection(server):
+    """Test that repeated calls to one host share a keep-alive connection"""
+    for i in range(5):
+        response = http_client.get(f"{server}/quote/{i}")
+        assert response.json() == {"path": f"/quote/{i}"}
+    
+    host_stats = http_client.get_pool_stats()["hosts"]["127.0.0.1"]
+    assert host_stats["requests"] >= 5
+    assert host_stats["handshakes_saved"] >= 4
+
+def test_async_requests(server):
+    """Test the async face of the shared client"""
+    async def fetch_all():
+        return await asyncio.gather(*(http_client.async_get(f"{server}/news/{i}") for i in range(3)))
+    
+    responses = asyncio.run(fetch_all())
+    assert [r.json()["path"] for r in responses] == ["/news/0", "/news/1", "/news/2"]
+    assert http_client.get_pool_stats()["async_requests"]["127.0.0.1"] >= 3
+
+def test_dns_cache_reuses_resolution():
+    """Test that a resolved host is served from the cache until it expires"""
+    calls = []
+    cache = http_client.DNSCache(ttl=60)
+    cache._resolve = lambda *args: calls.append(args) or [("resolved",)]
+    
+    assert cache.getaddrinfo("example.com", 443) == [("resolved",)]
+    assert cache.getaddrinfo("example.com", 443) == [("resolved",)]
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+
+def test_dns_cache_is_scoped_to_the_pooled_clients(server, monkeypatch):
+    """Test that the cache leaves socket.getaddrinfo alone and still serves both clients"""
+    import socket
+    assert socket.getaddrinfo is not http_client._dns_cache.getaddrinfo
+
+    cache = http_client.DNSCache(ttl=60)
+    resolved = []
+    cache._resolve = lambda host, *args: resolved.append(host) or socket.getaddrinfo("127.0.0.1", *args)
+    monkeypatch.setattr(http_client, "_dns_cache", cache)
+    port = server.rsplit(":", 1)[1]
+
+    session = http_client.requests.Session()
+    session.mount("http://", http_client.CachedDNSAdapter())
+    assert session.get(f"http://stockbot.test:{port}/sync").json() == {"path": "/sync"}
+
+    async def fetch():
+        response = await http_client.async_get(f"http://stockbot.test:{port}/async")
+        await http_client.aclose_async_client()
+        return response
+
+    assert asyncio.run(fetch()).json() == {"path": "/async"}
+    assert resolved == ["stockbot.test"]
+    assert cache.stats()["hits"] == 1
@@ -0,0 +1,130 @@
+import pytest
+from agents.identify_ticker import IdentifyTickerAgent
+from utils.symbol_index import SymbolIndex
+
+@pytest.fixture
+def index():
+    index = SymbolIndex()
+    index.add("AAL", "American Airlines Group Inc.", ["american airlines"])
+    index.add("AXP", "American Express Company", ["amex"])
+    index.add("KO", "The Coca-Cola Company", ["coke"])
+    index.add("TGT", "Target Corporation")
+    return index
+
+def test_index_finds_every_name_in_one_pass(index):
+    """Test that all mentioned names are reported with their positions"""
+    matches = index.find_all("is coke or american express the better buy than american airlines")
+    assert [(m[2], m[3]) for m in matches] == [
+        ("KO", "coke"), ("AXP", "american express"), ("AAL", "american airlines")
+    ]
+
+def test_index_prefers_longest_name(index):
+    """Test that a longer name wins over a shorter name it contains"""
+    assert index.best_match("american express earnings")["symbol"] == "AXP"
+    assert index.best_match("how is the coca-cola company doing")["symbol"] == "KO"
+
+def test_index_skips_ambiguous_short_names(index):
+    """Test that ordinary words derived from listed names are not indexed"""
+    assert index.best_match("did the stock hit its price target") is None
+    assert index.lookup("Target Corporation") == "TGT"
+
+def test_identify_resolves_locally(monkeypatch):
+    """Test that a known company name resolves without any network call"""
+    def no_network(*args, **kwargs):
+        raise AssertionError("unexpected network call")
+    
+    monkeypatch.setattr("api.http_client.get", no_network)
+    result = IdentifyTickerAgent().identify("Why did Tesla stock drop today?")
+    assert result["ticker"] == "TSLA"
+    assert result["company_name"] == "Tesla, Inc."
+    assert result["timeframe"] == "today"
+
+class FakeResponse:
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self._data = data
+
+    def json(self):
+        return self._data
+
+def test_ticker_validation_is_cached(monkeypatch):
+    """Test that both valid and invalid ticker lookups hit the API only once"""
+    calls = []
+    
+    def fake_get(url, **kwargs):
+        calls.append(url)
+        if "/profile/ZZZZ" in url:
+            return FakeResponse(200, [{"companyName": "Zeta Corp"}])
+        return FakeResponse(200, [])
+    
+    monkeypatch.setattr("api.http_client.get", fake_get)
+    agent = IdentifyTickerAgent()
+    
+    assert agent.validate_ticker("ZZZZ") == "Zeta Corp"
+    assert agent.validate_ticker("ZZZZ") == "Zeta Corp"
+    assert agent.validate_ticker("QQQX") is None
+    assert agent.validate_ticker("QQQX") is None
+    assert agent.validate_ticker("CEO") is None
+    assert agent.validate_ticker("AAPL") == "Apple Inc."
+    
+    assert len(calls) == 2
+    assert agent.invalid_tickers.stats()["hits"] == 2
+
+def test_phrase_search_respects_priority(monkeypatch):
+    """Test that a slower higher-priority hit beats a faster lower-priority one"""
+    import time
+    answers = {
+        "alpha beta gamma": (0.2, ("ABG", "Alpha Beta Gamma Inc.")),
+        "alpha beta": (0.0, ("AB", "Alpha Beta Inc.")),
+        "beta gamma": (0.0, (None, None)),
+        "gamma delta": (1.0, ("GD", "Gamma Delta Inc.")),
+    }
+    started = []
+    
+    def fake_lookup(phrase):
+        started.append(phrase)
+        delay, result = answers[phrase]
+        time.sleep(delay)
+        return result
+    
+    agent = IdentifyTickerAgent()
+    monkeypatch.setattr(agent, "get_ticker_from_api", fake_lookup)
+    
+    start = time.monotonic()
+    result = agent._resolve_phrases(list(answers))
+    
+    assert result == ("ABG", "Alpha Beta Gamma Inc.")
+    assert time.monotonic() - start < 1.0
+
+def test_phrase_search_time_budget(monkeypatch):
+    """Test that the search gives up when its time budget runs out"""
+    import time
+    monkeypatch.setattr("agents.identify_ticker.PHRASE_SEARCH_BUDGET", 0.2)
+    agent = IdentifyTickerAgent()
+    monkeypatch.setattr(agent, "get_ticker_from_api", lambda phrase: time.sleep(1) or (None, None))
+    
+    start = time.monotonic()
+    assert agent._resolve_phrases(["slow one", "slow two"]) == (None, None)
+    assert time.monotonic() - start < 0.5
+
+def test_fallback_shares_phrase_search_budget(monkeypatch):
+    """Test that the whole-query fallback is skipped once the phrase search spent the budget"""
+    import time
+    monkeypatch.setattr("agents.identify_ticker.PHRASE_SEARCH_BUDGET", 0.2)
+    agent = IdentifyTickerAgent()
+    lookups = []
+    
+    def slow_lookup(phrase):
+        lookups.append(phrase)
+        time.sleep(1)
+        return None, None
+    
+    monkeypatch.setattr(agent, "get_ticker_from_api", slow_lookup)
+    monkeypatch.setattr("agents.identify_ticker.word_tokenize", str.split)
+    
+    start = time.monotonic()
+    result = agent.identify("how is zorblax quintaro doing")
+    
+    assert result["ticker"] is None
+    assert time.monotonic() - start < 0.5
+    assert len(lookups) <= 4
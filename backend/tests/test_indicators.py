@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from agents.ticker_analysis import TickerAnalysisAgent
+from models.daily_series import DailySeries
+from utils.data_processing import IndicatorEngine, IndicatorState
+
+def random_series(bars=400, symbol="TEST"):
+    rng = np.random.default_rng(7)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, bars)))
+    dates = np.datetime64("2024-01-01") + np.arange(bars)
+    return DailySeries(dates, close, close * 1.01, close * 0.99, close, rng.integers(1000, 2000, bars), symbol=symbol)
+
+def assert_same_indicators(expected, actual):
+    assert expected.keys() == actual.keys()
+    for key, value in expected.items():
+        if isinstance(value, float):
+            assert actual[key] == pytest.approx(value, rel=1e-6, abs=1e-3), key
+        else:
+            assert actual[key] == value, key
+
+def test_incremental_update_matches_full_compute():
+    """Test that advancing bar by bar gives the same indicators as a full pass"""
+    series = random_series()
+    state = IndicatorState.from_series(series[:300])
+    for i in range(300, len(series)):
+        state = state.update(str(series.dates[i]), series.high[i], series.low[i], series.close[i], series.volume[i])
+    
+    expected = IndicatorState.from_series(series).snapshot()
+    assert_same_indicators(expected, state.snapshot())
+    assert expected["sma_200"] is not None
+    assert expected["support"] < expected["close"] < expected["resistance"]
+
+def test_engine_reuses_cached_state():
+    """Test that new bars and a revised partial bar are applied incrementally"""
+    engine = IndicatorEngine()
+    series = random_series()
+    engine.compute(series[:398])
+    engine.compute(series[:398])
+    engine.compute(series[:399])
+    
+    revised_close = series.close.copy()
+    revised_close[398] *= 1.02
+    revised = DailySeries(series.dates[:399], series.open[:399], series.high[:399], series.low[:399],
+                          revised_close[:399], series.volume[:399], symbol="TEST")
+    result = engine.compute(revised)
+    
+    assert engine.full_computes == 1
+    assert engine.incremental_updates == 2
+    assert_same_indicators(IndicatorState.from_series(revised).snapshot(), result)
+
+def test_engine_advances_sliding_tail():
+    """Test that a revised newest bar and a fixed-size tail moving forward are applied incrementally"""
+    engine = IndicatorEngine()
+    series = random_series()
+    engine.compute(series[:-2].tail(320))
+    
+    revised_close = series.close.copy()
+    revised_close[-3] *= 0.98
+    revised = DailySeries(series.dates, series.open, series.high, series.low, revised_close, series.volume, symbol="TEST")
+    engine.compute(revised[:-2].tail(320))
+    engine.compute(revised[:-1].tail(320))
+    result = engine.compute(revised.tail(320))
+    
+    assert engine.full_computes == 1
+    assert engine.incremental_updates == 3
+    assert result.pop("bars") == 322
+    expected = IndicatorState.from_series(revised.tail(320)).snapshot()
+    expected.pop("bars")
+    assert_same_indicators(expected, result)
+
+def test_analysis_uses_computed_levels(monkeypatch):
+    """Test that the template analysis cites the computed support and resistance"""
+    monkeypatch.setattr("agents.ticker_analysis.generate_analysis_with_llm", lambda *args: None)
+    series = random_series(symbol="LEVELS")
+    result = TickerAnalysisAgent().analyze(
+        "LEVELS", "How is LEVELS doing?", {"headlines": []}, {"price": 90.0},
+        {"change": 1.0, "change_percent": 1.1, "from_price": 89.0, "to_price": 90.0}, "today", series=series
+    )
+    indicators = result["details"]["technical_indicators"]
+    
+    assert f"${indicators['support']:.2f}" in result["detailed_analysis"]
+    assert f"${indicators['resistance']:.2f}" in result["detailed_analysis"]
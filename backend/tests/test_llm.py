@@ -0,0 +1,19 @@
+from utils.llm import StreamingFieldExtractor, _parse_content
+
+def test_streaming_field_extractor():
+    """Test that JSON string fields are decoded as the object streams in"""
+    extractor = StreamingFieldExtractor(("summary", "detailed_analysis"))
+    content = '{"summary": "Shares \\"rose\\" 2%\\ntoday", "detailed_analysis": "Caf\\u00e9 sales grew"}'
+    
+    decoded = {"summary": "", "detailed_analysis": ""}
+    for i in range(0, len(content), 3):
+        for field, text in extractor.feed(content[i:i + 3]):
+            decoded[field] += text
+    
+    assert decoded == _parse_content(content)
+    assert decoded["summary"] == 'Shares "rose" 2%\ntoday'
+
+def test_parse_plain_content():
+    """Test the fallback for responses that are not JSON"""
+    result = _parse_content("CONCISE SUMMARY: Short answer\n\nDETAILED ANALYSIS: Long answer")
+    assert result == {"summary": "Short answer", "detailed_analysis": "Long answer"}
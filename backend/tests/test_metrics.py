@@ -0,0 +1,97 @@
+import time
+import multiprocessing
+from utils import metrics
+from utils.metrics import Counter, Gauge, Histogram, render, FALLBACKS
+from utils.provider_router import ProviderRouter
+from utils.cache import TTLCache
+
+def sample(text, line_start):
+    """The value of the exposition line starting with line_start"""
+    for line in text.splitlines():
+        if line.startswith(line_start + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+def test_histogram_buckets_are_cumulative():
+    """Test that a histogram renders cumulative buckets, sum and count"""
+    histogram = Histogram("test_latency_seconds", "Test latency.", ["stage"], buckets=(0.1, 1.0))
+    histogram.observe(0.05, "news")
+    histogram.observe(0.5, "news")
+    histogram.observe(5, "news")
+    text = histogram.render()
+
+    assert "# TYPE test_latency_seconds histogram" in text
+    assert sample(text, 'test_latency_seconds_bucket{stage="news",le="0.1"}') == 1
+    assert sample(text, 'test_latency_seconds_bucket{stage="news",le="1.0"}') == 2
+    assert sample(text, 'test_latency_seconds_bucket{stage="news",le="+Inf"}') == 3
+    assert sample(text, 'test_latency_seconds_sum{stage="news"}') == 5.55
+    assert sample(text, 'test_latency_seconds_count{stage="news"}') == 3
+
+def test_timer_decorator_and_gauge_tracking():
+    """Test that time() works as a decorator and track() restores the gauge"""
+    histogram = Histogram("test_stage_seconds", "Test stage.", ["stage"])
+    gauge = Gauge("test_in_flight", "Test in flight.", ["endpoint"])
+
+    @histogram.time("identify")
+    def identify():
+        assert sample(gauge.render(), 'test_in_flight{endpoint="/query"}') == 1
+        return "AAPL"
+
+    with gauge.track("/query"):
+        assert identify() == "AAPL"
+        identify()
+    assert sample(histogram.render(), 'test_stage_seconds_count{stage="identify"}') == 2
+    assert sample(gauge.render(), 'test_in_flight{endpoint="/query"}') == 0
+
+def test_label_values_are_escaped():
+    """Test that quotes in label values cannot break the exposition format"""
+    counter = Counter("test_errors_total", "Test errors.", ["host"])
+    counter.inc('a"b')
+    counter.inc('a"b', amount=2)
+    assert sample(counter.render(), 'test_errors_total{host="a\\"b"}') == 3
+
+def test_render_includes_cache_and_provider_counters():
+    """Test that scraped output covers cache lookups and routed provider failures"""
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("AAPL", 1)
+    cache.get("AAPL")
+    cache.get("MSFT")
+    router = ProviderRouter("metrics_test", [("broken", lambda x: None), ("good", lambda x: {"price": 1})])
+    assert router.call(0) == ({"price": 1}, "good")
+    # Let the failure callback record
+    time.sleep(0.02)
+    FALLBACKS.inc("mock_data")
+
+    text = render({"quotes": cache})
+    assert sample(text, 'stockbot_cache_hits_total{cache="quotes"}') == 1
+    assert sample(text, 'stockbot_cache_misses_total{cache="quotes"}') == 1
+    assert sample(text, 'stockbot_provider_errors_total{router="metrics_test",provider="broken"}') == 1
+    assert sample(text, 'stockbot_fallbacks_total{kind="mock_data"}') >= 1
+
+def test_render_merges_worker_processes(tmp_path, monkeypatch):
+    """Test that a scrape sums every worker's metrics and drops gauges of exited workers"""
+    monkeypatch.setattr(metrics, "_store", metrics.SQLiteStore(str(tmp_path / "metrics.sqlite3")))
+    counter = Counter("test_worker_requests_total", "Test requests.", ["endpoint"])
+    gauge = Gauge("test_worker_in_flight", "Test in flight.", ["endpoint"])
+    histogram = Histogram("test_worker_seconds", "Test latency.", ["endpoint"], buckets=(0.1, 1.0))
+
+    def worker():
+        counter.inc("/query")
+        gauge.inc("/query")
+        histogram.observe(0.5, "/query")
+        metrics.flush()
+
+    process = multiprocessing.get_context("fork").Process(target=worker)
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+
+    counter.inc("/query", amount=2)
+    gauge.inc("/query")
+    histogram.observe(0.05, "/query")
+    text = render()
+    assert sample(text, 'test_worker_requests_total{endpoint="/query"}') == 3
+    assert sample(text, 'test_worker_in_flight{endpoint="/query"}') == 1
+    assert sample(text, 'test_worker_seconds_bucket{endpoint="/query",le="0.1"}') == 1
+    assert sample(text, 'test_worker_seconds_bucket{endpoint="/query",le="1.0"}') == 2
+    assert sample(text, 'test_worker_seconds_count{endpoint="/query"}') == 2
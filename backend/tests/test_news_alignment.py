@@ -0,0 +1,47 @@
+import numpy as np
+from agents.ticker_analysis import TickerAnalysisAgent
+from models.daily_series import DailySeries
+from utils.data_processing import find_price_correlation
+
+def make_series():
+    dates = np.array(["2026-10-14", "2026-10-15", "2026-10-16", "2026-10-19"], dtype="datetime64[D]")
+    opens = np.array([100.0, 101.0, 101.0, 100.0])
+    closes = np.array([100.0, 102.0, 99.0, 105.0])
+    return DailySeries(dates, opens, closes, closes, closes, [1, 2, 3, 4], symbol="TEST")
+
+def test_news_rolls_over_to_the_session_it_can_affect():
+    """Test after-hours, weekend, date-only and out-of-range alignment"""
+    news_dates = [
+        "2026-10-15T13:00:00Z",   # 09:00 ET, before the open
+        "2026-10-15T20:30:00Z",   # 16:30 ET, after the close
+        "2026-10-17T12:00:00Z",   # Saturday
+        "not a date",
+        "2026-10-16",
+        "2026-10-20T14:00:00Z",   # after the last bar
+    ]
+    results = find_price_correlation(make_series(), news_dates)
+    
+    assert [(r["news_index"], r["trading_day"]) for r in results] == [
+        (0, "2026-10-15"), (1, "2026-10-16"), (2, "2026-10-19"), (4, "2026-10-16")
+    ]
+    assert round(results[0]["change_from_previous_close"], 4) == 0.02
+    assert round(results[1]["change_next_day"], 4) == round(105 / 99 - 1, 4)
+    assert results[2]["change_next_day"] is None
+
+def test_why_summary_cites_headline_aligned_with_the_move(monkeypatch):
+    """Test that the headline from the session of the move is cited over older news"""
+    monkeypatch.setattr("agents.ticker_analysis.generate_analysis_with_llm", lambda *args: None)
+    articles = [
+        {"title": "Test Corp shares rise after product launch", "publishedAt": "2026-10-14T15:00:00Z"},
+        {"title": "Test Corp stock rises on record earnings", "publishedAt": "2026-10-18T12:00:00Z"},
+    ]
+    news = {"headlines": [a["title"] for a in articles], "full_articles": articles}
+    price_change = {"change": 6.0, "change_percent": 6.06, "from_price": 99.0, "to_price": 105.0,
+                    "from_date": "2026-10-16", "to_date": "2026-10-19"}
+    
+    result = TickerAnalysisAgent().analyze("TEST", "Why did TEST rise today?", news, {"price": 105.0},
+                                           price_change, "today", series=make_series())
+    
+    assert "record earnings" in result["summary"]
+    assert "2026-10-19" in result["summary"]
+    assert result["details"]["news_analysis"]["aligned_headlines"] == [articles[1]["title"]]
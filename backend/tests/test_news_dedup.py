@@ -0,0 +1,57 @@
+from agents.ticker_news import TickerNewsAgent
+from utils.news_dedup import cluster_articles, dedupe_articles, simhash
+
+def article(title, description, source):
+    return {"title": title, "description": description, "source": {"name": source}, "publishedAt": "2026-10-15T14:00:00Z"}
+
+ARTICLES = [
+    article("Apple shares rise after iPhone sales top expectations - Reuters",
+            "Apple Inc shares rose on Thursday after the company reported iPhone sales that beat Wall Street expectations.", "Reuters"),
+    article("Apple to hold product event in September",
+            "The company will unveil new devices at its annual event in Cupertino.", "The Verge"),
+    article("Apple shares rise after iPhone sales top expectations | Yahoo Finance",
+            "Apple Inc shares rose Thursday after the company reported iPhone sales that beat Wall Street expectations, analysts said.", "Yahoo Finance"),
+    article("Apple faces EU antitrust fine over App Store",
+            "European regulators fined Apple over its App Store rules on music streaming.", "BBC News"),
+    article("Apple shares rise after iPhone sales top expectations",
+            "", "MarketWatch"),
+]
+
+def test_simhash_is_close_for_near_duplicates():
+    """Test that syndicated copies are a few bits apart and different stories are not"""
+    first = simhash(ARTICLES[0]["title"] + " " + ARTICLES[0]["description"])
+    copy = simhash(ARTICLES[2]["title"] + " " + ARTICLES[2]["description"])
+    other = simhash(ARTICLES[3]["title"] + " " + ARTICLES[3]["description"])
+    assert bin(first ^ copy).count("1") <= 12
+    assert bin(first ^ other).count("1") > 20
+    assert simhash("") == 0
+
+def test_clusters_keep_first_article_as_representative():
+    """Test that copies join the earliest matching story, in the original order"""
+    assert cluster_articles(ARTICLES) == [[0, 2, 4], [1], [3]]
+    assert cluster_articles([]) == []
+
+def test_dedupe_counts_sources():
+    """Test that representatives carry the story's source count and publishers"""
+    stories = dedupe_articles(ARTICLES)
+    assert [story["title"] for story in stories] == [ARTICLES[0]["title"], ARTICLES[1]["title"], ARTICLES[3]["title"]]
+    assert stories[0]["source_count"] == 3
+    assert stories[0]["sources"] == ["Reuters", "Yahoo Finance", "MarketWatch"]
+    assert "source_count" not in ARTICLES[0]
+
+def test_agent_returns_distinct_stories(monkeypatch):
+    """Test that get_news keeps headlines, summaries and full_articles aligned after dedup"""
+    monkeypatch.setenv("NEWS_API_KEY", "test")
+
+    class StubNewsAPI:
+        def get_company_news(self, ticker, days=7):
+            return list(ARTICLES)
+
+    agent = TickerNewsAgent()
+    agent.news_api = StubNewsAPI()
+    news = agent.get_news("AAPL")
+
+    assert news["raw_count"] == 5
+    assert len(news["headlines"]) == len(news["summaries"]) == len(news["full_articles"]) == 3
+    assert news["source_counts"] == [3, 1, 1]
+    assert news["full_articles"][1]["title"] == news["headlines"][1]
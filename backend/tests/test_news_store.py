@@ -0,0 +1,105 @@
+from datetime import datetime, timezone
+from api.news_api import NewsAPI
+from utils.rate_limiter import TokenBucket
+
+NOW = datetime(2026, 10, 16, 15, 0, tzinfo=timezone.utc).timestamp()
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+def article(url, published_at):
+    return {"url": url, "title": url, "publishedAt": published_at}
+
+def make_api(monkeypatch, responses):
+    """A NewsAPI client whose requests are answered from responses, recording their params"""
+    requests = []
+    monkeypatch.setenv("NEWS_API_KEY", "test")
+
+    def fake_get(url, params=None, **kwargs):
+        requests.append(params)
+        result = responses.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return FakeResponse({"articles": result})
+
+    monkeypatch.setattr("api.news_api.http_client.get", fake_get)
+    monkeypatch.setattr("api.news_api.time.time", lambda: NOW)
+    api = NewsAPI()
+    api.store.clear()
+    # Keep the shared NewsAPI quota untouched
+    api.limiter = TokenBucket("newsapi", rate=100, burst=100)
+    return api, requests
+
+def test_repeat_requests_are_served_from_the_store(monkeypatch):
+    """Test that a second request within the refresh interval does not call NewsAPI"""
+    api, requests = make_api(monkeypatch, [[
+        article("a", "2026-10-14T10:00:00Z"), article("b", "2026-10-16T09:00:00Z"), article("old", "2026-10-01T00:00:00Z")
+    ]])
+
+    first = api.get_company_news("AAPL", 7)
+    second = api.get_company_news("AAPL", 7)
+
+    # NewsAPI's relevancy order is kept
+    assert [a["url"] for a in first] == ["a", "b"]
+    assert second == first
+    assert len(requests) == 1
+    assert requests[0]["from"] == "2026-10-09"
+
+def test_refresh_fetches_only_newer_articles(monkeypatch):
+    """Test that a refresh asks for articles since the newest stored one and merges them"""
+    api, requests = make_api(monkeypatch, [
+        [article("a", "2026-10-10T10:00:00Z"), article("b", "2026-10-16T09:00:00Z")],
+        [article("b", "2026-10-16T09:00:00Z"), article("c", "2026-10-18T12:00:00Z")],
+    ])
+    api.get_company_news("AAPL", 7)
+
+    # Three days later: "a" has left the 7-day lookback
+    monkeypatch.setattr("api.news_api.time.time", lambda: NOW + 3 * 86400)
+    articles = api.get_company_news("AAPL", 7)
+
+    assert requests[1]["from"] == "2026-10-16T09:00:00Z"
+    assert requests[1]["sortBy"] == "relevancy"
+    assert [a["url"] for a in articles] == ["b", "c"]
+    assert [a["url"] for a in api.store.get("AAPL")["articles"]] == ["b", "c"]
+
+def test_refreshed_articles_interleave_by_relevance(monkeypatch):
+    """Test that a refresh's top article ranks with the stored top article, newest first"""
+    api, requests = make_api(monkeypatch, [
+        [article("a", "2026-10-14T10:00:00Z"), article("b", "2026-10-15T09:00:00Z"),
+         article("c", "2026-10-16T09:00:00Z"), article("d", "2026-10-16T10:00:00Z")],
+        [article("e", "2026-10-16T12:00:00Z"), article("f", "2026-10-16T13:00:00Z")],
+    ])
+    api.get_company_news("AAPL", 7)
+
+    monkeypatch.setattr("api.news_api.time.time", lambda: NOW + 3600)
+    articles = api.get_company_news("AAPL", 7)
+
+    assert [a["url"] for a in articles] == ["e", "a", "b", "f", "c", "d"]
+
+def test_shorter_lookbacks_reuse_the_stored_window(monkeypatch):
+    """Test that a shorter lookback is cut from the stored window and a longer one refetches"""
+    api, requests = make_api(monkeypatch, [
+        [article("a", "2026-10-12T10:00:00Z"), article("b", "2026-10-16T09:00:00Z")],
+        [article("z", "2026-10-03T10:00:00Z")],
+    ])
+    api.get_company_news("AAPL", 7)
+
+    assert [a["url"] for a in api.get_company_news("AAPL", 2)] == ["b"]
+    assert len(requests) == 1
+    assert [a["url"] for a in api.get_company_news("AAPL", 30)] == ["z"]
+    assert len(requests) == 2
+
+def test_failed_refresh_serves_stored_articles(monkeypatch):
+    """Test that stored articles are returned when NewsAPI fails during a refresh"""
+    api, requests = make_api(monkeypatch, [[article("a", "2026-10-16T09:00:00Z")], ValueError("rate limited")])
+    api.get_company_news("AAPL", 7)
+
+    monkeypatch.setattr("api.news_api.time.time", lambda: NOW + 3600)
+    assert [a["url"] for a in api.get_company_news("AAPL", 7)] == ["a"]
+    assert len(requests) == 2
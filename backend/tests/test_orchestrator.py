@@ -0,0 +1,175 @@
+import asyncio
+import time
+import pytest
+from agents.orchestrator import StockOrchestratorAgent
+
+DELAY = 0.3
+
+class SlowNewsAgent:
+    def get_news(self, ticker, days=7):
+        time.sleep(DELAY)
+        return {"headlines": [f"{ticker} headline"], "success": True}
+
+class SlowPriceAgent:
+    def get_price(self, ticker):
+        time.sleep(DELAY)
+        return {"price": 100.0, "company_name": "Test Corp", "success": True}
+
+class SlowPriceChangeAgent:
+    def get_price_change(self, ticker, timeframe="today", series=None):
+        time.sleep(DELAY)
+        return {"change": 1.0, "change_percent": 1.0, "timeframe": timeframe, "success": True}
+
+    def history_bars(self, timeframe="today"):
+        return 320
+
+    def get_series(self, ticker, bars=None):
+        return None
+
+class StubIdentifyAgent:
+    def identify(self, query):
+        return {"ticker": "TEST", "company_name": "Test Corp", "timeframe": "today", "confidence": 0.9}
+
+class StubAnalysisAgent:
+    def analyze(self, ticker, query, news, price, price_change, timeframe, series=None):
+        return {"summary": f"{ticker} summary", "detailed_analysis": "", "details": {}, "success": True}
+
+    async def analyze_stream(self, ticker, query, news, price, price_change, timeframe, series=None):
+        yield "summary_token", f"{ticker} "
+        yield "summary_token", "summary"
+        yield "analysis", self.analyze(ticker, query, news, price, price_change, timeframe)
+
+@pytest.fixture
+def orchestrator(monkeypatch):
+    """Orchestrator with slow stub agents instead of the network-backed ones"""
+    monkeypatch.setenv("NEWS_API_KEY", "test")
+    monkeypatch.setattr("api.fmp_api.API_KEY", "test")
+    agent = StockOrchestratorAgent()
+    agent.identify_ticker_agent = StubIdentifyAgent()
+    agent.ticker_news_agent = SlowNewsAgent()
+    agent.ticker_price_agent = SlowPriceAgent()
+    agent.ticker_price_change_agent = SlowPriceChangeAgent()
+    agent.ticker_analysis_agent = StubAnalysisAgent()
+    return agent
+
+def test_async_query_fetches_concurrently(orchestrator):
+    """Test that the async path takes about as long as the slowest fetch"""
+    start = time.monotonic()
+    result = asyncio.run(orchestrator.process_query_async("How is TEST doing?"))
+    elapsed = time.monotonic() - start
+    
+    assert result["metadata"]["ticker"] == "TEST"
+    assert result["answer"] == "TEST summary"
+    assert elapsed < DELAY * 2
+
+def test_async_query_matches_sync(orchestrator):
+    """Test that the sync and async paths build the same response"""
+    sync_result = orchestrator.process_query("How is TEST doing?")
+    async_result = asyncio.run(orchestrator.process_query_async("How is TEST doing?"))
+    assert sync_result == async_result
+
+def test_stream_query_emits_events_in_order(orchestrator):
+    """Test that the ticker comes first and the full result last"""
+    async def collect():
+        return [event async for event in orchestrator.stream_query_async("How is TEST doing?")]
+    
+    events = asyncio.run(collect())
+    names = [name for name, _ in events]
+    
+    assert names[0] == "ticker"
+    assert sorted(names[1:4]) == ["news", "price", "price_change"]
+    assert names[4:] == ["summary_token", "summary_token", "analysis", "result"]
+    assert events[-1][1] == orchestrator.process_query("How is TEST doing?")
+
+def test_batch_fetches_each_ticker_once(orchestrator):
+    """Test that a batch shares upstream calls per ticker and keeps item order and errors"""
+    class MappingIdentifyAgent:
+        def identify(self, query):
+            ticker = query.split()[0] if query.split()[0].isupper() else None
+            timeframe = "week" if "week" in query else "today"
+            return {"ticker": ticker, "company_name": f"{ticker} Corp", "timeframe": timeframe}
+    
+    calls = []
+    class CountingNewsAgent(SlowNewsAgent):
+        def get_news(self, ticker, days=7):
+            calls.append(("news", ticker))
+            return super().get_news(ticker, days)
+    
+    class CountingPriceAgent(SlowPriceAgent):
+        def get_price(self, ticker):
+            calls.append(("price", ticker))
+            return super().get_price(ticker)
+    
+    orchestrator.identify_ticker_agent = MappingIdentifyAgent()
+    orchestrator.ticker_news_agent = CountingNewsAgent()
+    orchestrator.ticker_price_agent = CountingPriceAgent()
+    queries = ["AAPL today", "MSFT today", "what about nothing", "AAPL this week", "MSFT now"]
+    
+    start = time.monotonic()
+    results = asyncio.run(orchestrator.process_batch_async(queries, max_concurrency=8))
+    elapsed = time.monotonic() - start
+    
+    assert [item["query"] for item in results] == queries
+    assert results[2]["result"] is None and results[2]["error"] == "No ticker identified"
+    assert results[3]["result"]["metadata"]["price_change"]["timeframe"] == "week"
+    assert results[4]["result"]["metadata"]["ticker"] == "MSFT"
+    assert sorted(calls) == [("news", "AAPL"), ("news", "MSFT"), ("price", "AAPL"), ("price", "MSFT")]
+    assert elapsed < DELAY * 4
+
+def test_batch_stops_at_the_batch_deadline(orchestrator):
+    """Test that items share the batch deadline and the ones it has no time for report an error"""
+    from utils import deadline
+    
+    remaining = []
+    class DeadlineRecordingAnalysisAgent(StubAnalysisAgent):
+        def analyze(self, ticker, query, news, price, price_change, timeframe, series=None):
+            remaining.append(deadline.remaining())
+            time.sleep(0.25)
+            return super().analyze(ticker, query, news, price, price_change, timeframe, series)
+    
+    orchestrator.ticker_analysis_agent = DeadlineRecordingAnalysisAgent()
+    
+    async def run():
+        # The fetches take 0.9s in sequence, leaving time for two of the six analyses
+        with deadline.deadline_scope(1.5):
+            return await orchestrator.process_batch_async(
+                [f"query {i}" for i in range(6)], max_concurrency=1, deadline_seconds=0.5
+            )
+    
+    start = time.monotonic()
+    results = asyncio.run(run())
+    elapsed = time.monotonic() - start
+    
+    assert [item["result"]["answer"] for item in results[:2]] == ["TEST summary", "TEST summary"]
+    assert all(item["result"] is None and item["error"] == "Batch deadline exceeded" for item in results[2:])
+    # The first analysis is held to its own budget, the second to what the batch has left
+    assert 0.4 < remaining[0] <= 0.5
+    assert remaining[1] < 0.4
+    assert elapsed < 1.7
+
+def test_price_change_bars_are_reused_by_the_analysis(orchestrator):
+    """Test that each query loads its daily bars once and hands them to the analysis"""
+    series = object()
+    loads = []
+    seen = []
+    class SeriesPriceChangeAgent(SlowPriceChangeAgent):
+        def get_series(self, ticker, bars=None):
+            loads.append(bars)
+            return series
+
+        def get_price_change(self, ticker, timeframe="today", series=None):
+            seen.append(series)
+            return super().get_price_change(ticker, timeframe, series)
+
+    class SeriesRecordingAnalysisAgent(StubAnalysisAgent):
+        def analyze(self, ticker, query, news, price, price_change, timeframe, series=None):
+            seen.append(series)
+            return super().analyze(ticker, query, news, price, price_change, timeframe, series)
+
+    orchestrator.ticker_price_change_agent = SeriesPriceChangeAgent()
+    orchestrator.ticker_analysis_agent = SeriesRecordingAnalysisAgent()
+    orchestrator.process_query("How is TEST doing?")
+    asyncio.run(orchestrator.process_query_async("How is TEST doing?"))
+
+    assert loads == [320, 320]
+    assert seen == [series] * 4
@@ -0,0 +1,56 @@
+from datetime import date, timedelta
+import numpy as np
+from models.daily_series import DailySeries
+from utils.market_hours import is_trading_day
+from utils.price_change import compute_changes, compute_timeframe_change, window_for_timeframe
+
+def trading_series(start, end):
+    """Bars on every NYSE trading day with the close equal to the bar's position"""
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    days = [day for day in days if is_trading_day(day)]
+    closes = np.arange(1, len(days) + 1, dtype=float)
+    return DailySeries(days, closes, closes, closes, closes, np.zeros(len(days)), symbol="TEST")
+
+def test_timeframes_map_to_windows():
+    """Test that every parsed timeframe selects a window instead of falling back to a day"""
+    assert window_for_timeframe("today") == "1D"
+    assert window_for_timeframe("quarter") == "3M"
+    assert window_for_timeframe("3months") == "3M"
+    assert window_for_timeframe("6months") == "6M"
+    assert window_for_timeframe("year") == "1Y"
+    assert window_for_timeframe("45days") == "45D"
+    assert window_for_timeframe("yesterday") == "yesterday"
+
+def test_windows_use_calendar_dates():
+    """Test that windows start at the last close on or before their calendar start"""
+    series = trading_series(date(2025, 1, 2), date(2026, 10, 16))
+    changes = compute_changes(series)
+    
+    # 2026-10-16 is a Friday; a week back is the previous Friday's close
+    assert changes["1W"]["from_date"] == "2026-10-09"
+    assert changes["1D"]["from_date"] == "2026-10-15"
+    assert changes["5D"]["from_date"] == "2026-10-09"
+    # 2026-07-16 is a Thursday trading day
+    assert changes["3M"]["from_date"] == "2026-07-16"
+    assert changes["YTD"]["from_date"] == "2025-12-31"
+    # 2025-10-16 is a trading day; history starting in January covers a year
+    assert changes["1Y"]["from_date"] == "2025-10-16"
+    assert changes["1M"]["to_price"] == float(len(series))
+
+def test_windows_beyond_history_are_unavailable():
+    """Test that a short history reports long windows as missing, not as a one-day move"""
+    series = trading_series(date(2026, 9, 1), date(2026, 10, 16))
+    window, selected, windows = compute_timeframe_change(series, "year")
+    
+    assert window == "1Y"
+    assert selected is None
+    assert windows["1M"] is not None
+    assert windows["6M"] is None
+
+def test_yesterday_is_the_previous_session():
+    """Test that 'yesterday' measures the session before today"""
+    series = trading_series(date(2026, 9, 1), date(2026, 10, 16))
+    window, selected, _ = compute_timeframe_change(series, "yesterday", today=date(2026, 10, 16))
+    
+    assert selected["from_date"] == "2026-10-14"
+    assert selected["to_date"] == "2026-10-15"
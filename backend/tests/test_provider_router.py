@@ -0,0 +1,102 @@
+import time
+import threading
+from utils.provider_router import CircuitBreaker, ProviderRouter
+
+def test_first_valid_answer_wins_without_hedging():
+    """Test that a fast primary answers alone"""
+    calls = []
+    router = ProviderRouter("test", [
+        ("primary", lambda x: calls.append("primary") or {"price": x}),
+        ("backup", lambda x: calls.append("backup") or {"price": -x}),
+    ])
+    assert router.call(5) == ({"price": 5}, "primary")
+    assert calls == ["primary"]
+    assert router.hedges == 0
+
+def test_slow_provider_is_hedged():
+    """Test that the next provider is asked once the first exceeds its hedge delay"""
+    release = threading.Event()
+
+    def slow(x):
+        release.wait(2)
+        return {"price": 1}
+
+    router = ProviderRouter("test", [("slow", slow), ("fast", lambda x: {"price": 2})])
+    started = time.monotonic()
+    result = router.call(0)
+    elapsed = time.monotonic() - started
+    release.set()
+
+    assert result == ({"price": 2}, "fast")
+    assert router.hedges == 1
+    # Waited about the default hedge delay, not the slow call
+    assert elapsed < 1.5
+
+def test_failures_fall_through_immediately():
+    """Test that errors and invalid answers move on without waiting out the hedge delay"""
+    def broken(x):
+        raise RuntimeError("down")
+
+    router = ProviderRouter("test", [
+        ("broken", broken), ("empty", lambda x: {}), ("good", lambda x: {"price": 3})
+    ], is_valid=lambda data: bool(data and data.get("price")))
+    started = time.monotonic()
+    assert router.call(0) == ({"price": 3}, "good")
+    assert time.monotonic() - started < 0.4
+    time.sleep(0.02)
+    assert router.stats()["providers"]["broken"]["errors"] == 1
+
+def test_nothing_valid_returns_none():
+    """Test that a router with no valid answer returns (None, None)"""
+    router = ProviderRouter("test", [("empty", lambda x: None)])
+    assert router.call(0) == (None, None)
+
+def test_circuit_opens_and_recovers():
+    """Test that a failing provider is skipped until its reset period allows a trial"""
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.1)
+    assert breaker.allow()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    time.sleep(0.12)
+    assert breaker.allow()
+    # Only one trial call at a time while half open
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+def test_router_skips_open_circuits():
+    """Test that calls stop reaching a provider once its circuit opens"""
+    calls = []
+
+    def broken(x):
+        calls.append(x)
+        raise RuntimeError("down")
+
+    router = ProviderRouter("test", [("broken", broken), ("good", lambda x: {"price": 1})])
+    for provider in router.providers:
+        provider.breaker.failure_threshold = 2
+    for i in range(4):
+        assert router.call(i) == ({"price": 1}, "good")
+        # Let the failure callbacks record before the next call
+        time.sleep(0.02)
+    assert calls == [0, 1]
+    assert router.stats()["providers"]["broken"]["state"] == "open"
+
+def test_unavailable_provider_is_skipped_without_tripping_its_circuit():
+    """Test that a provider declining calls is passed over without counting failures"""
+    from utils.provider_router import ProviderUnavailable
+
+    def declined(x):
+        raise ProviderUnavailable("not configured")
+
+    router = ProviderRouter("test", [("declined", declined), ("good", lambda x: {"price": 1})])
+    router.providers[0].breaker.failure_threshold = 2
+    for i in range(4):
+        assert router.call(i) == ({"price": 1}, "good")
+        time.sleep(0.02)
+    stats = router.stats()["providers"]["declined"]
+    assert stats["state"] == "closed"
+    assert stats["errors"] == 0
@@ -0,0 +1,61 @@
+import time
+from agents.ticker_price import TickerPriceAgent
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+def test_get_prices_batches_symbols_into_chunks(monkeypatch):
+    """Test that many symbols cost one request per chunk plus fallbacks for gaps"""
+    monkeypatch.setattr("api.fmp_api.FMP_QUOTE_BATCH_SIZE", 2)
+    urls = []
+
+    def fake_get(url, **kwargs):
+        urls.append(url)
+        symbols = url.split("/quote/")[1].split("?")[0].split(",")
+        return FakeResponse([
+            {"symbol": symbol, "name": f"{symbol} Inc.", "price": 10.0 + i, "volume": 100}
+            for i, symbol in enumerate(symbols) if symbol != "GONE"
+        ])
+
+    monkeypatch.setattr("api.fmp_api.http_client.get", fake_get)
+    agent = TickerPriceAgent()
+    agent.fmp_api_key = "test"
+    agent.quote_cache.clear()
+    agent.quote_cache.set("MSFT", {"price": 400.0, "currency": "USD", "success": True, "source": "fmp_api"})
+    fallbacks = []
+    monkeypatch.setattr(agent, "get_price", lambda ticker: fallbacks.append(ticker) or {"price": 1.0, "source": "mock_data"})
+
+    prices = agent.get_prices(["aapl", "MSFT", "TSLA", "NVDA", "AMD", "GONE", "AAPL"])
+
+    assert list(prices) == ["AAPL", "MSFT", "TSLA", "NVDA", "AMD", "GONE"]
+    assert len(urls) == 3
+    assert prices["MSFT"]["source"] == "cache:fmp_api"
+    assert prices["AAPL"]["company_name"] == "AAPL Inc."
+    assert fallbacks == ["GONE"]
+
+    # Fetched quotes are now cached
+    urls.clear()
+    assert agent.get_prices(["AAPL", "TSLA"])["TSLA"]["source"] == "cache:fmp_api"
+    assert urls == []
+
+def test_fmp_rate_limit_does_not_open_its_circuit(monkeypatch):
+    """Test that an empty FMP bucket falls through to Yahoo without counting FMP failures"""
+    from utils.rate_limiter import get_limiter
+    agent = TickerPriceAgent()
+    agent.fmp_api_key = "test"
+    limiter = get_limiter("fmp")
+    monkeypatch.setattr(limiter, "try_acquire", lambda: False)
+    monkeypatch.setattr(agent, "_get_yahoo_finance_price", lambda ticker: {"price": 10.0, "source": "yahoo_finance"})
+
+    for ticker in ("AAA", "BBB", "CCC", "DDD", "EEE", "FFF"):
+        assert agent.get_price(ticker)["source"] == "yahoo_finance"
+    time.sleep(0.05)
+    fmp = agent.quote_router.stats()["providers"]["fmp_api"]
+    assert fmp["state"] == "closed"
+    assert fmp["errors"] == 0
@@ -0,0 +1,70 @@
+import time
+import asyncio
+import threading
+from utils.rate_limiter import TokenBucket, _limit_config
+
+def test_try_acquire_fails_fast_when_empty():
+    """Test that the burst is granted at once and the next call is refused without waiting"""
+    bucket = TokenBucket("test", rate=1, burst=3)
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+    assert bucket.stats()["granted"] == 3
+    assert bucket.stats()["rejected"] == 1
+
+def test_acquire_waits_only_up_to_timeout():
+    """Test that acquire waits for a refill within its timeout and gives up beyond it"""
+    bucket = TokenBucket("test", rate=20, burst=1)
+    assert bucket.try_acquire()
+
+    started = time.monotonic()
+    assert bucket.acquire(timeout=1)
+    assert 0.02 < time.monotonic() - started < 0.5
+
+    # The next token is 50ms away, longer than this timeout: refuse without sleeping
+    started = time.monotonic()
+    assert not bucket.acquire(timeout=0.01)
+    assert time.monotonic() - started < 0.01
+
+def test_acquire_async_reports_queue_depth():
+    """Test that async waiters are counted while queued and all get tokens"""
+    bucket = TokenBucket("test", rate=50, burst=1)
+    depths = []
+
+    async def main():
+        waiters = [asyncio.ensure_future(bucket.acquire_async(timeout=1)) for _ in range(3)]
+        await asyncio.sleep(0.005)
+        depths.append(bucket.stats()["queue_depth"])
+        return await asyncio.gather(*waiters)
+
+    assert asyncio.run(main()) == [True, True, True]
+    assert depths[0] >= 2
+    assert bucket.stats()["queue_depth"] == 0
+
+def test_sqlite_bucket_is_shared(tmp_path):
+    """Test that buckets on the same file, as in separate workers, draw from one budget"""
+    path = str(tmp_path / "ratelimit.sqlite3")
+    first = TokenBucket("fmp", rate=0.001, burst=4, path=path)
+    second = TokenBucket("fmp", rate=0.001, burst=4, path=path)
+    other = TokenBucket("newsapi", rate=0.001, burst=1, path=path)
+
+    results = []
+    threads = [threading.Thread(target=lambda b=b: results.append(b.try_acquire())) for b in (first, second) * 3]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == [False, False, True, True, True, True]
+    assert other.try_acquire()
+
+def test_limits_are_configured_per_provider(monkeypatch):
+    """Test the environment overrides for a provider's rate, burst and wait"""
+    monkeypatch.setenv("RATE_LIMIT_FMP", "600/60")
+    monkeypatch.setenv("RATE_LIMIT_FMP_BURST", "20")
+    monkeypatch.setenv("RATE_LIMIT_FMP_WAIT", "0")
+    assert _limit_config("fmp") == (10.0, 20.0, 0.0)
+    assert _limit_config("alpha_vantage") == (5 / 60, 1.0, 0.0)
+
+def test_tests_use_per_process_buckets():
+    """Test that the suite never draws from the deployment's shared bucket file"""
+    from utils.rate_limiter import get_limiter
+    assert get_limiter("newsapi").path is None
@@ -0,0 +1,81 @@
+import numpy as np
+from utils.sentiment import LexiconSentimentScorer
+from utils.sentiment_model import HashedSentimentModel, load_sentiment_model
+
+def test_word_boundaries():
+    """Test that terms only match whole words, unlike the old substring check"""
+    scorer = LexiconSentimentScorer()
+    # "download" must not count as "down"
+    assert scorer.score_batch(["Apple launches new download store"]) == [0.0]
+    assert scorer.classify("Shares surge after earnings beat") == "positive"
+    assert scorer.classify("Stock plunges on fraud probe") == "negative"
+    assert scorer.classify("Company holds annual meeting") == "neutral"
+
+def test_phrases_and_weights():
+    """Test that phrases win over the words they contain and weights add up"""
+    scorer = LexiconSentimentScorer(lexicon={"beats estimates": 2.0, "beats": 0.5, "loss": -1.0})
+    assert scorer.score_batch(["Nvidia beats estimates", "Nvidia beats", "Loss widens, loss deepens"]) == [2.0, 0.5, -2.0]
+
+def test_negation():
+    """Test that negators flip the next term within their scope, but not across headlines"""
+    scorer = LexiconSentimentScorer()
+    assert scorer.classify("Tesla did not beat expectations") == "negative"
+    assert scorer.classify("Bank fails to recover losses") == "negative"
+    assert scorer.classify("No growth ahead for retailer") == "negative"
+    # Out of scope: too many words between the negator and the term
+    assert scorer.score_batch(["Not much changed in the quarter, shares rose"])[0] > 0
+    # A trailing negator must not leak into the next headline of the batch
+    assert scorer.score_batch(["Investors say no", "Shares rally"]) == [0.0, 1.5]
+
+def test_batch_is_memoized_by_headline():
+    """Test that a shared headline is scored once, however often it appears"""
+    scorer = LexiconSentimentScorer()
+    scans = []
+    original = scorer._scan
+    scorer._scan = lambda texts: scans.append(list(texts)) or original(texts)
+
+    headline = "Chipmakers rally as demand surges"
+    first = scorer.score_batch([headline, "Oil falls", headline])
+    second = scorer.score_batch(["  chipmakers RALLY as demand surges ", "Oil falls"])
+
+    assert first[0] == first[2] == second[0]
+    assert first[1] == second[1] < 0
+    assert scans == [[headline, "Oil falls"]]
+
+def test_model_scores_batches_like_single_texts():
+    """Test that the shipped model loads and batch scores match one-at-a-time scores"""
+    model = load_sentiment_model()
+    texts = ["Nvidia beats estimates as data center revenue soars", "Boeing shares sink after new safety probe", "Apple to hold event"]
+    batch = model._scan(texts)
+    assert np.allclose(batch, [model._scan([text])[0] for text in texts])
+    assert model.label(batch[0]) == "positive"
+    assert model.label(batch[1]) == "negative"
+
+def test_model_beats_lexicon_on_held_out_headlines():
+    """Test that the shipped model is at least as accurate as the lexicon it builds on"""
+    from utils.sentiment import LexiconSentimentScorer
+    from utils.sentiment_model import load_labelled_headlines
+    texts, labels = load_labelled_headlines(split="test")
+
+    def accuracy(scorer):
+        return np.mean([predicted == label for predicted, label in zip(scorer.classify_batch(texts), labels)])
+
+    assert accuracy(load_sentiment_model()) >= accuracy(LexiconSentimentScorer())
+
+def test_model_training_and_round_trip(tmp_path):
+    """Test that a trained model separates its classes and survives save/load"""
+    texts = ["shares surge", "profit soars", "shares plunge", "loss widens", "meeting scheduled", "ceo named"]
+    labels = ["positive", "positive", "negative", "negative", "neutral", "neutral"]
+    model = HashedSentimentModel.train(texts, labels, epochs=300)
+    assert model.classify_batch(texts) == labels
+
+    path = tmp_path / "model.npz"
+    model.save(path)
+    loaded = HashedSentimentModel.load(path)
+    assert np.allclose(loaded._scan(texts), model._scan(texts), atol=1e-2)
+
+def test_articles_weigh_descriptions():
+    """Test that descriptions shift an article's score by the description weight"""
+    scorer = LexiconSentimentScorer()
+    scores = scorer.score_articles(["Apple holds event", "Apple holds event"], ["Shares surge after the show"])
+    assert scores == [1.0, 0.0]
@@ -0,0 +1,75 @@
+import threading
+import time
+from collections import OrderedDict
+
+class TTLCache:
+    """
+    Thread-safe in-process cache with per-entry expiry and LRU eviction.
+    """
+    
+    def __init__(self, maxsize=1024, ttl=60):
+        """
+        Args:
+            maxsize (int): Maximum number of entries before the least recently used is evicted
+            ttl (float): Default time to live in seconds
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if missing or expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.misses += 1
+                return default
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def set(self, key, value, ttl=None):
+        """Store value under key for ttl seconds (the cache default if not given)."""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def stats(self):
+        """Return hit, miss and eviction counters."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0
+            }
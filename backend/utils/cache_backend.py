@@ -0,0 +1,266 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import logging
+import threading
+from functools import lru_cache
+from urllib.parse import urlsplit
+from dotenv import load_dotenv
+from utils.cache import TTLCache
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Where caches shared by all workers live: "memory" (per process), "sqlite" or "redis"
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+CACHE_URL = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "cache.sqlite3")
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", DEFAULT_CACHE_PATH)
+
+class SQLiteBackend:
+    """
+    Zero-dependency cache shared by the worker processes of a single host.
+
+    Entries live in one SQLite file in WAL mode, so concurrent readers never
+    block and each get or set is a single indexed statement.
+    """
+
+    def __init__(self, path=CACHE_SQLITE_PATH, maxsize=100000):
+        self.path = path
+        self.maxsize = maxsize
+        self._local = threading.local()
+        self._writes = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connection().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl):
+        conn = self._connection()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?)", (key, value, time.time() + ttl))
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            self._prune()
+
+    def delete(self, key):
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self, prefix):
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM cache WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+
+    def _prune(self):
+        """Drop expired entries, then the soonest-expiring ones beyond maxsize."""
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+            conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (self.maxsize,)
+            )
+
+class RedisError(Exception):
+    pass
+
+class RedisBackend:
+    """
+    Cache in any server speaking the Redis protocol (Redis, Valkey, KeyDB, ...).
+
+    Implements just the RESP commands the caches need over a per-thread
+    socket, so no client library is required.
+    """
+
+    def __init__(self, url=CACHE_URL, timeout=2.0):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or 6379
+        self.password = parts.password
+        self.db = int(parts.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock = sock
+        self._local.reader = sock.makefile("rb")
+        if self.password:
+            self._execute("AUTH", self.password)
+        if self.db:
+            self._execute("SELECT", str(self.db))
+
+    def _execute(self, *args):
+        payload = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            payload.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._local.sock.sendall(b"".join(payload))
+        return self._read_reply()
+
+    def _read_reply(self):
+        line = self._local.reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by cache server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode("utf-8")
+        if kind == b"-":
+            raise RedisError(rest.decode("utf-8"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self._local.reader.read(length + 2)[:-2]
+            return data.decode("utf-8")
+        if kind == b"*":
+            length = int(rest)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise RedisError(f"Unexpected reply: {line!r}")
+
+    def command(self, *args):
+        """Run a command, reconnecting once if the connection has dropped."""
+        for attempt in range(2):
+            try:
+                if getattr(self._local, "sock", None) is None:
+                    self._connect()
+                return self._execute(*args)
+            except (ConnectionError, OSError):
+                self._local.sock = None
+                if attempt:
+                    raise
+
+    def get(self, key):
+        return self.command("GET", key)
+
+    def set(self, key, value, ttl):
+        self.command("SET", key, value, "PX", max(int(ttl * 1000), 1))
+
+    def delete(self, key):
+        self.command("DEL", key)
+
+    def clear(self, prefix):
+        cursor = "0"
+        while True:
+            cursor, keys = self.command("SCAN", cursor, "MATCH", f"{prefix}*", "COUNT", "500")
+            if keys:
+                self.command("DEL", *keys)
+            if cursor == "0":
+                break
+
+class SharedCache:
+    """
+    TTLCache-compatible view of one namespace in a shared backend.
+
+    Keys are namespaced and values stored as JSON. Backend failures and values
+    that do not decode are logged and treated as misses so a cache outage never
+    fails a request.
+    """
+
+    def __init__(self, namespace, backend, ttl=60):
+        self.namespace = namespace
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._prefix = f"stockbot:{namespace}:"
+
+    def _key(self, key):
+        return self._prefix + (key if isinstance(key, str) else json.dumps(key))
+
+    def get(self, key, default=None):
+        try:
+            raw = self.backend.get(self._key(key))
+            value = None if raw is None else json.loads(raw)
+        except Exception as e:
+            # Includes a corrupt or foreign value under our key
+            self.errors += 1
+            logger.error(f"Cache backend error reading {self.namespace}: {str(e)}")
+            raw = None
+        if raw is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        try:
+            self.backend.set(self._key(key), json.dumps(value), self.ttl if ttl is None else ttl)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Cache backend error writing {self.namespace}: {str(e)}")
+
+    def delete(self, key):
+        try:
+            self.backend.delete(self._key(key))
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Cache backend error deleting from {self.namespace}: {str(e)}")
+
+    def clear(self):
+        self.backend.clear(self._prefix)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+@lru_cache(maxsize=1)
+def get_backend():
+    """Return the configured shared backend, or None for per-process memory caches."""
+    if CACHE_BACKEND == "redis":
+        logger.info(f"Using Redis-protocol cache backend at {CACHE_URL}")
+        return RedisBackend(CACHE_URL)
+    if CACHE_BACKEND == "sqlite":
+        logger.info(f"Using SQLite cache backend at {CACHE_SQLITE_PATH}")
+        return SQLiteBackend(CACHE_SQLITE_PATH)
+    return None
+
+def make_cache(namespace, maxsize=1024, ttl=60):
+    """
+    Create a cache for one kind of data in the configured backend.
+
+    Args:
+        namespace (str): Name separating this cache's keys from others
+        maxsize (int): Entry bound for the in-process backend
+        ttl (float): Default time to live in seconds
+
+    Returns:
+        TTLCache or SharedCache: Objects with the same get/set/delete/clear/stats interface
+    """
+    backend = get_backend()
+    if backend is None:
+        return TTLCache(maxsize=maxsize, ttl=ttl)
+    return SharedCache(namespace, backend, ttl=ttl)
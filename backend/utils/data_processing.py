@@ -1,35 +1,32 @@
+import os
+import copy
+import math
+from collections import deque
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from models.daily_series import DailySeries
+from utils.cache import TTLCache
+from utils.market_hours import MARKET_TZ, MARKET_CLOSE
+
+def _to_dataframe(data):
+    """Return a date-sorted OHLCV DataFrame from a DailySeries or a legacy time series dict."""
+    if not isinstance(data, DailySeries):
+        data = DailySeries.from_legacy_dict(data)
+    return data.to_dataframe()
 
 def calculate_moving_average(data, window):
     """
     Calculate moving average for stock price data.
     
     Args:
-        data (dict): Time series data from Alpha Vantage API
+        data (DailySeries): Daily bars (a legacy Alpha Vantage dict is also accepted)
         window (int): Window size for moving average
         
     Returns:
         pd.DataFrame: DataFrame with moving average data
     """
-    # Convert data to DataFrame
-    df = pd.DataFrame(data).T
-    df = df.rename(columns={
-        '1. open': 'open',
-        '2. high': 'high',
-        '3. low': 'low',
-        '4. close': 'close',
-        '5. volume': 'volume'
-    })
-    
-    # Convert values to float
-    for col in ['open', 'high', 'low', 'close', 'volume']:
-        df[col] = df[col].astype(float)
-    
-    # Sort by date
-    df.index = pd.to_datetime(df.index)
-    df = df.sort_index()
+    df = _to_dataframe(data)
     
     # Calculate moving average
     df[f'ma_{window}'] = df['close'].rolling(window=window).mean()
@@ -41,29 +38,13 @@ def calculate_volatility(data, window=30):
     Calculate rolling volatility for stock price data.
     
     Args:
-        data (dict): Time series data from Alpha Vantage API
+        data (DailySeries): Daily bars (a legacy Alpha Vantage dict is also accepted)
         window (int): Window size for volatility calculation
         
     Returns:
         pd.DataFrame: DataFrame with volatility data
     """
-    # Convert data to DataFrame
-    df = pd.DataFrame(data).T
-    df = df.rename(columns={
-        '1. open': 'open',
-        '2. high': 'high',
-        '3. low': 'low',
-        '4. close': 'close',
-        '5. volume': 'volume'
-    })
-    
-    # Convert values to float
-    for col in ['open', 'high', 'low', 'close', 'volume']:
-        df[col] = df[col].astype(float)
-    
-    # Sort by date
-    df.index = pd.to_datetime(df.index)
-    df = df.sort_index()
+    df = _to_dataframe(data)
     
     # Calculate daily returns
     df['daily_return'] = df['close'].pct_change()
@@ -73,54 +54,404 @@ def calculate_volatility(data, window=30):
     
     return df
 
+# Indicator engine settings
+SMA_WINDOWS = (20, 50, 200)
+EMA_SPANS = (12, 26)
+MACD_SIGNAL_SPAN = 9
+RSI_PERIOD = 14
+BOLLINGER_WINDOW = 20  # must be one of SMA_WINDOWS
+BOLLINGER_STDEVS = 2.0
+ATR_PERIOD = 14
+VOLATILITY_WINDOW = 20
+VOLUME_WINDOW = 20
+PIVOT_SPAN = 3        # bars on each side of a swing high or low
+PIVOT_LEVELS = 10     # most recent swing highs and lows kept as levels
+TRADING_DAYS_PER_YEAR = 252
+INDICATOR_CACHE_SIZE = int(os.getenv("INDICATOR_CACHE_SIZE", "1024"))
+# Most new bars applied incrementally before a full recompute is cheaper
+INDICATOR_MAX_INCREMENTAL_BARS = int(os.getenv("INDICATOR_MAX_INCREMENTAL_BARS", "50"))
+
+class _RollingWindow:
+    """Fixed-size window keeping a running sum and sum of squares."""
+
+    def __init__(self, size, values=()):
+        self.size = size
+        self.values = deque(values, maxlen=size)
+        self.total = float(sum(self.values))
+        self.total_sq = float(sum(v * v for v in self.values))
+
+    def push(self, value):
+        if len(self.values) == self.size:
+            old = self.values[0]
+            self.total -= old
+            self.total_sq -= old * old
+        self.values.append(value)
+        self.total += value
+        self.total_sq += value * value
+
+    @property
+    def full(self):
+        return len(self.values) == self.size
+
+    def mean(self):
+        return self.total / len(self.values)
+
+    def std(self, ddof=0):
+        count = len(self.values)
+        variance = (self.total_sq - self.total * self.total / count) / (count - ddof)
+        return math.sqrt(max(variance, 0.0))
+
+class IndicatorState:
+    """
+    Technical indicators for one symbol as of its newest bar.
+
+    Built from a whole series in one vectorized pass (from_series), then
+    advanced one bar at a time with update(), which costs the same no matter
+    how long the history is.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.last_date = None
+        self.close = None
+        self.last_bar = None
+        self.sma = {window: _RollingWindow(window) for window in SMA_WINDOWS}
+        self.ema = {span: None for span in EMA_SPANS}
+        self.macd_signal = None
+        self.avg_gain = None
+        self.avg_loss = None
+        self.atr = None
+        self.returns = _RollingWindow(VOLATILITY_WINDOW)
+        self.volumes = _RollingWindow(VOLUME_WINDOW)
+        self.recent_bars = deque(maxlen=2 * PIVOT_SPAN + 1)  # (high, low) for pivot detection
+        self.pivot_highs = deque(maxlen=PIVOT_LEVELS)
+        self.pivot_lows = deque(maxlen=PIVOT_LEVELS)
+        self.previous = None  # state before the newest bar, to revise a partial day
+
+    @classmethod
+    def from_series(cls, series):
+        """
+        Compute every indicator over a DailySeries in one vectorized pass.
+
+        The newest bar is applied with update(), so the state keeps the one
+        before it and a revised partial day can be rebuilt cheaply.
+        """
+        if len(series) == 0:
+            return cls()
+        state = cls._vectorized(series[:-1])
+        return state.update(str(series.dates[-1]), float(series.high[-1]), float(series.low[-1]),
+                            float(series.close[-1]), int(series.volume[-1]))
+
+    @classmethod
+    def _vectorized(cls, series):
+        state = cls()
+        n = len(series)
+        if n == 0:
+            return state
+        close, high, low = series.close, series.high, series.low
+        volume = series.volume.astype(np.float64)
+        frame = pd.DataFrame({"close": close})
+
+        state.count = n
+        state.last_date = str(series.dates[-1])
+        state.close = float(close[-1])
+        state.last_bar = (float(high[-1]), float(low[-1]), float(close[-1]))
+        for window in SMA_WINDOWS:
+            state.sma[window] = _RollingWindow(window, close[-window:].tolist())
+
+        emas = {span: frame["close"].ewm(span=span, adjust=False).mean().to_numpy() for span in EMA_SPANS}
+        for span in EMA_SPANS:
+            state.ema[span] = float(emas[span][-1])
+        macd = emas[EMA_SPANS[0]] - emas[EMA_SPANS[1]]
+        state.macd_signal = float(pd.Series(macd).ewm(span=MACD_SIGNAL_SPAN, adjust=False).mean().iloc[-1])
+
+        if n > 1:
+            delta = np.diff(close)
+            alpha = 1.0 / RSI_PERIOD
+            state.avg_gain = float(pd.Series(np.clip(delta, 0, None)).ewm(alpha=alpha, adjust=False).mean().iloc[-1])
+            state.avg_loss = float(pd.Series(np.clip(-delta, 0, None)).ewm(alpha=alpha, adjust=False).mean().iloc[-1])
+            state.returns = _RollingWindow(VOLATILITY_WINDOW, np.log(close[1:] / close[:-1])[-VOLATILITY_WINDOW:].tolist())
+
+        prev_close = np.concatenate(([np.nan], close[:-1]))
+        true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+        state.atr = float(pd.Series(true_range).ewm(alpha=1.0 / ATR_PERIOD, adjust=False).mean().iloc[-1])
+        state.volumes = _RollingWindow(VOLUME_WINDOW, volume[-VOLUME_WINDOW:].tolist())
+
+        span = 2 * PIVOT_SPAN + 1
+        state.recent_bars = deque(zip(high[-span:].tolist(), low[-span:].tolist()), maxlen=span)
+        if n >= span:
+            high_windows = np.lib.stride_tricks.sliding_window_view(high, span)
+            low_windows = np.lib.stride_tricks.sliding_window_view(low, span)
+            centers_high = high[PIVOT_SPAN:n - PIVOT_SPAN]
+            centers_low = low[PIVOT_SPAN:n - PIVOT_SPAN]
+            state.pivot_highs.extend(centers_high[centers_high == high_windows.max(axis=1)][-PIVOT_LEVELS:].tolist())
+            state.pivot_lows.extend(centers_low[centers_low == low_windows.min(axis=1)][-PIVOT_LEVELS:].tolist())
+        return state
+
+    def update(self, date_str, high, low, close, volume):
+        """
+        Return a new state advanced by one bar.
+
+        Args:
+            date_str (str): Bar date (YYYY-MM-DD), after last_date
+            high, low, close (float): Bar prices
+            volume (int): Bar volume
+        """
+        self.previous = None  # keep a single level of history
+        state = copy.deepcopy(self)
+        state.previous = self
+        prev_close = self.close
+
+        state.count += 1
+        state.last_date = date_str
+        state.close = close
+        state.last_bar = (high, low, close)
+        for window in SMA_WINDOWS:
+            state.sma[window].push(close)
+
+        for span in EMA_SPANS:
+            ema = state.ema[span]
+            state.ema[span] = close if ema is None else ema + 2.0 / (span + 1) * (close - ema)
+        macd = state.ema[EMA_SPANS[0]] - state.ema[EMA_SPANS[1]]
+        alpha = 2.0 / (MACD_SIGNAL_SPAN + 1)
+        state.macd_signal = macd if state.macd_signal is None else state.macd_signal + alpha * (macd - state.macd_signal)
+
+        if prev_close is None:
+            true_range = high - low
+        else:
+            delta = close - prev_close
+            gain, loss = max(delta, 0.0), max(-delta, 0.0)
+            if state.avg_gain is None:
+                state.avg_gain, state.avg_loss = gain, loss
+            else:
+                state.avg_gain += (gain - state.avg_gain) / RSI_PERIOD
+                state.avg_loss += (loss - state.avg_loss) / RSI_PERIOD
+            state.returns.push(math.log(close / prev_close))
+            true_range = max(high - low, abs(high - prev_close), abs(low - prev_close))
+        state.atr = true_range if state.atr is None else state.atr + (true_range - state.atr) / ATR_PERIOD
+        state.volumes.push(float(volume))
+
+        state.recent_bars.append((high, low))
+        if len(state.recent_bars) == state.recent_bars.maxlen:
+            center_high, center_low = state.recent_bars[PIVOT_SPAN]
+            if center_high == max(bar[0] for bar in state.recent_bars):
+                state.pivot_highs.append(center_high)
+            if center_low == min(bar[1] for bar in state.recent_bars):
+                state.pivot_lows.append(center_low)
+        return state
+
+    def snapshot(self):
+        """Return the indicator values as a JSON-friendly dict; None where history is too short."""
+        def value(x):
+            return None if x is None else round(float(x), 4)
+
+        result = {"as_of": self.last_date, "bars": self.count, "close": value(self.close)}
+        for window in SMA_WINDOWS:
+            result[f"sma_{window}"] = value(self.sma[window].mean()) if self.sma[window].full else None
+        for span in EMA_SPANS:
+            result[f"ema_{span}"] = value(self.ema[span])
+
+        if self.count >= EMA_SPANS[1]:
+            macd = self.ema[EMA_SPANS[0]] - self.ema[EMA_SPANS[1]]
+            result.update(macd=value(macd), macd_signal=value(self.macd_signal),
+                          macd_histogram=value(macd - self.macd_signal))
+        else:
+            result.update(macd=None, macd_signal=None, macd_histogram=None)
+
+        rsi = None
+        if self.count > RSI_PERIOD:
+            rsi = 100.0 if self.avg_loss == 0 else 100.0 - 100.0 / (1.0 + self.avg_gain / self.avg_loss)
+        result[f"rsi_{RSI_PERIOD}"] = value(rsi)
+
+        band = self.sma[BOLLINGER_WINDOW]
+        if band.full:
+            middle, width = band.mean(), BOLLINGER_STDEVS * band.std()
+            result.update(bollinger_upper=value(middle + width), bollinger_middle=value(middle),
+                          bollinger_lower=value(middle - width))
+        else:
+            result.update(bollinger_upper=None, bollinger_middle=None, bollinger_lower=None)
+
+        result[f"atr_{ATR_PERIOD}"] = value(self.atr) if self.count >= ATR_PERIOD else None
+        result[f"volatility_{VOLATILITY_WINDOW}d"] = (
+            value(self.returns.std(ddof=1) * math.sqrt(TRADING_DAYS_PER_YEAR) * 100) if self.returns.full else None
+        )
+        result["volume_ratio"] = (
+            value(self.volumes.values[-1] / self.volumes.mean()) if self.volumes.full and self.volumes.total else None
+        )
+
+        # Nearest swing levels around the close, falling back to the classic floor pivots
+        support = resistance = None
+        if self.last_bar:
+            high, low, close = self.last_bar
+            floor_pivot = (high + low + close) / 3
+            support = max((level for level in self.pivot_lows if level < close), default=2 * floor_pivot - high)
+            resistance = min((level for level in self.pivot_highs if level > close), default=2 * floor_pivot - low)
+            result["pivot"] = value(floor_pivot)
+        else:
+            result["pivot"] = None
+        result["support"] = value(support)
+        result["resistance"] = value(resistance)
+        return result
+
+class IndicatorEngine:
+    """
+    Per-symbol indicator cache keyed by the newest bar date.
+
+    A series whose newest bar is already cached is answered from the cache;
+    a series that only adds bars (or revises its newest, partial bar) advances
+    the cached state bar by bar, even when it is a fixed-size tail whose
+    oldest bars have slid out; anything else is recomputed in full.
+    """
+
+    def __init__(self, maxsize=INDICATOR_CACHE_SIZE):
+        self._states = TTLCache(maxsize=maxsize, ttl=float("inf"))
+        self.full_computes = 0
+        self.incremental_updates = 0
+
+    def compute(self, series):
+        """
+        Return the indicators for a DailySeries as a dict (see IndicatorState.snapshot).
+        """
+        if len(series) == 0:
+            return IndicatorState().snapshot()
+        key = series.symbol
+        state = self._states.get(key) if key else None
+        state = self._advance(state, series)
+        if state is None:
+            state = IndicatorState.from_series(series)
+            self.full_computes += 1
+        if key:
+            self._states.set(key, state)
+        return state.snapshot()
+
+    def _advance(self, state, series):
+        """Bring a cached state up to the series' newest bar, or return None if it cannot be."""
+        if state is None or state.last_date is None:
+            return None
+        position = int(np.searchsorted(series.dates, np.datetime64(state.last_date, "D")))
+        if position >= len(series) or str(series.dates[position]) != state.last_date:
+            return None
+        if state.close != series.close[position]:
+            # The newest cached bar was revised (a partial day); rebuild it from the state before it
+            state = state.previous
+            if state is None:
+                return None
+            position -= 1
+            if position < 0 or str(series.dates[position]) != state.last_date:
+                return None
+        # Aligned on the date, so a fixed-size tail sliding forward still advances; the
+        # state may cover more history than the series, but never less
+        if state.count < position + 1 or len(series) - 1 - position > INDICATOR_MAX_INCREMENTAL_BARS:
+            return None
+        for i in range(position + 1, len(series)):
+            state = state.update(str(series.dates[i]), float(series.high[i]), float(series.low[i]),
+                                 float(series.close[i]), int(series.volume[i]))
+            self.incremental_updates += 1
+        return state
+
+    def stats(self):
+        return {
+            "full_computes": self.full_computes,
+            "incremental_updates": self.incremental_updates,
+            "cache": self._states.stats()
+        }
+
+indicator_engine = IndicatorEngine()
+
+def compute_indicators(series):
+    """
+    Compute SMA, EMA, MACD, RSI, Bollinger bands, ATR, volatility and
+    support/resistance for a DailySeries, reusing cached work for its symbol.
+
+    Returns:
+        dict: Indicator values as of the newest bar
+    """
+    return indicator_engine.compute(series)
+
+def align_to_sessions(session_dates, timestamps):
+    """
+    Map news timestamps onto the trading session they can first affect.
+    
+    Timestamps are converted to exchange time; anything published at or after
+    the 16:00 close rolls over to the next day, and weekend or holiday dates
+    roll forward to the next session in session_dates. Date-only values are
+    taken as that day.
+    
+    Args:
+        session_dates (np.ndarray): Sorted datetime64[D] session dates
+        timestamps (list): ISO 8601 strings (or datetimes); unparseable values are ignored
+        
+    Returns:
+        np.ndarray: Index into session_dates for each timestamp, -1 where it
+            cannot be aligned (unparseable, or outside the sessions' range)
+    """
+    parsed = pd.to_datetime(pd.Series(timestamps, dtype=object), errors="coerce", utc=True, format="mixed")
+    local = parsed.dt.tz_convert(MARKET_TZ)
+    days = local.dt.tz_localize(None).dt.normalize()
+    after_close = (local.dt.hour * 60 + local.dt.minute) >= (MARKET_CLOSE.hour * 60 + MARKET_CLOSE.minute)
+    # Date-only inputs parse to UTC midnight; keep them on their own date
+    date_only = pd.Series([isinstance(t, str) and len(t.strip()) == 10 for t in timestamps], index=parsed.index)
+    days = days.where(~date_only, parsed.dt.tz_localize(None).dt.normalize())
+    days = days + pd.to_timedelta((after_close & ~date_only).astype(int), unit="D")
+    
+    valid = days.notna().to_numpy()
+    day_values = days.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+    index = np.searchsorted(session_dates, day_values, side="left")
+    in_range = (index < len(session_dates)) & (day_values >= session_dates[0]) if len(session_dates) else False
+    return np.where(valid & in_range, index, -1)
+
 def find_price_correlation(price_data, news_dates):
     """
-    Find correlation between price movements and news dates.
+    Find price movements around news dates.
+    
+    Every news timestamp is aligned to its trading session in one binary
+    search, and same-day and next-day returns are computed as array operations.
     
     Args:
-        price_data (pd.DataFrame): DataFrame with price data
-        news_dates (list): List of dates with significant news
+        price_data (DailySeries): Daily bars (a DataFrame with open, close and
+            volume columns indexed by date is also accepted)
+        news_dates (list): News publication timestamps or dates
         
     Returns:
-        dict: Analysis of price movements around news dates
+        list: For each news item that falls within the price history: its
+            position in news_dates, the session it was aligned to, the open-to-close
+            and previous-close-to-close returns that day, and the next day's return
     """
-    results = []
-    
-    for date_str in news_dates:
-        try:
-            # Convert string to datetime
-            news_date = pd.to_datetime(date_str)
-            
-            # Find the nearest trading day (might not be exact if news came on weekend)
-            if news_date in price_data.index:
-                trading_day = news_date
-            else:
-                # Find closest date
-                trading_day = price_data.index[price_data.index.get_indexer([news_date], method='nearest')[0]]
-            
-            # Get day before and after
-            day_before_idx = price_data.index.get_loc(trading_day) - 1
-            day_after_idx = price_data.index.get_loc(trading_day) + 1
-            
-            # Make sure indices are valid
-            if day_before_idx >= 0 and day_after_idx < len(price_data):
-                day_before = price_data.index[day_before_idx]
-                day_after = price_data.index[day_after_idx]
-                
-                # Calculate price changes
-                change_on_day = (price_data.loc[trading_day, 'close'] - price_data.loc[trading_day, 'open']) / price_data.loc[trading_day, 'open']
-                change_next_day = (price_data.loc[day_after, 'close'] - price_data.loc[trading_day, 'close']) / price_data.loc[trading_day, 'close']
-                
-                results.append({
-                    'news_date': news_date,
-                    'trading_day': trading_day,
-                    'change_on_day': change_on_day,
-                    'change_next_day': change_next_day,
-                    'closing_price': price_data.loc[trading_day, 'close'],
-                    'volume': price_data.loc[trading_day, 'volume']
-                })
-        except Exception as e:
-            # Skip dates that can't be processed
-            continue
-    
-    return results
+    if isinstance(price_data, pd.DataFrame):
+        frame = price_data.sort_index()
+        dates = frame.index.values.astype("datetime64[D]")
+        opens, closes = frame["open"].to_numpy(float), frame["close"].to_numpy(float)
+        volumes = frame["volume"].to_numpy()
+    else:
+        dates, opens, closes, volumes = price_data.dates, price_data.open, price_data.close, price_data.volume
+    if len(dates) == 0 or len(news_dates) == 0:
+        return []
+    
+    news_index = np.arange(len(news_dates))
+    session = align_to_sessions(dates, list(news_dates))
+    keep = session >= 0
+    news_index, session = news_index[keep], session[keep]
+    
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change_on_day = closes[session] / opens[session] - 1
+        previous = np.maximum(session - 1, 0)
+        change_from_previous_close = np.where(session > 0, closes[session] / closes[previous] - 1, np.nan)
+        following = np.minimum(session + 1, len(dates) - 1)
+        change_next_day = np.where(session + 1 < len(dates), closes[following] / closes[session] - 1, np.nan)
+    
+    def optional(value):
+        return None if np.isnan(value) else float(value)
+    
+    return [
+        {
+            "news_index": int(news_index[i]),
+            "news_date": news_dates[news_index[i]],
+            "trading_day": str(dates[session[i]]),
+            "change_on_day": optional(change_on_day[i]),
+            "change_from_previous_close": optional(change_from_previous_close[i]),
+            "change_next_day": optional(change_next_day[i]),
+            "closing_price": float(closes[session[i]]),
+            "volume": int(volumes[session[i]])
+        }
+        for i in range(len(session))
+    ]
@@ -0,0 +1,101 @@
+import os
+import time
+import logging
+import contextvars
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Time budget of a request when the client does not send one, and the most a client may ask for
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "30"))
+REQUEST_DEADLINE_MAX_SECONDS = float(os.getenv("REQUEST_DEADLINE_MAX_SECONDS", "120"))
+# Header carrying the client's budget in seconds, e.g. "X-Request-Deadline: 8"
+DEADLINE_HEADER = "X-Request-Deadline"
+# Shortest timeout handed to an HTTP call, so a nearly spent budget still gets a quick answer
+MIN_CALL_TIMEOUT = 0.1
+
+# time.monotonic() value by which the current request must be answered, or None
+_deadline = contextvars.ContextVar("request_deadline", default=None)
+
+class DeadlineExceeded(Exception):
+    """Raised when a call is attempted after the request's deadline has passed."""
+
+def parse_deadline(value):
+    """
+    Turn a deadline header value into a budget in seconds.
+
+    Args:
+        value (str): Seconds the client will wait, or None
+
+    Returns:
+        float: The budget, REQUEST_DEADLINE_SECONDS if the value is missing or
+            invalid, at most REQUEST_DEADLINE_MAX_SECONDS
+    """
+    if value:
+        try:
+            seconds = float(value)
+            if seconds > 0:
+                return min(seconds, REQUEST_DEADLINE_MAX_SECONDS)
+        except ValueError:
+            pass
+        logger.warning(f"Ignoring invalid {DEADLINE_HEADER} header: {value!r}")
+    return REQUEST_DEADLINE_SECONDS
+
+@contextmanager
+def deadline_scope(seconds):
+    """Run the block with a deadline `seconds` from now; a tighter enclosing deadline is kept."""
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def remaining():
+    """Seconds left before the current deadline, or None if there is no deadline."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+def has_time_for(seconds):
+    """Return True if there is no deadline or at least `seconds` remain."""
+    left = remaining()
+    return left is None or left >= seconds
+
+def clamp_timeout(timeout):
+    """
+    Shorten a call's timeout to the time the request has left.
+
+    Raises:
+        DeadlineExceeded: If the deadline has already passed
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    if timeout is None:
+        return max(left, MIN_CALL_TIMEOUT)
+    return max(min(timeout, left), MIN_CALL_TIMEOUT)
+
+def bind(func):
+    """
+    Wrap func so it runs under the caller's deadline on another thread.
+
+    Use for work handed to a ThreadPoolExecutor, whose threads do not inherit
+    context variables.
+    """
+    deadline = _deadline.get()
+
+    def wrapper(*args, **kwargs):
+        token = _deadline.set(deadline)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _deadline.reset(token)
+
+    return wrapper
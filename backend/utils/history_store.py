@@ -0,0 +1,201 @@
+import os
+import sqlite3
+import threading
+import time
+import logging
+from dotenv import load_dotenv
+from utils.market_hours import is_market_open, last_completed_session
+from models.daily_series import DailySeries
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "history.sqlite3")
+HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH", DEFAULT_DB_PATH)
+# Minimum seconds between provider checks for the same symbol
+HISTORY_RECHECK_SECONDS = float(os.getenv("HISTORY_RECHECK_SECONDS", "900"))
+
+# Number of bars each outputsize covers, matching the provider clients
+OUTPUTSIZE_BARS = {"compact": 100, "full": 5000}
+
+class HistoryStore:
+    """
+    Local SQLite store of daily OHLCV bars keyed by symbol and date.
+
+    The first request for a symbol downloads its history once; later requests
+    only fetch the bars after the newest stored one and serve everything else
+    from disk. The file can be shared by all worker processes on a host.
+    """
+
+    def __init__(self, path=HISTORY_DB_PATH, recheck_seconds=HISTORY_RECHECK_SECONDS):
+        self.path = path
+        self.recheck_seconds = recheck_seconds
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._init_schema()
+
+    def _connection(self):
+        """Return this thread's connection to the store."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._connection()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS daily_bars (
+                    symbol TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    open REAL, high REAL, low REAL, close REAL, volume INTEGER,
+                    PRIMARY KEY (symbol, date)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    symbol TEXT PRIMARY KEY,
+                    bars INTEGER NOT NULL,
+                    checked_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS failed_backfills (
+                    symbol TEXT PRIMARY KEY,
+                    bars INTEGER NOT NULL,
+                    failed_at REAL NOT NULL
+                )
+            """)
+
+    def last_date(self, symbol):
+        """Return the date (YYYY-MM-DD) of the newest stored bar, or None."""
+        row = self._connection().execute(
+            "SELECT MAX(date) FROM daily_bars WHERE symbol = ?", (symbol,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def upsert(self, symbol, series):
+        """
+        Insert or replace bars for a symbol.
+
+        Args:
+            symbol (str): Stock ticker symbol
+            series (DailySeries): Bars to store
+        """
+        rows = list(zip(
+            [symbol] * len(series), series.date_strings().tolist(), series.open.tolist(),
+            series.high.tolist(), series.low.tolist(), series.close.tolist(), series.volume.tolist()
+        ))
+        conn = self._connection()
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO daily_bars VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def load(self, symbol, limit=None):
+        """
+        Load the newest stored bars for a symbol.
+
+        Args:
+            symbol (str): Stock ticker symbol
+            limit (int): Maximum number of bars, newest first; all bars if None
+
+        Returns:
+            DailySeries: The bars in ascending date order
+        """
+        sql = "SELECT date, open, high, low, close, volume FROM daily_bars WHERE symbol = ? ORDER BY date DESC"
+        params = (symbol,)
+        if limit:
+            sql += " LIMIT ?"
+            params = (symbol, limit)
+        rows = self._connection().execute(sql, params).fetchall()
+        rows.reverse()
+        return DailySeries.from_rows(rows, symbol=symbol)
+
+    def _sync_state(self, symbol):
+        row = self._connection().execute(
+            "SELECT bars, checked_at FROM sync_state WHERE symbol = ?", (symbol,)
+        ).fetchone()
+        return row if row else (0, 0.0)
+
+    def _mark_checked(self, symbol, bars):
+        conn = self._connection()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)", (symbol, bars, time.time()))
+
+    def _backfill_failed_recently(self, symbol, bars):
+        """Return True if a backfill to at least `bars` bars failed within recheck_seconds."""
+        row = self._connection().execute(
+            "SELECT bars, failed_at FROM failed_backfills WHERE symbol = ?", (symbol,)
+        ).fetchone()
+        return bool(row) and row[0] >= bars and time.time() - row[1] < self.recheck_seconds
+
+    def _mark_backfill(self, symbol, bars, ok):
+        conn = self._connection()
+        with conn:
+            if ok:
+                conn.execute("DELETE FROM failed_backfills WHERE symbol = ?", (symbol,))
+            else:
+                conn.execute("INSERT OR REPLACE INTO failed_backfills VALUES (?, ?, ?)", (symbol, bars, time.time()))
+
+    def _is_stale(self, last_date):
+        """Return True if bars newer than last_date may exist upstream."""
+        if last_date is None:
+            return True
+        if is_market_open():
+            # Today's bar keeps changing until the close
+            return True
+        return last_date < last_completed_session().isoformat()
+
+    def get_daily_time_series(self, symbol, fetch, outputsize="compact", bars=None):
+        """
+        Return daily bars for a symbol, fetching only what the store is missing.
+
+        Args:
+            symbol (str): Stock ticker symbol
+            fetch (callable): Provider call taking (symbol, outputsize=..., from_date=...)
+                and returning a DailySeries, or None
+            outputsize (str): 'compact' for the last 100 bars, 'full' for the whole history
+            bars (int): Number of newest bars to return; by default all the outputsize covers
+
+        Returns:
+            DailySeries: The bars in ascending date order
+        """
+        wanted_bars = OUTPUTSIZE_BARS.get(outputsize, OUTPUTSIZE_BARS["compact"])
+        stored_bars, checked_at = self._sync_state(symbol)
+        last_date = self.last_date(symbol)
+        backfill = last_date is None or stored_bars < wanted_bars
+        if backfill and self._backfill_failed_recently(symbol, wanted_bars):
+            # Unknown, delisted or rate-limited symbols wait out recheck_seconds before the next try
+            backfill = False
+
+        try:
+            if backfill:
+                # Initial backfill, or a deeper history than we hold so far
+                data = fetch(symbol, outputsize=outputsize)
+                if data:
+                    self.upsert(symbol, data)
+                    self._mark_checked(symbol, wanted_bars)
+                    logger.info(f"Backfilled {len(data)} bars for {symbol}")
+                self._mark_backfill(symbol, wanted_bars, ok=bool(data))
+            elif last_date is None:
+                pass
+            elif self._is_stale(last_date) and time.time() - checked_at >= self.recheck_seconds:
+                # Re-read from the newest stored bar so a partial day is overwritten
+                data = fetch(symbol, outputsize=outputsize, from_date=last_date)
+                if data:
+                    self.upsert(symbol, data)
+                    logger.info(f"Fetched {len(data)} new bars for {symbol} since {last_date}")
+                self._mark_checked(symbol, stored_bars)
+        except Exception as e:
+            # Serve whatever is stored if the provider fails
+            logger.error(f"Error refreshing history for {symbol}: {str(e)}")
+            if backfill:
+                self._mark_backfill(symbol, wanted_bars, ok=False)
+
+        if bars is None:
+            bars = None if outputsize == "full" else wanted_bars
+        return self.load(symbol, limit=bars)
@@ -1,7 +1,16 @@
-import requests
 import os
+import re
 import json
+import math
+import hashlib
+import time
 import logging
+from api import http_client
+from utils.cache_backend import make_cache
+from utils.nlp import classify_query_intent
+from utils.rate_limiter import get_limiter
+from utils.deadline import has_time_for
+from utils.metrics import STAGE_SECONDS
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,10 +18,55 @@ logger = logging.getLogger(__name__)
 
 # Get OpenRouter API key from .env
 OPENROUTER_API_KEY = os.environ.get("OPENROUTER_API_KEY")
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+
+# Analysis cache settings; prices within the same relative bucket share an entry
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "512"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "900"))
+LLM_CACHE_PRICE_BUCKET_PCT = float(os.getenv("LLM_CACHE_PRICE_BUCKET_PCT", "0.5"))
+# Skip the LLM for the template analysis when less than this is left of the request deadline
+LLM_MIN_SECONDS = float(os.getenv("LLM_MIN_SECONDS", "8"))
+
+# Indicator fields included in the prompt, in order
+INDICATOR_LABELS = (
+    ("sma_20", "20-day SMA"), ("sma_50", "50-day SMA"), ("sma_200", "200-day SMA"),
+    ("rsi_14", "14-day RSI"), ("macd", "MACD"), ("macd_signal", "MACD signal"),
+    ("bollinger_upper", "Upper Bollinger band"), ("bollinger_lower", "Lower Bollinger band"),
+    ("atr_14", "14-day ATR"), ("volatility_20d", "20-day annualized volatility (%)"),
+    ("volume_ratio", "Volume vs 20-day average"), ("support", "Nearest support"),
+    ("resistance", "Nearest resistance"),
+)
+
+analysis_cache = make_cache("llm_analysis", maxsize=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL)
+
+def _price_bucket(price):
+    """Map a price onto logarithmic buckets LLM_CACHE_PRICE_BUCKET_PCT percent wide."""
+    if not price or price <= 0:
+        return None
+    return math.floor(math.log(price) / math.log1p(LLM_CACHE_PRICE_BUCKET_PCT / 100))
+
+def analysis_fingerprint(ticker, query, price_info, news_info, price_change_info):
+    """
+    Build the cache key for an LLM analysis from its normalized inputs.
+    
+    Returns:
+        str: Hex digest of ticker, timeframe, price bucket, headline set and query intent
+    """
+    headlines = sorted({" ".join(h.lower().split()) for h in news_info.get("headlines", []) if h})
+    headline_hash = hashlib.sha1("\n".join(headlines).encode("utf-8")).hexdigest()
+    key = [
+        ticker,
+        price_change_info.get("timeframe", "today"),
+        _price_bucket(price_info.get("price")),
+        headline_hash,
+        classify_query_intent(query)
+    ]
+    return hashlib.sha256(json.dumps(key).encode("utf-8")).hexdigest()
 
 def generate_analysis_with_llm(ticker, query, price_info, news_info, price_change_info):
     """
-    Generate both a concise summary and detailed analysis using the deepseek-chat model.
+    Generate both a concise summary and detailed analysis, reusing a cached
+    result when the same analysis inputs were seen within LLM_CACHE_TTL.
     
     Args:
         ticker (str): Stock ticker symbol
@@ -28,60 +82,184 @@ def generate_analysis_with_llm(ticker, query, price_info, news_info, price_chang
         logger.warning("OpenRouter API key not found. Using fallback summary generation.")
         return None
     
-    try:
-        # Extract price information
-        current_price = price_info.get("price")
-        company_name = price_info.get("company_name", ticker)
-        
-        # Extract price change details
-        change = price_change_info.get("change")
-        change_percent = price_change_info.get("change_percent")
-        from_price = price_change_info.get("from_price")
-        to_price = price_change_info.get("to_price")
-        timeframe = price_change_info.get("timeframe", "today")
-        
-        # Get news headlines and their sentiments
-        headlines = news_info.get("headlines", [])
+    key = analysis_fingerprint(ticker, query, price_info, news_info, price_change_info)
+    cached = analysis_cache.get(key)
+    if cached:
+        logger.info(f"Using cached LLM analysis for {ticker}")
+        return dict(cached)
+    
+    with STAGE_SECONDS.time("llm"):
+        result = _request_analysis(ticker, query, price_info, news_info, price_change_info)
+    if result and "summary" in result and "detailed_analysis" in result:
+        analysis_cache.set(key, dict(result))
+    return result
+
+def _request_analysis(ticker, query, price_info, news_info, price_change_info):
+    """
+    Generate both a concise summary and detailed analysis using the deepseek-chat model.
+    
+    Args:
+        ticker (str): Stock ticker symbol
+        query (str): Original user query
+        price_info (dict): Current price information
+        news_info (dict): News headlines and information
+        price_change_info (dict): Price change data
         
-        # Get sentiments if available in the analysis section
-        sentiments = []
-        if "news_analysis" in price_info and "sentiments" in price_info["news_analysis"]:
-            sentiments = price_info["news_analysis"]["sentiments"]
+    Returns:
+        dict: Generated summary and detailed analysis
+    """
+    if not has_time_for(LLM_MIN_SECONDS):
+        logger.warning(f"Too little of the request deadline left for the LLM, using fallback analysis for {ticker}")
+        return None
+    
+    if not get_limiter("openrouter").acquire():
+        logger.warning(f"OpenRouter rate limit reached, using fallback analysis for {ticker}")
+        return None
+    
+    try:
+        headers, data = _build_request(ticker, query, price_info, news_info, price_change_info)
         
-        # Prepare news with sentiments for the prompt
-        news_items = []
-        for i, headline in enumerate(headlines[:10]):  # Limit to top 10 headlines
-            sentiment = ""
-            if i < len(sentiments):
-                sentiment = f" (Sentiment: {sentiments[i]})"
-            news_items.append(f"- {headline}{sentiment}")
+        logger.info(f"Requesting LLM analysis for {ticker}")
+        response = http_client.post(
+            OPENROUTER_URL,
+            headers=headers,
+            data=json.dumps(data),
+            timeout=30
+        )
         
-        news_section = "\n".join(news_items) if news_items else "No recent news available."
+        if response.status_code != 200:
+            logger.error(f"Error from OpenRouter API: {response.status_code} - {response.text}")
+            return None
+            
+        result = response.json()
         
-        # Create detailed price information section
-        price_section = ""
-        if current_price is not None:
-            price_section += f"Current Price: ${current_price}\n"
+        if "choices" in result and len(result["choices"]) > 0:
+            content = result["choices"][0]["message"]["content"].strip()
+            logger.info(f"Generated LLM analysis for {ticker} - length: {len(content)} chars")
+            return _parse_content(content)
         else:
-            price_section += "Current Price: Not available\n"
-            
-        if to_price is not None:
-            price_section += f"Latest Price: ${to_price}\n"
-            
-        if from_price is not None:
-            price_section += f"Previous Price (start of {timeframe}): ${from_price}\n"
+            logger.error(f"Unexpected response format from OpenRouter: {result}")
+            return None
             
-        if change is not None and change_percent is not None:
-            direction = "increased" if change > 0 else "decreased" if change < 0 else "unchanged"
-            price_section += f"Price Change: {direction} by ${abs(change):.2f} ({abs(change_percent):.2f}%) over {timeframe}\n"
+    except Exception as e:
+        logger.error(f"Error generating analysis with LLM: {str(e)}")
+        return None
+
+def _parse_content(content):
+    """Parse the model output into summary and detailed analysis."""
+    try:
+        # Check if the content is formatted as JSON
+        if content.startswith("{") and content.endswith("}"):
+            analysis_data = json.loads(content)
+            return analysis_data
+        else:
+            # Try to extract JSON from the text
+            json_match = re.search(r'(\{[\s\S]*\})', content)
+            if json_match:
+                analysis_data = json.loads(json_match.group(1))
+                return analysis_data
+            else:
+                # Fallback: split into summary and detailed
+                return _split_plain_content(content)
+    except json.JSONDecodeError as e:
+        logger.error(f"Failed to parse LLM response as JSON: {str(e)}")
+        # Fallback approach if JSON parsing fails
+        return _split_plain_content(content)
+
+def _split_plain_content(content):
+    """Split a non-JSON model output into summary and detailed analysis."""
+    parts = content.split("\n\n", 1)
+    if len(parts) > 1:
+        return {
+            "summary": parts[0].replace("CONCISE SUMMARY:", "").strip(),
+            "detailed_analysis": parts[1].replace("DETAILED ANALYSIS:", "").strip()
+        }
+    else:
+        return {
+            "summary": content[:150] + "...",
+            "detailed_analysis": content
+        }
+
+def _build_request(ticker, query, price_info, news_info, price_change_info):
+    """
+    Build the OpenRouter chat completion request for an analysis.
+    
+    Returns:
+        tuple: (headers, data) for the chat completions endpoint
+    """
+    # Extract price information
+    current_price = price_info.get("price")
+    company_name = price_info.get("company_name", ticker)
+    
+    # Extract price change details
+    change = price_change_info.get("change")
+    change_percent = price_change_info.get("change_percent")
+    from_price = price_change_info.get("from_price")
+    to_price = price_change_info.get("to_price")
+    timeframe = price_change_info.get("timeframe", "today")
+    
+    # Get news headlines and their sentiments
+    headlines = news_info.get("headlines", [])
+    
+    # Get sentiments and aligned sessions if available in the analysis section,
+    # whose headline order (most relevant to the move first) they follow
+    sentiments = []
+    sessions = []
+    source_counts = []
+    if "news_analysis" in price_info and "sentiments" in price_info["news_analysis"]:
+        headlines = price_info["news_analysis"].get("headlines", headlines)
+        sentiments = price_info["news_analysis"]["sentiments"]
+        sessions = price_info["news_analysis"].get("sessions", [])
+        source_counts = price_info["news_analysis"].get("source_counts", [])
+    
+    # Prepare news with sentiments for the prompt
+    news_items = []
+    for i, headline in enumerate(headlines[:10]):  # Limit to top 10 headlines
+        sentiment = ""
+        if i < len(sentiments):
+            sentiment = f" (Sentiment: {sentiments[i]})"
+        if i < len(sessions) and sessions[i]:
+            sentiment += f" [Trading day: {sessions[i]}]"
+        if i < len(source_counts) and source_counts[i] > 1:
+            sentiment += f" [Reported by {source_counts[i]} sources]"
+        news_items.append(f"- {headline}{sentiment}")
+    
+    news_section = "\n".join(news_items) if news_items else "No recent news available."
+    
+    # Create detailed price information section
+    price_section = ""
+    if current_price is not None:
+        price_section += f"Current Price: ${current_price}\n"
+    else:
+        price_section += "Current Price: Not available\n"
+        
+    if to_price is not None:
+        price_section += f"Latest Price: ${to_price}\n"
+        
+    if from_price is not None:
+        price_section += f"Previous Price (start of {timeframe}): ${from_price}\n"
         
-        # Create the prompt with stronger emphasis on creating distinct summary and detailed analysis
-        prompt = f"""You are a professional financial analyst. The user has asked: "{query}"
+    if change is not None and change_percent is not None:
+        direction = "increased" if change > 0 else "decreased" if change < 0 else "unchanged"
+        price_section += f"Price Change: {direction} by ${abs(change):.2f} ({abs(change_percent):.2f}%) over {timeframe}\n"
+    
+    # Technical indicators computed from the daily history, if available
+    indicators = price_info.get("indicators") or {}
+    indicator_lines = [
+        f"- {label}: {indicators[key]}" for key, label in INDICATOR_LABELS if indicators.get(key) is not None
+    ]
+    indicator_section = "\n".join(indicator_lines) if indicator_lines else "Not available."
+    
+    # Create the prompt with stronger emphasis on creating distinct summary and detailed analysis
+    prompt = f"""You are a professional financial analyst. The user has asked: "{query}"
 
 Please analyze {company_name} ({ticker}) stock based on the following data:
 
 {price_section}
-Recent News (with sentiment analysis):
+Technical Indicators (as of the latest daily close):
+{indicator_section}
+
+Recent News (with sentiment analysis and the trading day each headline could first affect):
 {news_section}
 
 Provide TWO COMPLETELY DIFFERENT responses:
@@ -92,7 +270,7 @@ Provide TWO COMPLETELY DIFFERENT responses:
 
 2. DETAILED ANALYSIS (5 paragraphs minimum):
    - Paragraph 1: In-depth answer to "{query}" with comprehensive evidence from news
-   - Paragraph 2: Technical analysis of price movements with support/resistance levels
+   - Paragraph 2: Technical analysis of price movements using the indicator values and support/resistance levels above (do not invent other levels)
    - Paragraph 3: News impact analysis comparing positive vs negative headlines
    - Paragraph 4: Industry context and competitor comparison 
    - Paragraph 5: Forward-looking outlook with specific predictions
@@ -102,92 +280,178 @@ IMPORTANT: The detailed analysis MUST be 5x longer than the summary and contain
 Format your response as a JSON object with two keys: "summary" and "detailed_analysis".
 """
 
-        # Make API call to OpenRouter
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-            "HTTP-Referer": "http://localhost:8000",  # For testing on localhost
-            "X-Title": "StockBot"
-        }
-        
-        data = {
-            "model": "deepseek/deepseek-chat:free",
-            "messages": [
-                {
-                    "role": "system", 
-                    "content": "You are StockBot, a professional stock analysis assistant that provides both concise summaries and detailed analyses."
-                },
-                {
-                    "role": "user", 
-                    "content": prompt
-                }
-            ],
-            "max_tokens": 1000,
-            "temperature": 0.7
-        }
-        
-        logger.info(f"Requesting LLM analysis for {ticker}")
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers=headers,
-            data=json.dumps(data),
-            timeout=30
-        )
-        
-        if response.status_code != 200:
-            logger.error(f"Error from OpenRouter API: {response.status_code} - {response.text}")
-            return None
-            
-        result = response.json()
-        
-        if "choices" in result and len(result["choices"]) > 0:
-            content = result["choices"][0]["message"]["content"].strip()
-            logger.info(f"Generated LLM analysis for {ticker} - length: {len(content)} chars")
-            
-            # Parse the JSON response
-            try:
-                # Check if the content is formatted as JSON
-                if content.startswith("{") and content.endswith("}"):
-                    analysis_data = json.loads(content)
-                    return analysis_data
-                else:
-                    # Try to extract JSON from the text
-                    import re
-                    json_match = re.search(r'(\{[\s\S]*\})', content)
-                    if json_match:
-                        analysis_data = json.loads(json_match.group(1))
-                        return analysis_data
-                    else:
-                        # Fallback: split into summary and detailed
-                        parts = content.split("\n\n", 1)
-                        if len(parts) > 1:
-                            return {
-                                "summary": parts[0].replace("CONCISE SUMMARY:", "").strip(),
-                                "detailed_analysis": parts[1].replace("DETAILED ANALYSIS:", "").strip()
-                            }
-                        else:
-                            return {
-                                "summary": content[:150] + "...",
-                                "detailed_analysis": content
-                            }
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse LLM response as JSON: {str(e)}")
-                # Fallback approach if JSON parsing fails
-                parts = content.split("\n\n", 1)
-                if len(parts) > 1:
-                    return {
-                        "summary": parts[0].replace("CONCISE SUMMARY:", "").strip(),
-                        "detailed_analysis": parts[1].replace("DETAILED ANALYSIS:", "").strip()
-                    }
-                else:
-                    return {
-                        "summary": content[:150] + "...",
-                        "detailed_analysis": content
-                    }
-        else:
-            logger.error(f"Unexpected response format from OpenRouter: {result}")
-            return None
+    # Request headers for OpenRouter
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+        "HTTP-Referer": "http://localhost:8000",  # For testing on localhost
+        "X-Title": "StockBot"
+    }
+    
+    data = {
+        "model": "deepseek/deepseek-chat:free",
+        "messages": [
+            {
+                "role": "system", 
+                "content": "You are StockBot, a professional stock analysis assistant that provides both concise summaries and detailed analyses."
+            },
+            {
+                "role": "user", 
+                "content": prompt
+            }
+        ],
+        "max_tokens": 1000,
+        "temperature": 0.7
+    }
+    
+    return headers, data
+
+
+async def stream_analysis_with_llm(ticker, query, price_info, news_info, price_change_info):
+    """
+    Stream an analysis from OpenRouter as it is generated.
+    
+    Yields:
+        tuple: ("summary_token" | "detailed_analysis_token", text) for each new piece of
+            either field, then ("result", dict) with the complete parsed analysis. Nothing
+            is yielded after a failure, so callers fall back to the template analysis.
+    """
+    if not OPENROUTER_API_KEY:
+        logger.warning("OpenRouter API key not found. Using fallback summary generation.")
+        return
+    
+    key = analysis_fingerprint(ticker, query, price_info, news_info, price_change_info)
+    cached = analysis_cache.get(key)
+    if cached:
+        logger.info(f"Using cached LLM analysis for {ticker}")
+        yield "result", dict(cached)
+        return
+    
+    if not has_time_for(LLM_MIN_SECONDS):
+        logger.warning(f"Too little of the request deadline left for the LLM, using fallback analysis for {ticker}")
+        return
+    
+    if not await get_limiter("openrouter").acquire_async():
+        logger.warning(f"OpenRouter rate limit reached, using fallback analysis for {ticker}")
+        return
+    
+    headers, data = _build_request(ticker, query, price_info, news_info, price_change_info)
+    data["stream"] = True
+    extractor = StreamingFieldExtractor(("summary", "detailed_analysis"))
+    content = ""
+    started = time.perf_counter()
+    
+    try:
+        logger.info(f"Streaming LLM analysis for {ticker}")
+        async with http_client.async_stream("POST", OPENROUTER_URL, headers=headers, data=json.dumps(data), timeout=30) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                logger.error(f"Error from OpenRouter API: {response.status_code} - {body[:500]}")
+                return
             
+            async for line in response.aiter_lines():
+                # Server-sent events; lines starting with ':' are keep-alive comments
+                if not line.startswith("data:"):
+                    continue
+                payload = line[len("data:"):].strip()
+                if payload == "[DONE]":
+                    break
+                
+                chunk = json.loads(payload)
+                choices = chunk.get("choices") or []
+                delta = choices[0].get("delta", {}).get("content") if choices else None
+                if not delta:
+                    continue
+                
+                content += delta
+                for field, text in extractor.feed(delta):
+                    yield f"{field}_token", text
     except Exception as e:
-        logger.error(f"Error generating analysis with LLM: {str(e)}")
-        return None
+        logger.error(f"Error streaming analysis with LLM: {str(e)}")
+        return
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, "llm")
+    
+    content = content.strip()
+    if not content:
+        return
+    
+    result = _parse_content(content)
+    if result and "summary" in result and "detailed_analysis" in result:
+        analysis_cache.set(key, dict(result))
+    yield "result", result
+
+class StreamingFieldExtractor:
+    """
+    Incrementally extract string fields from a JSON object being streamed.
+    
+    The model answers with {"summary": "...", "detailed_analysis": "..."}; this
+    decodes the text of the requested fields as it arrives so it can be
+    forwarded before the object is complete.
+    """
+    
+    ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+    
+    def __init__(self, fields):
+        self.buffer = ""
+        self.patterns = {field: re.compile(r'"%s"\s*:\s*"' % re.escape(field)) for field in fields}
+        self.positions = {}      # field -> next buffer index to decode
+        self.finished = set()
+    
+    def feed(self, text):
+        """
+        Add streamed text.
+        
+        Returns:
+            list: (field, new_text) pairs decoded since the previous call
+        """
+        self.buffer += text
+        updates = []
+        for field, pattern in self.patterns.items():
+            if field in self.finished:
+                continue
+            if field not in self.positions:
+                match = pattern.search(self.buffer)
+                if not match:
+                    continue
+                self.positions[field] = match.end()
+            value, self.positions[field], complete = self._decode(self.positions[field])
+            if value:
+                updates.append((field, value))
+            if complete:
+                self.finished.add(field)
+        return updates
+    
+    def _decode(self, start):
+        """
+        Decode a JSON string body from start, stopping before an incomplete escape.
+        
+        Returns:
+            tuple: (decoded text, next index to decode, whether the string ended)
+        """
+        chars = []
+        i = start
+        buffer = self.buffer
+        while i < len(buffer):
+            char = buffer[i]
+            if char == '"':
+                return "".join(chars), i + 1, True
+            if char == "\\":
+                if i + 1 >= len(buffer):
+                    break
+                code = buffer[i + 1]
+                if code == "u":
+                    if i + 6 > len(buffer):
+                        break
+                    try:
+                        chars.append(chr(int(buffer[i + 2:i + 6], 16)))
+                    except ValueError:
+                        pass
+                    i += 6
+                    continue
+                chars.append(self.ESCAPES.get(code, code))
+                i += 2
+                continue
+            chars.append(char)
+            i += 1
+        return "".join(chars), i, False
@@ -0,0 +1,116 @@
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+MARKET_TZ = ZoneInfo("America/New_York")
+MARKET_OPEN = time(9, 30)
+MARKET_CLOSE = time(16, 0)
+
+def _nth_weekday(year, month, weekday, n):
+    """Return the nth given weekday (0=Monday) of a month."""
+    first = date(year, month, 1)
+    offset = (weekday - first.weekday()) % 7
+    return first + timedelta(days=offset + 7 * (n - 1))
+
+def _last_weekday(year, month, weekday):
+    """Return the last given weekday (0=Monday) of a month."""
+    next_month = date(year + month // 12, month % 12 + 1, 1)
+    last = next_month - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+def _easter(year):
+    """Gregorian Easter Sunday (anonymous Gregorian algorithm)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+def _observed(day):
+    """Shift a fixed-date holiday falling on a weekend to the observed weekday."""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+@lru_cache(maxsize=None)
+def nyse_holidays(year):
+    """
+    Full-day NYSE holidays for a year.
+    
+    Args:
+        year (int): Calendar year
+        
+    Returns:
+        frozenset: Dates the exchange is closed (excluding weekends)
+    """
+    holidays = {
+        _nth_weekday(year, 1, 0, 3),          # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),          # Washington's Birthday
+        _easter(year) - timedelta(days=2),    # Good Friday
+        _last_weekday(year, 5, 0),            # Memorial Day
+        _observed(date(year, 7, 4)),          # Independence Day
+        _nth_weekday(year, 9, 0, 1),          # Labor Day
+        _nth_weekday(year, 11, 3, 4),         # Thanksgiving
+        _observed(date(year, 12, 25)),        # Christmas
+    }
+    # New Year's Day falling on a Saturday is not observed on the prior Friday
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays.add(_observed(new_year))
+    if year >= 2022:
+        holidays.add(_observed(date(year, 6, 19)))  # Juneteenth
+    return frozenset(holidays)
+
+def is_trading_day(day):
+    """Return True if the exchange holds a regular session on the given date."""
+    return day.weekday() < 5 and day not in nyse_holidays(day.year)
+
+def previous_trading_day(day):
+    """Return the last trading day strictly before the given date."""
+    day -= timedelta(days=1)
+    while not is_trading_day(day):
+        day -= timedelta(days=1)
+    return day
+
+def next_trading_day(day):
+    """Return the first trading day strictly after the given date."""
+    day += timedelta(days=1)
+    while not is_trading_day(day):
+        day += timedelta(days=1)
+    return day
+
+def now_in_market_tz():
+    return datetime.now(MARKET_TZ)
+
+def is_market_open(now=None):
+    """Return True during the regular trading session."""
+    now = (now or now_in_market_tz()).astimezone(MARKET_TZ)
+    return is_trading_day(now.date()) and MARKET_OPEN <= now.time() < MARKET_CLOSE
+
+def next_market_open(now=None):
+    """Return the datetime of the next regular session open after now."""
+    now = (now or now_in_market_tz()).astimezone(MARKET_TZ)
+    day = now.date()
+    if not (is_trading_day(day) and now.time() < MARKET_OPEN):
+        day = next_trading_day(day)
+    return datetime.combine(day, MARKET_OPEN, tzinfo=MARKET_TZ)
+
+def last_completed_session(now=None):
+    """Return the date of the most recent trading session that has closed."""
+    now = (now or now_in_market_tz()).astimezone(MARKET_TZ)
+    day = now.date()
+    if is_trading_day(day) and now.time() >= MARKET_CLOSE:
+        return day
+    return previous_trading_day(day)
+
+def seconds_until_next_open(now=None):
+    now = (now or now_in_market_tz()).astimezone(MARKET_TZ)
+    return max((next_market_open(now) - now).total_seconds(), 0.0)
@@ -0,0 +1,368 @@
+import os
+import json
+import time
+import bisect
+import atexit
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from cache hits up to the request deadline
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# "sqlite" merges the metrics of every worker process on the host when scraped; "memory" reports this process only
+METRICS_BACKEND = os.getenv("METRICS_BACKEND", "memory").lower()
+DEFAULT_METRICS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "metrics.sqlite3")
+METRICS_DB_PATH = os.getenv("METRICS_DB_PATH", DEFAULT_METRICS_PATH)
+# How often each worker writes its metrics to the shared file
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+
+_registry = []
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    """
+    Base for metrics kept in process memory and rendered in the Prometheus
+    text format. Values are keyed by label values, so recording one is a dict
+    lookup and an addition under a lock.
+    """
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+        return tuple(str(label) for label in labels)
+
+    def _set(self, labels, value):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def snapshot(self):
+        """Return a copy of this process's values, keyed by label values."""
+        with self._lock:
+            return dict(self._values)
+
+    def _add(self, total, value):
+        """Combine one process's value into the total across processes."""
+        return total + value
+
+    def merge(self, snapshots):
+        """Sum the values of several processes (see snapshot)."""
+        merged = {}
+        for values in snapshots:
+            for labels, value in values.items():
+                merged[labels] = value if labels not in merged else self._add(merged[labels], value)
+        return merged
+
+    def _samples(self, values):
+        """Yield (suffix, label values, extra labels, value) for every sample."""
+        for labels, value in sorted(values.items()):
+            yield "", labels, (), value
+
+    def render(self, values=None):
+        """Render the given values (by default this process's) in the exposition format."""
+        if values is None:
+            values = self.snapshot()
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, extra, value in self._samples(values):
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, labels, extra)} {_format_value(value)}")
+        return "\n".join(lines)
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    """Value that goes up and down, such as requests in flight."""
+
+    kind = "gauge"
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    @contextmanager
+    def track(self, *labels):
+        """Count the block as in progress while it runs."""
+        self.inc(*labels)
+        try:
+            yield
+        finally:
+            self.dec(*labels)
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed cumulative buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # Per-bucket counts (plus one for +Inf), sum, count
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        """
+        Observe the duration of the block in seconds.
+
+        Also usable as a decorator: `@STAGE_SECONDS.time("news")`.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def snapshot(self):
+        with self._lock:
+            return {labels: [list(entry[0]), entry[1], entry[2]] for labels, entry in self._values.items()}
+
+    def _add(self, total, value):
+        return [[a + b for a, b in zip(total[0], value[0])], total[1] + value[1], total[2] + value[2]]
+
+    def _samples(self, values):
+        for labels, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                yield "_bucket", labels, (("le", _format_value(bound)),), cumulative
+            yield "_sum", labels, (), total
+            yield "_count", labels, (), count
+
+# Where /query time goes
+STAGE_SECONDS = Histogram(
+    "stockbot_stage_seconds", "Time spent in each stage of a query.", ["stage"]
+)
+REQUEST_SECONDS = Histogram(
+    "stockbot_request_seconds", "Time to answer an API request.", ["endpoint"]
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "stockbot_requests_in_flight", "API requests being processed.", ["endpoint"]
+)
+# Upstream providers: routed quote providers and every HTTP call by host
+PROVIDER_SECONDS = Histogram(
+    "stockbot_provider_call_seconds", "Latency of routed provider calls.", ["router", "provider"]
+)
+PROVIDER_ERRORS = Counter(
+    "stockbot_provider_errors_total", "Routed provider calls that failed or returned nothing usable.", ["router", "provider"]
+)
+UPSTREAM_SECONDS = Histogram(
+    "stockbot_upstream_request_seconds", "Latency of outgoing HTTP requests.", ["host"]
+)
+UPSTREAM_ERRORS = Counter(
+    "stockbot_upstream_errors_total", "Outgoing HTTP requests that raised or got a 429 or 5xx response.", ["host"]
+)
+FALLBACKS = Counter(
+    "stockbot_fallbacks_total", "Answers served from a fallback source.", ["kind"]
+)
+
+def observe_response(host, seconds, status_code=None):
+    """Record an outgoing HTTP request; a None status_code means it raised."""
+    UPSTREAM_SECONDS.observe(seconds, host)
+    if status_code is None or status_code == 429 or status_code >= 500:
+        UPSTREAM_ERRORS.inc(host)
+
+# Cache lookups, copied from the watched caches' own stats before each flush or render
+CACHE_HITS = Counter(
+    "stockbot_cache_hits_total", "Cache lookups counted as hits.", ["cache"]
+)
+CACHE_MISSES = Counter(
+    "stockbot_cache_misses_total", "Cache lookups counted as misses.", ["cache"]
+)
+
+_caches = {}
+
+def watch_caches(caches):
+    """
+    Report hit and miss counts for caches.
+
+    Args:
+        caches (dict): Cache name -> cache object with hits and misses in its stats()
+    """
+    _caches.update(caches)
+
+def _sync_caches():
+    for name, cache in list(_caches.items()):
+        cache_stats = cache.stats()
+        CACHE_HITS._set((name,), cache_stats["hits"])
+        CACHE_MISSES._set((name,), cache_stats["misses"])
+
+def _running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class SQLiteStore:
+    """
+    Metric values of every worker process on a host, one set of rows per pid.
+
+    Each process overwrites its own rows with its current totals, so writes
+    never conflict and a scrape sums whatever each worker last wrote.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS samples (pid INTEGER NOT NULL, metric TEXT NOT NULL, labels TEXT NOT NULL, "
+            "value TEXT NOT NULL, PRIMARY KEY (pid, metric, labels))"
+        )
+
+    def _connection(self):
+        # A connection must not cross a fork, so each process opens its own
+        conn, pid = getattr(self._local, "conn", (None, None))
+        if conn is None or pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = (conn, os.getpid())
+        return conn
+
+    def write(self, pid, metrics):
+        """Replace the rows of process pid with the current values of metrics."""
+        rows = [
+            (pid, metric.name, json.dumps(labels), json.dumps(value))
+            for metric in metrics for labels, value in metric.snapshot().items()
+        ]
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM samples WHERE pid = ?", (pid,))
+            conn.executemany("INSERT INTO samples VALUES (?, ?, ?, ?)", rows)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def read(self):
+        """
+        Returns:
+            dict: Metric name -> list of per-process snapshots
+        """
+        by_process = {}
+        for pid, metric, labels, value in self._connection().execute("SELECT pid, metric, labels, value FROM samples"):
+            values = by_process.setdefault(metric, {}).setdefault(pid, {})
+            values[tuple(json.loads(labels))] = json.loads(value)
+        return by_process
+
+_store = None
+
+def flush():
+    """Write this process's metrics to the shared store, if there is one."""
+    if _store is None:
+        return
+    _sync_caches()
+    try:
+        _store.write(os.getpid(), _registry)
+    except Exception as e:
+        logger.error(f"Error writing metrics to {_store.path}: {str(e)}")
+
+def _flush_periodically():
+    while True:
+        time.sleep(METRICS_FLUSH_SECONDS)
+        flush()
+
+def _start_flusher():
+    threading.Thread(target=_flush_periodically, name="metrics-flush", daemon=True).start()
+
+if METRICS_BACKEND == "sqlite":
+    try:
+        _store = SQLiteStore(METRICS_DB_PATH)
+    except Exception as e:
+        logger.error(f"Error opening shared metrics at {METRICS_DB_PATH}, reporting per process: {str(e)}")
+    else:
+        _start_flusher()
+        # Workers forked from a preloaded app need their own flusher
+        os.register_at_fork(after_in_child=_start_flusher)
+        atexit.register(flush)
+
+def _merged_values():
+    """Metric name -> values summed over every worker; gauges only count workers still running."""
+    flush()
+    try:
+        by_process = _store.read()
+    except Exception as e:
+        logger.error(f"Error reading metrics from {_store.path}, reporting this process only: {str(e)}")
+        return {}
+    merged = {}
+    for metric in _registry:
+        processes = by_process.get(metric.name, {})
+        if metric.kind == "gauge":
+            processes = {pid: values for pid, values in processes.items() if _running(pid)}
+        merged[metric.name] = metric.merge(processes.values())
+    return merged
+
+def render(caches=None):
+    """
+    Render every metric in the Prometheus text exposition format.
+
+    With METRICS_BACKEND=sqlite the values of every worker process on the
+    host are summed, so any worker can answer a scrape for all of them;
+    otherwise only the answering process is reported, which is only right
+    for a single worker.
+
+    Args:
+        caches (dict): Extra caches to report (see watch_caches)
+
+    Returns:
+        str: The exposition text
+    """
+    if caches:
+        watch_caches(caches)
+    _sync_caches()
+    merged = _merged_values() if _store is not None else {}
+    lines = [metric.render(merged.get(metric.name)) for metric in _registry]
+    return "\n".join(lines) + "\n"
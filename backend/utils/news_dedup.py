@@ -0,0 +1,104 @@
+import os
+import re
+import hashlib
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Articles whose 64-bit SimHash fingerprints differ in at most this many bits are one story
+NEWS_DEDUP_MAX_DISTANCE = int(os.getenv("NEWS_DEDUP_MAX_DISTANCE", "12"))
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:['.][a-z0-9]+)*")
+# Publisher suffixes such as "... - Reuters" or "... | Yahoo Finance" say nothing about the story
+SOURCE_SUFFIX_PATTERN = re.compile(r"\s+[-|–—]\s+[^-|–—]{1,40}$")
+
+def _tokens(text):
+    return TOKEN_PATTERN.findall(SOURCE_SUFFIX_PATTERN.sub("", text or "").lower())
+
+def simhash(text):
+    """
+    Return the 64-bit SimHash fingerprint of a text.
+
+    Each word and word pair is hashed to 64 bits; a fingerprint bit is set
+    when more of the features have that bit set than not, so texts sharing
+    most of their words differ in only a few bits.
+
+    Returns:
+        int: The fingerprint, 0 for a text without words
+    """
+    tokens = _tokens(text)
+    features = tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+    if not features:
+        return 0
+    hashes = np.frombuffer(
+        b"".join(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest() for feature in features),
+        dtype=np.uint8
+    ).reshape(len(features), 8)
+    votes = np.unpackbits(hashes, axis=1).sum(axis=0, dtype=np.int64) * 2 - len(features)
+    return int.from_bytes(np.packbits(votes > 0).tobytes(), "big")
+
+def _article_text(article):
+    return f"{article.get('title') or ''} {article.get('description') or ''}"
+
+def cluster_articles(articles, max_distance=NEWS_DEDUP_MAX_DISTANCE):
+    """
+    Group near-duplicate articles.
+
+    Articles are visited in order and each joins the first earlier cluster
+    whose representative is within max_distance bits, or whose title is the
+    same once publisher suffixes are dropped; otherwise it starts a cluster.
+
+    Args:
+        articles (list): NewsAPI article dicts with title and description
+        max_distance (int): Largest Hamming distance between near-duplicates
+
+    Returns:
+        list: Lists of article indices, one per story, each led by its representative
+    """
+    if not articles:
+        return []
+    fingerprints = np.array([simhash(_article_text(article)) for article in articles], dtype=np.uint64)
+    titles = [" ".join(_tokens(article.get("title"))) for article in articles]
+
+    # All pairwise Hamming distances at once
+    xor = fingerprints[:, None] ^ fingerprints[None, :]
+    distances = np.unpackbits(xor.view(np.uint8).reshape(len(articles), len(articles), 8), axis=2).sum(axis=2)
+
+    clusters = []
+    representatives = []
+    for index in range(len(articles)):
+        for cluster, representative in zip(clusters, representatives):
+            same_title = titles[index] and titles[index] == titles[representative]
+            if same_title or distances[index, representative] <= max_distance:
+                cluster.append(index)
+                break
+        else:
+            clusters.append([index])
+            representatives.append(index)
+    return clusters
+
+def dedupe_articles(articles, max_distance=NEWS_DEDUP_MAX_DISTANCE):
+    """
+    Collapse syndicated copies of a story into one representative article.
+
+    Args:
+        articles (list): NewsAPI article dicts, most relevant first
+        max_distance (int): Largest Hamming distance between near-duplicates
+
+    Returns:
+        list: Copies of the representative articles, in the original order, with
+            source_count (articles in the story) and sources (their publisher names)
+    """
+    representatives = []
+    for cluster in cluster_articles(articles, max_distance):
+        article = dict(articles[cluster[0]])
+        names = []
+        for index in cluster:
+            name = (articles[index].get("source") or {}).get("name")
+            if name and name not in names:
+                names.append(name)
+        article["source_count"] = len(cluster)
+        article["sources"] = names
+        representatives.append(article)
+    return representatives
@@ -32,3 +32,24 @@ def extract_timeframe(text):
     
     # Default to "today" if no timeframe is found
     return "today"
+
+
+def classify_query_intent(text):
+    """
+    Classify what kind of answer a query is asking for.
+    
+    Args:
+        text (str): The query text
+        
+    Returns:
+        str: 'why', 'whats_happening', 'outlook' or 'general'
+    """
+    text = text.lower()
+    
+    if re.search(r'\bwhy\b', text):
+        return 'why'
+    if re.search(r"\bwhat'?s\s+happening\b|\bwhat\s+is\s+happening\b|\bwhat'?s\s+going\s+on\b", text):
+        return 'whats_happening'
+    if re.search(r'\b(should\s+i|outlook|forecast|predict|buy|sell|hold)\b', text):
+        return 'outlook'
+    return 'general'
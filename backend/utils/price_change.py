@@ -0,0 +1,160 @@
+import re
+from datetime import date, timedelta
+import numpy as np
+from utils.market_hours import previous_trading_day, now_in_market_tz
+
+# Windows reported with every price change, shortest first
+WINDOWS = ("1D", "5D", "1W", "1M", "3M", "6M", "YTD", "1Y")
+
+# Timeframes produced by the query parsers and the window each one means
+TIMEFRAME_WINDOWS = {
+    "today": "1D",
+    "day": "1D",
+    "1day": "1D",
+    "week": "1W",
+    "7days": "1W",
+    "month": "1M",
+    "30days": "1M",
+    "quarter": "3M",
+    "3months": "3M",
+    "6months": "6M",
+    "ytd": "YTD",
+    "year": "1Y",
+    "12months": "1Y",
+}
+
+CUSTOM_DAYS_PATTERN = re.compile(r"^(\d+)\s*(?:d|days?)$", re.IGNORECASE)
+
+def _months_back(day, months):
+    """Return the same day of the month `months` earlier, clamped to the month's end."""
+    month_index = day.year * 12 + day.month - 1 - months
+    year, month = divmod(month_index, 12)
+    month += 1
+    next_month = date(year + (month == 12), month % 12 + 1, 1)
+    return date(year, month, min(day.day, (next_month - timedelta(days=1)).day))
+
+def _sessions_back(day, sessions):
+    for _ in range(sessions):
+        day = previous_trading_day(day)
+    return day
+
+def window_for_timeframe(timeframe):
+    """
+    Map a parsed timeframe onto a window name.
+
+    Args:
+        timeframe (str): e.g. 'today', 'week', 'quarter', '6months', '45days', '10D'
+
+    Returns:
+        str: A name from WINDOWS, 'yesterday', or a custom 'ND' window; '1D' if unknown
+    """
+    timeframe = (timeframe or "today").strip()
+    if timeframe.upper() in WINDOWS:
+        return timeframe.upper()
+    if timeframe.lower() == "yesterday":
+        return "yesterday"
+    if timeframe.lower() in TIMEFRAME_WINDOWS:
+        return TIMEFRAME_WINDOWS[timeframe.lower()]
+    match = CUSTOM_DAYS_PATTERN.match(timeframe)
+    if match and int(match.group(1)) > 0:
+        return f"{int(match.group(1))}D"
+    return "1D"
+
+def window_start(window, last_day):
+    """
+    Return the calendar date whose closing price a window is measured from.
+
+    Session windows (1D, 5D) count back trading days on the exchange calendar;
+    calendar windows count back days or months. The window's base is the last
+    close on or before this date.
+    """
+    if window == "1D":
+        return previous_trading_day(last_day)
+    if window == "5D":
+        return _sessions_back(last_day, 5)
+    if window == "1W":
+        return last_day - timedelta(days=7)
+    if window == "YTD":
+        return date(last_day.year - 1, 12, 31)
+    if window.endswith("M"):
+        return _months_back(last_day, int(window[:-1]))
+    if window.endswith("Y"):
+        return _months_back(last_day, 12 * int(window[:-1]))
+    if window.endswith("D"):
+        return last_day - timedelta(days=int(window[:-1]))
+    raise ValueError(f"Unknown window: {window}")
+
+def compute_changes(series, windows=WINDOWS, end_index=-1):
+    """
+    Compute price changes over several windows in one vectorized pass.
+
+    All window start dates are located with a single binary search over the
+    series' dates.
+
+    Args:
+        series (DailySeries): Daily bars in ascending date order
+        windows (iterable): Window names (see window_for_timeframe)
+        end_index (int): Bar the windows end at; the newest bar by default
+
+    Returns:
+        dict: Window -> change, change_percent, from/to price and dates, or None
+            when the history does not reach back far enough
+    """
+    windows = list(windows)
+    if len(series) < 2 or not windows:
+        return {window: None for window in windows}
+
+    end_index = end_index % len(series)
+    end_date = series.dates[end_index]
+    last_day = end_date.item()
+    starts = np.array([window_start(window, last_day) for window in windows], dtype="datetime64[D]")
+
+    start_index = np.searchsorted(series.dates[:end_index + 1], starts, side="right") - 1
+    # A window is only available if history reaches its start date
+    valid = (start_index >= 0) & (start_index < end_index)
+    start_index = np.where(valid, start_index, 0)
+
+    to_price = series.close[end_index]
+    from_price = series.close[start_index]
+    change = to_price - from_price
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change_percent = np.where(from_price != 0, change / from_price * 100, np.nan)
+
+    results = {}
+    for i, window in enumerate(windows):
+        if not valid[i] or np.isnan(change_percent[i]):
+            results[window] = None
+            continue
+        results[window] = {
+            "change": round(float(change[i]), 2),
+            "change_percent": round(float(change_percent[i]), 2),
+            "from_price": float(from_price[i]),
+            "to_price": float(to_price),
+            "from_date": str(series.dates[start_index[i]]),
+            "to_date": str(end_date)
+        }
+    return results
+
+def compute_timeframe_change(series, timeframe, today=None):
+    """
+    Compute the change for a parsed timeframe together with all standard windows.
+
+    Args:
+        series (DailySeries): Daily bars in ascending date order
+        timeframe (str): Parsed timeframe such as 'today', 'yesterday' or 'quarter'
+        today (date): Current date in the market time zone, for 'yesterday'
+
+    Returns:
+        tuple: (window name, change dict or None, dict of all standard windows)
+    """
+    window = window_for_timeframe(timeframe)
+    windows = compute_changes(series, WINDOWS + ((window,) if window not in WINDOWS and window != "yesterday" else ()))
+
+    if window == "yesterday":
+        # The session before today, whether or not today's bar exists yet
+        today = today or now_in_market_tz().date()
+        end_index = int(np.searchsorted(series.dates, np.datetime64(today, "D"), side="left")) - 1
+        selected = compute_changes(series, ("1D",), end_index=end_index)["1D"] if end_index >= 1 else None
+    else:
+        selected = windows.pop(window) if window not in WINDOWS else windows[window]
+    return window, selected, windows
@@ -0,0 +1,251 @@
+import os
+import time
+import logging
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dotenv import load_dotenv
+from utils import deadline as request_deadline
+from utils.metrics import PROVIDER_SECONDS, PROVIDER_ERRORS
+from utils.rate_limiter import RateLimitExceeded
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Consecutive failures that open a provider's circuit, and how long it stays open
+ROUTER_FAILURE_THRESHOLD = int(os.getenv("ROUTER_FAILURE_THRESHOLD", "5"))
+ROUTER_RESET_SECONDS = float(os.getenv("ROUTER_RESET_SECONDS", "30"))
+# Hedge delay used until a provider has ROUTER_MIN_SAMPLES latency samples
+ROUTER_DEFAULT_HEDGE_SECONDS = float(os.getenv("ROUTER_DEFAULT_HEDGE_SECONDS", "0.5"))
+ROUTER_MIN_HEDGE_SECONDS = float(os.getenv("ROUTER_MIN_HEDGE_SECONDS", "0.05"))
+ROUTER_MIN_SAMPLES = int(os.getenv("ROUTER_MIN_SAMPLES", "5"))
+ROUTER_LATENCY_WINDOW = int(os.getenv("ROUTER_LATENCY_WINDOW", "200"))
+ROUTER_MAX_WORKERS = int(os.getenv("ROUTER_MAX_WORKERS", "32"))
+
+class ProviderUnavailable(Exception):
+    """
+    Raised by a provider that declines a call, e.g. because it is not
+    configured. The router moves on without counting it as a failure.
+    """
+
+# Exceptions meaning "skip me" rather than "I failed"; an empty rate limit bucket says nothing about health
+SKIPPED_ERRORS = (ProviderUnavailable, RateLimitExceeded)
+
+class CircuitBreaker:
+    """
+    Per-provider circuit breaker.
+
+    After failure_threshold consecutive failures the circuit opens and the
+    provider is skipped. Once reset_seconds have passed one trial call is let
+    through (half-open); its success closes the circuit, its failure opens it
+    again.
+    """
+
+    def __init__(self, failure_threshold=ROUTER_FAILURE_THRESHOLD, reset_seconds=ROUTER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        """Return True if a call may be sent to the provider now."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_in_flight or (self.opened_at is None and self.failures >= self.failure_threshold):
+                logger.warning(f"Circuit opened after {self.failures} consecutive failures")
+                self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+
+    def release_trial(self):
+        """Let another trial call through after one was cancelled before it ran."""
+        with self._lock:
+            self.trial_in_flight = False
+
+class Provider:
+    """A named data source with its latency history and circuit breaker."""
+
+    def __init__(self, name, func):
+        self.name = name
+        self.func = func
+        self.breaker = CircuitBreaker()
+        self.latencies = deque(maxlen=ROUTER_LATENCY_WINDOW)
+        self.calls = 0
+        self.wins = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def hedge_delay(self):
+        """Seconds to wait for this provider before hedging: its observed p90 latency."""
+        with self._lock:
+            samples = sorted(self.latencies)
+        if len(samples) < ROUTER_MIN_SAMPLES:
+            return ROUTER_DEFAULT_HEDGE_SECONDS
+        return max(samples[int(0.9 * (len(samples) - 1))], ROUTER_MIN_HEDGE_SECONDS)
+
+    def record(self, seconds, ok):
+        with self._lock:
+            self.calls += 1
+            if ok:
+                self.latencies.append(seconds)
+            else:
+                self.errors += 1
+        if ok:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def stats(self):
+        return {
+            "state": self.breaker.state,
+            "calls": self.calls,
+            "wins": self.wins,
+            "errors": self.errors,
+            "p90_seconds": round(self.hedge_delay(), 3)
+        }
+
+# Shared by all routers; abandoned hedges finish here without blocking a request
+_executor = ThreadPoolExecutor(max_workers=ROUTER_MAX_WORKERS, thread_name_prefix="provider-router")
+
+class ProviderRouter:
+    """
+    Route a call to an ordered list of interchangeable providers with hedging.
+
+    The first available provider is called; if it has not answered within its
+    observed p90 latency, or it fails, the next one is called as well, and so
+    on. The first valid answer wins and the rest are cancelled if they have not
+    started (running ones are abandoned and only recorded). Providers whose
+    circuit is open are skipped.
+    """
+
+    def __init__(self, name, providers, is_valid=None):
+        """
+        Args:
+            name (str): Router name for logs and stats
+            providers (list): (name, callable) pairs in order of preference
+            is_valid (callable): Returns True for an acceptable result; any
+                non-empty result by default. Exceptions and invalid results
+                count as provider failures, except ProviderUnavailable and
+                RateLimitExceeded.
+        """
+        self.name = name
+        self.providers = [Provider(provider_name, func) for provider_name, func in providers]
+        self.is_valid = is_valid or bool
+        self.hedges = 0
+
+    def _submit(self, provider, args, kwargs):
+        started = time.monotonic()
+        # Run in the caller's context so request-scoped state follows the call
+        context = contextvars.copy_context()
+        future = _executor.submit(context.run, provider.func, *args, **kwargs)
+
+        def done(f):
+            if f.cancelled() or isinstance(f.exception(), SKIPPED_ERRORS):
+                # Nothing was learned about the provider's health
+                provider.breaker.release_trial()
+                return
+            seconds = time.monotonic() - started
+            ok = f.exception() is None and self.is_valid(f.result())
+            provider.record(seconds, ok)
+            PROVIDER_SECONDS.observe(seconds, self.name, provider.name)
+            if not ok:
+                PROVIDER_ERRORS.inc(self.name, provider.name)
+
+        future.add_done_callback(done)
+        return future
+
+    def call(self, *args, **kwargs):
+        """
+        Call the providers with hedging and return the first valid result.
+
+        Returns:
+            tuple: (result, provider name), or (None, None) if every available provider failed
+        """
+        candidates = iter(self.providers)
+        pending = {}
+        hedge_delay = None
+
+        def launch_next():
+            for provider in candidates:
+                if provider.breaker.allow():
+                    pending[self._submit(provider, args, kwargs)] = provider
+                    return provider
+            return None
+
+        launched = launch_next()
+        if launched:
+            hedge_delay = launched.hedge_delay()
+
+        while pending:
+            timeout = hedge_delay
+            left = request_deadline.remaining()
+            if left is not None:
+                if left <= 0:
+                    logger.warning(f"{self.name}: request deadline passed with {len(pending)} calls outstanding")
+                    break
+                timeout = left if timeout is None else min(timeout, left)
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                if not request_deadline.has_time_for(0):
+                    continue
+                # The newest call is slower than its p90: hedge with the next provider
+                launched = launch_next()
+                if launched:
+                    self.hedges += 1
+                    logger.info(f"{self.name}: hedging with {launched.name}")
+                hedge_delay = launched.hedge_delay() if launched else None
+                continue
+
+            for future in done:
+                provider = pending.pop(future)
+                if future.exception() is None and self.is_valid(future.result()):
+                    for other in pending:
+                        other.cancel()
+                    provider.wins += 1
+                    return future.result(), provider.name
+                if isinstance(future.exception(), SKIPPED_ERRORS):
+                    logger.info(f"{self.name}: skipped {provider.name}: {future.exception()}")
+                    continue
+                logger.warning(f"{self.name}: {provider.name} failed"
+                               + (f": {future.exception()}" if future.exception() else ""))
+
+            # A failure moves on to the next provider right away
+            launched = launch_next()
+            if launched:
+                hedge_delay = launched.hedge_delay()
+            elif pending:
+                hedge_delay = None
+
+        return None, None
+
+    def stats(self):
+        return {
+            "hedges": self.hedges,
+            "providers": {provider.name: provider.stats() for provider in self.providers}
+        }
@@ -0,0 +1,224 @@
+import os
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from utils import deadline as request_deadline
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# "sqlite" shares buckets between the worker processes of a host; "memory" keeps them per process
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "sqlite").lower()
+DEFAULT_RATE_LIMIT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "ratelimit.sqlite3")
+RATE_LIMIT_DB_PATH = os.getenv("RATE_LIMIT_DB_PATH", DEFAULT_RATE_LIMIT_PATH)
+# Longest single sleep while waiting, so waiters notice tokens returned by other processes
+RATE_LIMIT_POLL_SECONDS = 0.25
+
+# Provider -> (requests, per seconds, burst, longest wait in seconds). Override with
+# RATE_LIMIT_<PROVIDER>="requests/seconds", RATE_LIMIT_<PROVIDER>_BURST and RATE_LIMIT_<PROVIDER>_WAIT.
+DEFAULT_RATE_LIMITS = {
+    "fmp": (300, 60, 50, 2.0),
+    "newsapi": (100, 86400, 100, 0.0),
+    "alpha_vantage": (5, 60, 1, 0.0),
+    "openrouter": (20, 60, 5, 2.0),
+}
+
+class RateLimitExceeded(Exception):
+    """Raised by callers that fail fast when a provider's bucket is empty."""
+
+class TokenBucket:
+    """
+    Token bucket rate limiter.
+
+    The bucket holds up to `burst` tokens and refills at `rate` tokens per
+    second; each call takes one token. With a path the bucket state lives in
+    a SQLite row updated in one immediate transaction, so every worker process
+    on the host draws from the same bucket. Nothing sleeps unless the caller
+    asks to wait: try_acquire fails fast, acquire and acquire_async wait up to
+    a timeout.
+    """
+
+    def __init__(self, name, rate, burst, max_wait=0.0, path=None):
+        """
+        Args:
+            name (str): Provider name
+            rate (float): Tokens added per second
+            burst (float): Bucket capacity
+            max_wait (float): Default timeout for acquire()
+            path (str): SQLite file shared between processes; per-process state if None
+        """
+        self.name = name
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.max_wait = max_wait
+        self.path = path
+        self.granted = 0
+        self.rejected = 0
+        self.waiting = 0
+        self._tokens = self.burst
+        self._updated_at = time.time()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if path:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+                )
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _refill(self, tokens, updated_at, now):
+        return min(self.burst, tokens + max(now - updated_at, 0) * self.rate)
+
+    def _take(self):
+        """
+        Take a token if one is available.
+
+        Returns:
+            float: 0 if a token was taken, otherwise seconds until one will be
+        """
+        now = time.time()
+        if not self.path:
+            with self._lock:
+                self._tokens = self._refill(self._tokens, self._updated_at, now)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return 0.0
+                return (1 - self._tokens) / self.rate
+
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE name = ?", (self.name,)).fetchone()
+            tokens = self._refill(*row, now) if row else self.burst
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+            conn.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)", (self.name, tokens, now))
+            conn.execute("COMMIT")
+            return wait
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def try_acquire(self):
+        """Take a token without waiting; return False if the bucket is empty."""
+        if self._take() == 0:
+            self.granted += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def _wait_deadline(self, timeout):
+        """Monotonic time to stop waiting at: after timeout (max_wait if None), or at the request deadline."""
+        timeout = self.max_wait if timeout is None else timeout
+        left = request_deadline.remaining()
+        if left is not None:
+            timeout = min(timeout, left)
+        return time.monotonic() + timeout
+
+    def acquire(self, timeout=None):
+        """
+        Take a token, waiting up to timeout seconds (max_wait if None) but
+        never past the request deadline.
+
+        Returns:
+            bool: True if a token was taken, False if none became available in time
+        """
+        deadline = self._wait_deadline(timeout)
+        with self._queued():
+            while True:
+                wait = self._take()
+                if wait == 0:
+                    self.granted += 1
+                    return True
+                remaining = deadline - time.monotonic()
+                if wait > remaining:
+                    self.rejected += 1
+                    return False
+                time.sleep(min(wait, RATE_LIMIT_POLL_SECONDS))
+
+    async def acquire_async(self, timeout=None):
+        """Like acquire(), but yields to the event loop while waiting."""
+        deadline = self._wait_deadline(timeout)
+        with self._queued():
+            while True:
+                wait = self._take()
+                if wait == 0:
+                    self.granted += 1
+                    return True
+                remaining = deadline - time.monotonic()
+                if wait > remaining:
+                    self.rejected += 1
+                    return False
+                await asyncio.sleep(min(wait, RATE_LIMIT_POLL_SECONDS))
+
+    @contextmanager
+    def _queued(self):
+        """Count the caller as waiting for the duration of the block."""
+        with self._lock:
+            self.waiting += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+    def stats(self):
+        return {
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "queue_depth": self.waiting,
+            "granted": self.granted,
+            "rejected": self.rejected,
+            "shared": bool(self.path)
+        }
+
+def _limit_config(provider):
+    requests, seconds, burst, max_wait = DEFAULT_RATE_LIMITS.get(provider, (60, 60, 10, 1.0))
+    prefix = f"RATE_LIMIT_{provider.upper()}"
+    if os.getenv(prefix):
+        requests, seconds = (float(part) for part in os.getenv(prefix).split("/"))
+    burst = float(os.getenv(f"{prefix}_BURST", burst))
+    max_wait = float(os.getenv(f"{prefix}_WAIT", max_wait))
+    return requests / seconds, burst, max_wait
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_limiter(provider):
+    """Return the process-wide token bucket for a provider."""
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            rate, burst, max_wait = _limit_config(provider)
+            path = RATE_LIMIT_DB_PATH if RATE_LIMIT_BACKEND == "sqlite" else None
+            try:
+                limiter = TokenBucket(provider, rate, burst, max_wait, path=path)
+            except Exception as e:
+                logger.error(f"Error opening shared rate limit state, limiting {provider} per process: {str(e)}")
+                limiter = TokenBucket(provider, rate, burst, max_wait)
+            _limiters[provider] = limiter
+        return limiter
+
+def limiter_stats():
+    """Stats for every limiter created so far."""
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {provider: limiter.stats() for provider, limiter in limiters.items()}
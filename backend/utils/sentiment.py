@@ -0,0 +1,231 @@
+import os
+import re
+import json
+import bisect
+import hashlib
+import logging
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from dotenv import load_dotenv
+from utils.cache import TTLCache
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Optional JSON file of {"term": weight} entries merged over the default lexicon
+SENTIMENT_LEXICON_PATH = os.getenv("SENTIMENT_LEXICON_PATH")
+SENTIMENT_CACHE_SIZE = int(os.getenv("SENTIMENT_CACHE_SIZE", "20000"))
+# Scores at or beyond +/- this are labelled positive / negative
+SENTIMENT_THRESHOLD = float(os.getenv("SENTIMENT_THRESHOLD", "0.5"))
+# 'lexicon' or 'model' (the hashed n-gram classifier in utils.sentiment_model, which also uses the
+# lexicon's scores: more accurate on the bundled test set but about half the throughput)
+SENTIMENT_BACKEND = os.getenv("SENTIMENT_BACKEND", "lexicon").lower()
+# Weight of an article's description relative to its headline
+SENTIMENT_DESCRIPTION_WEIGHT = float(os.getenv("SENTIMENT_DESCRIPTION_WEIGHT", "0.5"))
+
+# Financial headline lexicon: term -> weight. Multi-word terms match as phrases.
+DEFAULT_LEXICON = {
+    # Positive
+    "up": 0.5, "rise": 1.0, "rises": 1.0, "rising": 1.0, "rose": 1.0, "gain": 1.0, "gains": 1.0,
+    "gained": 1.0, "jump": 1.5, "jumps": 1.5, "jumped": 1.5, "surge": 2.0, "surges": 2.0,
+    "surged": 2.0, "soar": 2.0, "soars": 2.0, "soared": 2.0, "rally": 1.5, "rallies": 1.5,
+    "rallied": 1.5, "climb": 1.0, "climbs": 1.0, "climbed": 1.0, "rebound": 1.0, "rebounds": 1.0,
+    "recover": 1.0, "recovers": 1.0, "recovery": 1.0, "higher": 0.5, "high": 0.5, "record high": 2.0,
+    "beat": 1.5, "beats": 1.5, "tops estimates": 1.5, "beats estimates": 2.0, "upgrade": 1.5,
+    "upgrades": 1.5, "upgraded": 1.5, "outperform": 1.5, "outperforms": 1.5, "buy rating": 1.0,
+    "raises guidance": 2.0, "raised guidance": 2.0, "price target raised": 1.5, "growth": 1.0,
+    "profit": 1.0, "profits": 1.0, "profitable": 1.0, "record": 0.5, "strong": 1.0, "success": 1.0,
+    "successful": 1.0, "positive": 1.0, "bullish": 1.5, "optimistic": 1.0, "approval": 1.0,
+    "approved": 1.0, "wins": 1.0, "partnership": 0.5, "dividend increase": 1.5, "buyback": 1.0,
+    # Negative
+    "down": -0.5, "fall": -1.0, "falls": -1.0, "falling": -1.0, "fell": -1.0, "drop": -1.0,
+    "drops": -1.0, "dropped": -1.0, "decline": -1.0, "declines": -1.0, "declined": -1.0,
+    "slide": -1.0, "slides": -1.0, "slump": -1.5, "slumps": -1.5, "tumble": -1.5, "tumbles": -1.5,
+    "tumbled": -1.5, "plunge": -2.0, "plunges": -2.0, "plunged": -2.0, "sink": -1.5, "sinks": -1.5,
+    "sank": -1.5, "crash": -2.0, "crashes": -2.0, "lower": -0.5, "low": -0.5, "loss": -1.0,
+    "losses": -1.0, "miss": -1.5, "misses": -1.5, "missed": -1.5, "misses estimates": -2.0,
+    "downgrade": -1.5, "downgrades": -1.5, "downgraded": -1.5, "underperform": -1.5,
+    "sell rating": -1.0, "cuts guidance": -2.0, "cut guidance": -2.0, "lowers guidance": -2.0,
+    "price target cut": -1.5, "weak": -1.0, "weaker": -1.0, "bearish": -1.5, "concern": -1.0,
+    "concerns": -1.0, "risk": -0.5, "risks": -0.5, "warning": -1.0, "warns": -1.0, "layoff": -1.5,
+    "layoffs": -1.5, "lawsuit": -1.0, "sued": -1.0, "probe": -1.0, "investigation": -1.0,
+    "recall": -1.0, "fraud": -2.0, "bankruptcy": -2.5, "default": -1.5, "halted": -1.0,
+    "delay": -0.5, "delayed": -0.5, "negative": -1.0, "pessimistic": -1.0, "selloff": -1.5,
+    "sell-off": -1.5,
+}
+
+# Words that flip the sign of the next lexicon term within NEGATION_SCOPE words
+DEFAULT_NEGATORS = ("not", "no", "never", "without", "fails to", "failed to", "isn't", "wasn't", "won't", "didn't", "doesn't")
+NEGATION_SCOPE = 3
+
+class MemoizedScorer(ABC):
+    """
+    Base class for batch sentiment scorers.
+
+    Scores are memoized by a hash of the normalized text, so a story shared by
+    several tickers is only scored once. Subclasses implement _scan, which
+    scores a list of texts that are not in the memo.
+    """
+
+    def __init__(self, threshold, cache_size=SENTIMENT_CACHE_SIZE):
+        self.threshold = threshold
+        self.cache = TTLCache(maxsize=cache_size, ttl=float("inf"))
+
+    @staticmethod
+    def _key(text):
+        normalized = " ".join(text.lower().split())
+        return hashlib.blake2b(normalized.encode("utf-8"), digest_size=12).digest()
+
+    @abstractmethod
+    def _scan(self, texts):
+        """
+        Score texts that are not in the memo.
+
+        Returns:
+            list: One float score per text
+        """
+
+    def score_batch(self, texts):
+        """
+        Score many texts.
+
+        Args:
+            texts (list): Headline or description strings
+
+        Returns:
+            list: Float scores in input order; positive values are bullish
+        """
+        keys = [self._key(text or "") for text in texts]
+        scores = {}
+        pending = {}
+        for key, text in zip(keys, texts):
+            if key in scores or key in pending:
+                continue
+            cached = self.cache.get(key)
+            if cached is not None:
+                scores[key] = cached
+            else:
+                pending[key] = text or ""
+
+        if pending:
+            for key, score in zip(pending, self._scan(list(pending.values()))):
+                self.cache.set(key, score)
+                scores[key] = score
+        return [scores[key] for key in keys]
+
+    def score_articles(self, headlines, descriptions=None):
+        """
+        Score articles from their headlines and descriptions in one batch.
+
+        Args:
+            headlines (list): Article headlines
+            descriptions (list): Descriptions aligned with headlines; missing ones count as empty
+
+        Returns:
+            list: One score per headline, with descriptions weighted by SENTIMENT_DESCRIPTION_WEIGHT
+        """
+        descriptions = list(descriptions or [])[:len(headlines)]
+        descriptions += [""] * (len(headlines) - len(descriptions))
+        scores = self.score_batch(list(headlines) + descriptions)
+        count = len(headlines)
+        return [
+            headline + SENTIMENT_DESCRIPTION_WEIGHT * description
+            for headline, description in zip(scores[:count], scores[count:])
+        ]
+
+    def label(self, score):
+        """Map a score to 'positive', 'negative' or 'neutral'."""
+        if score >= self.threshold:
+            return "positive"
+        if score <= -self.threshold:
+            return "negative"
+        return "neutral"
+
+    def classify_batch(self, texts):
+        """Return a sentiment label for each text."""
+        return [self.label(score) for score in self.score_batch(texts)]
+
+    def classify(self, text):
+        return self.classify_batch([text])[0]
+
+class LexiconSentimentScorer(MemoizedScorer):
+    """
+    Weighted lexicon sentiment scorer for headlines.
+
+    All terms and negators are compiled into one word-bounded regular
+    expression, so a batch of headlines is scored in a single scan of their
+    joined text.
+    """
+
+    def __init__(self, lexicon=None, negators=DEFAULT_NEGATORS, threshold=SENTIMENT_THRESHOLD,
+                 cache_size=SENTIMENT_CACHE_SIZE):
+        """
+        Args:
+            lexicon (dict): Term -> weight; DEFAULT_LEXICON if None
+            negators (iterable): Words or phrases that negate the following term
+            threshold (float): Absolute score needed for a positive or negative label
+            cache_size (int): Number of memoized headline scores
+        """
+        self.lexicon = {term.lower(): float(weight) for term, weight in (lexicon or DEFAULT_LEXICON).items()}
+        self.negators = tuple(n.lower() for n in negators)
+        super().__init__(threshold, cache_size)
+
+        def alternation(terms):
+            # Longest first so phrases win over the words they contain
+            return "|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True))
+
+        self.pattern = re.compile(
+            rf"(?<![\w-])(?:(?P<negator>{alternation(self.negators)})|(?P<term>{alternation(self.lexicon)}))(?![\w-])",
+            re.IGNORECASE
+        )
+
+    def _scan(self, texts):
+        """Score texts with one pass of the compiled pattern over their joined text."""
+        starts = []
+        position = 0
+        for text in texts:
+            starts.append(position)
+            position += len(text) + 1
+        joined = "\n".join(texts)
+
+        scores = [0.0] * len(texts)
+        negated_until = -1    # position in joined text up to which the next term is negated
+        negated_text = -1
+        for match in self.pattern.finditer(joined):
+            index = bisect.bisect_right(starts, match.start()) - 1
+            if match.group("negator"):
+                # The scope ends NEGATION_SCOPE words after the negator, within the same headline
+                rest = joined[match.end():starts[index] + len(texts[index])]
+                words = rest.split()[:NEGATION_SCOPE]
+                scope = rest.find(words[-1]) + len(words[-1]) if words else 0
+                negated_until, negated_text = match.end() + scope, index
+                continue
+            weight = self.lexicon[match.group("term").lower()]
+            if negated_text == index and match.start() < negated_until:
+                weight = -weight
+                negated_until = -1
+            scores[index] += weight
+        return scores
+
+def load_lexicon(path):
+    """Load a {"term": weight} JSON file merged over DEFAULT_LEXICON."""
+    lexicon = dict(DEFAULT_LEXICON)
+    with open(path, encoding="utf-8") as f:
+        lexicon.update({term.lower(): float(weight) for term, weight in json.load(f).items()})
+    return lexicon
+
+@lru_cache(maxsize=1)
+def get_sentiment_scorer():
+    """Return the process-wide sentiment scorer selected by SENTIMENT_BACKEND."""
+    if SENTIMENT_BACKEND == "model":
+        try:
+            from utils.sentiment_model import load_sentiment_model
+            return load_sentiment_model()
+        except Exception as e:
+            logger.error(f"Error loading sentiment model, falling back to the lexicon: {str(e)}")
+
+    lexicon = None
+    if SENTIMENT_LEXICON_PATH:
+        lexicon = load_lexicon(SENTIMENT_LEXICON_PATH)
+        logger.info(f"Loaded sentiment lexicon with {len(lexicon)} terms from {SENTIMENT_LEXICON_PATH}")
+    return LexiconSentimentScorer(lexicon=lexicon)
@@ -0,0 +1,179 @@
+import os
+import re
+import csv
+import zlib
+import time
+import logging
+import numpy as np
+from dotenv import load_dotenv
+from utils.sentiment import MemoizedScorer, LexiconSentimentScorer, SENTIMENT_CACHE_SIZE
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+SENTIMENT_MODEL_PATH = os.getenv("SENTIMENT_MODEL_PATH", os.path.join(DATA_DIR, "sentiment_model.npz"))
+SENTIMENT_TRAINING_DATA = os.path.join(DATA_DIR, "sentiment_headlines.csv")
+# P(positive) - P(negative) needed for a positive or negative label
+SENTIMENT_MODEL_THRESHOLD = float(os.getenv("SENTIMENT_MODEL_THRESHOLD", "0.1"))
+
+# Output classes, in weight-column order
+CLASSES = ("negative", "neutral", "positive")
+# Unigrams and bigrams are hashed into 2**HASH_BITS buckets
+HASH_BITS = 20
+# Dense columns after the n-gram buckets: the lexicon's positive and negative evidence
+LEXICON_FEATURES = 2
+# Texts per matrix multiply; bounds the dense feature matrix for very large batches
+MODEL_CHUNK_SIZE = 2048
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:['.-][a-z0-9]+)*")
+
+def hashed_ngrams(text, hash_bits=HASH_BITS):
+    """Return the hash buckets of a text's unigrams and bigrams."""
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    grams = tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+    mask = (1 << hash_bits) - 1
+    return [zlib.crc32(gram.encode("utf-8")) & mask for gram in grams]
+
+def load_labelled_headlines(path=SENTIMENT_TRAINING_DATA, split=None):
+    """
+    Load the bundled labelled headline set.
+
+    Args:
+        path (str): CSV with headline, label and split columns
+        split (str): 'train' or 'test' to load one split; everything if None
+
+    Returns:
+        tuple: (headlines, labels)
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = [row for row in csv.DictReader(f) if split is None or row["split"] == split]
+    return [row["headline"] for row in rows], [row["label"] for row in rows]
+
+class HashedSentimentModel(MemoizedScorer):
+    """
+    Multinomial logistic regression over hashed unigram and bigram features,
+    plus the lexicon scorer's positive and negative evidence.
+
+    The n-grams learn phrasing the lexicon misses while the lexicon columns
+    carry its hand-curated terms and negation handling, which the small
+    training set cannot teach on its own. Only the hash buckets seen in
+    training carry weights, so the model file stays small and loads in
+    milliseconds. A batch of texts is turned into one
+    feature matrix and scored with a single matrix multiply; the score of a
+    text is P(positive) - P(negative).
+    """
+
+    def __init__(self, buckets, weights, bias, hash_bits=HASH_BITS, lexicon=None,
+                 threshold=SENTIMENT_MODEL_THRESHOLD, cache_size=SENTIMENT_CACHE_SIZE):
+        """
+        Args:
+            buckets (array): Sorted hash buckets that have weights
+            weights (array): (len(buckets) + LEXICON_FEATURES, len(CLASSES)) weight matrix
+            bias (array): Per-class bias
+            hash_bits (int): Number of hash bits the buckets were computed with
+            lexicon (LexiconSentimentScorer): Scorer for the lexicon features; the default lexicon if None
+        """
+        super().__init__(threshold, cache_size)
+        self.buckets = np.asarray(buckets, dtype=np.int64)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.hash_bits = int(hash_bits)
+        self.lexicon = lexicon or LexiconSentimentScorer()
+        if self.weights.shape[0] != len(self.buckets) + LEXICON_FEATURES:
+            raise ValueError(f"Expected {len(self.buckets) + LEXICON_FEATURES} weight rows, got {self.weights.shape[0]}")
+
+    def features(self, texts):
+        """
+        Build the feature matrix for a batch of texts.
+
+        Returns:
+            np.ndarray: (len(texts), len(buckets) + LEXICON_FEATURES) binary n-gram
+                indicators scaled by 1/sqrt(number of n-grams in the text), then
+                the positive and negative parts of the lexicon score
+        """
+        hashes = [hashed_ngrams(text, self.hash_bits) for text in texts]
+        lengths = np.fromiter((len(h) for h in hashes), dtype=np.int64, count=len(hashes))
+        flat = np.fromiter((b for h in hashes for b in h), dtype=np.int64, count=int(lengths.sum()))
+        rows = np.repeat(np.arange(len(texts)), lengths)
+
+        columns = np.searchsorted(self.buckets, flat)
+        columns = np.minimum(columns, max(len(self.buckets) - 1, 0))
+        known = self.buckets[columns] == flat if len(self.buckets) else np.zeros(len(flat), dtype=bool)
+
+        matrix = np.zeros((len(texts), len(self.buckets) + LEXICON_FEATURES), dtype=np.float32)
+        matrix[rows[known], columns[known]] = 1.0
+        matrix[:, :len(self.buckets)] /= np.sqrt(np.maximum(lengths, 1))[:, None]
+
+        lexicon_scores = np.asarray(self.lexicon._scan(list(texts)), dtype=np.float32)
+        matrix[:, -2] = np.maximum(lexicon_scores, 0)
+        matrix[:, -1] = np.maximum(-lexicon_scores, 0)
+        return matrix
+
+    def predict_proba(self, texts):
+        """Return the (len(texts), len(CLASSES)) class probabilities."""
+        return self._softmax(self.features(texts))
+
+    def _softmax(self, matrix):
+        logits = matrix @ self.weights + self.bias
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        return probabilities / probabilities.sum(axis=1, keepdims=True)
+
+    def _scan(self, texts):
+        scores = []
+        for start in range(0, len(texts), MODEL_CHUNK_SIZE):
+            probabilities = self.predict_proba(texts[start:start + MODEL_CHUNK_SIZE])
+            scores.extend((probabilities[:, CLASSES.index("positive")] - probabilities[:, CLASSES.index("negative")]).tolist())
+        return scores
+
+    @classmethod
+    def train(cls, texts, labels, hash_bits=HASH_BITS, epochs=1000, learning_rate=2.0, l2=1e-4):
+        """
+        Fit the model with full-batch gradient descent on softmax cross-entropy.
+
+        Args:
+            texts (list): Training texts
+            labels (list): One of CLASSES per text
+            l2 (float): L2 penalty on the weights
+        """
+        buckets = np.unique(np.fromiter(
+            (b for text in texts for b in hashed_ngrams(text, hash_bits)), dtype=np.int64
+        ))
+        model = cls(buckets, np.zeros((len(buckets) + LEXICON_FEATURES, len(CLASSES))), np.zeros(len(CLASSES)), hash_bits)
+        matrix = model.features(texts)
+        targets = np.eye(len(CLASSES), dtype=np.float32)[[CLASSES.index(label) for label in labels]]
+
+        for _ in range(epochs):
+            error = (model._softmax(matrix) - targets) / len(texts)
+            model.weights -= learning_rate * (matrix.T @ error + l2 * model.weights)
+            model.bias -= learning_rate * error.sum(axis=0)
+        return model
+
+    @classmethod
+    def load(cls, path=SENTIMENT_MODEL_PATH, **kwargs):
+        with np.load(path) as data:
+            return cls(data["buckets"], data["weights"], data["bias"], int(data["hash_bits"]), **kwargs)
+
+    def save(self, path=SENTIMENT_MODEL_PATH):
+        np.savez_compressed(
+            path, buckets=self.buckets, weights=self.weights.astype(np.float16),
+            bias=self.bias, hash_bits=np.int64(self.hash_bits)
+        )
+
+def load_sentiment_model(path=SENTIMENT_MODEL_PATH):
+    """Load the shipped model file."""
+    started = time.perf_counter()
+    model = HashedSentimentModel.load(path)
+    logger.info(f"Loaded sentiment model with {len(model.buckets)} features in {(time.perf_counter() - started) * 1000:.1f}ms")
+    return model
+
+if __name__ == "__main__":
+    # Retrain the shipped model: python -m utils.sentiment_model (from backend/)
+    logging.basicConfig(level=logging.INFO)
+    model = HashedSentimentModel.train(*load_labelled_headlines(split="train"))
+    model.save()
+    texts, labels = load_labelled_headlines(split="test")
+    model = load_sentiment_model()
+    accuracy = np.mean([predicted == label for predicted, label in zip(model.classify_batch(texts), labels)])
+    logger.info(f"Saved {SENTIMENT_MODEL_PATH}; test accuracy {accuracy:.1%} on {len(texts)} headlines")
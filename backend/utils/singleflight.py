@@ -0,0 +1,107 @@
+import copy
+import functools
+import threading
+from collections import defaultdict
+
+class _Call:
+    """An in-flight call whose result is shared with concurrent callers."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls into one.
+
+    While a call for a key is running, other callers asking for the same key
+    wait for it and receive a copy of its result (or its exception) instead of
+    issuing their own upstream request. Nothing is cached once the call ends.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = defaultdict(int)
+        self.deduplicated = defaultdict(int)
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        Run func(*args, **kwargs) unless a call for key is already in flight.
+
+        Args:
+            key (tuple): Hashable call identity; its first element names the endpoint
+            func (callable): The call to make
+
+        Returns:
+            The call's result; callers that joined an in-flight call get a deep copy
+        """
+        endpoint = key[0] if isinstance(key, tuple) and key else key
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.executed[endpoint] += 1
+            else:
+                self.deduplicated[endpoint] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        """Return executed and deduplicated call counts per endpoint."""
+        with self._lock:
+            endpoints = set(self.executed) | set(self.deduplicated)
+            return {
+                "in_flight": len(self._calls),
+                "executed": sum(self.executed.values()),
+                "deduplicated": sum(self.deduplicated.values()),
+                "endpoints": {
+                    endpoint: {
+                        "executed": self.executed[endpoint],
+                        "deduplicated": self.deduplicated[endpoint]
+                    }
+                    for endpoint in sorted(endpoints, key=str)
+                }
+            }
+
+# Process-wide instance shared by all provider clients and agents
+flights = SingleFlight()
+
+def single_flight(endpoint, key=None):
+    """
+    Decorate a method so concurrent identical calls share one execution.
+
+    Args:
+        endpoint (str): Name used in the key and in the dedup statistics
+        key (callable): Optional function of the method's arguments (including
+            self) returning the hashable call identity; by default the
+            positional and keyword arguments after self are used
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if key is not None:
+                call_key = (endpoint,) + tuple(key(self, *args, **kwargs))
+            else:
+                call_key = (endpoint,) + args + tuple(sorted(kwargs.items()))
+            return flights.do(call_key, method, self, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,255 @@
+import os
+import re
+import csv
+import logging
+from collections import deque
+from functools import lru_cache
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+BUNDLED_LISTING_PATH = os.path.join(DATA_DIR, "symbols.csv")
+# Optional full listing (e.g. written by `python -m utils.symbol_index --refresh`)
+SYMBOL_LISTING_PATH = os.getenv("SYMBOL_LISTING_PATH", os.path.join(DATA_DIR, "symbols_full.csv"))
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9&]+")
+
+# Legal suffixes stripped from listed names to derive the everyday name
+NAME_SUFFIXES = {
+    "inc", "incorporated", "corp", "corporation", "co", "company", "companies", "ltd", "limited",
+    "plc", "llc", "lp", "sa", "se", "nv", "ag", "holdings", "holding", "group", "the", "class", "a", "b",
+    "l", "n", "p", "s", "v"
+}
+
+# Derived single-word names that are ordinary English words and would misfire on queries.
+# Explicit aliases in the listing file are always indexed.
+AMBIGUOUS_NAMES = {
+    "a", "all", "arm", "best", "big", "block", "box", "bank", "capital", "care", "cash", "city", "core",
+    "energy", "first", "fox", "gap", "general", "global", "gold", "good", "great", "growth", "health",
+    "home", "income", "key", "live", "match", "national", "net", "new", "next", "now", "one", "open",
+    "peak", "power", "price", "real", "safe", "share", "shares", "snap", "south", "star", "stock",
+    "sun", "target", "today", "trade", "trust", "true", "united", "unity", "value", "week", "well",
+    "what", "why", "world", "year"
+}
+
+def tokenize(text):
+    """Lowercase word tokens used for both names and queries."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+def derive_short_name(name):
+    """Strip legal suffixes and a leading 'The' from a listed company name."""
+    tokens = tokenize(name)
+    while tokens and tokens[0] == "the":
+        tokens = tokens[1:]
+    while tokens and tokens[-1] in NAME_SUFFIXES:
+        tokens = tokens[:-1]
+    return tokens
+
+class SymbolIndex:
+    """
+    Company-name index over the listed universe.
+
+    Names and aliases are compiled into a token-level Aho-Corasick automaton,
+    so every name mentioned in a query is found in a single pass over its
+    words, independent of the number of indexed companies.
+    """
+
+    def __init__(self):
+        self.names = {}           # symbol -> listed company name
+        self._aliases = {}        # alias tuple -> symbol
+        self._goto = [{}]         # node -> {token: node}
+        self._fail = [0]
+        self._output = [[]]       # node -> [alias tuple]
+        self._compiled = True
+
+    def add(self, symbol, name, aliases=()):
+        """
+        Add a listed company and its aliases.
+
+        Args:
+            symbol (str): Ticker symbol
+            name (str): Listed company name
+            aliases (iterable): Additional names the company is known by
+        """
+        symbol = symbol.upper()
+        if symbol not in self.names:
+            self.names[symbol] = name
+
+        candidates = [tuple(tokenize(alias)) for alias in aliases]
+        candidates.append(tuple(tokenize(name)))
+        short_name = tuple(derive_short_name(name))
+        if len(short_name) > 1 or (short_name and short_name[0] not in AMBIGUOUS_NAMES and len(short_name[0]) > 2):
+            candidates.append(short_name)
+
+        for alias in candidates:
+            # First listing wins, so curated aliases take precedence over bulk listings
+            if alias and alias not in self._aliases:
+                self._aliases[alias] = symbol
+                self._insert(alias)
+
+    def _insert(self, alias):
+        node = 0
+        for token in alias:
+            next_node = self._goto[node].get(token)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[node][token] = next_node
+            node = next_node
+        self._output[node].append(alias)
+        self._compiled = False
+
+    def _compile(self):
+        """Build failure links breadth-first (standard Aho-Corasick construction)."""
+        queue = deque()
+        for node in self._goto[0].values():
+            self._fail[node] = 0
+            queue.append(node)
+
+        while queue:
+            node = queue.popleft()
+            for token, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(token, 0)
+                self._fail[child] = target if target != child else 0
+        self._compiled = True
+
+    def find_all(self, text):
+        """
+        Find every indexed name or alias mentioned in the text.
+
+        Args:
+            text (str): Free text such as a user query
+
+        Returns:
+            list: (start_token, end_token, symbol, alias) tuples in order of their end position
+        """
+        if not self._compiled:
+            self._compile()
+
+        matches = []
+        node = 0
+        for position, token in enumerate(tokenize(text)):
+            while node and token not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(token, 0)
+
+            # Walk the failure chain to collect names ending at this token
+            match_node = node
+            while match_node:
+                for alias in self._output[match_node]:
+                    matches.append((position - len(alias) + 1, position + 1, self._aliases[alias], " ".join(alias)))
+                match_node = self._fail[match_node]
+        return matches
+
+    def best_match(self, text):
+        """
+        Return the most specific name mentioned in the text.
+
+        Longer names win over names they contain ("american airlines" over
+        "american"), then the earliest mention.
+
+        Returns:
+            dict: symbol, company_name and matched alias, or None
+        """
+        matches = self.find_all(text)
+        if not matches:
+            return None
+        start, end, symbol, alias = min(matches, key=lambda m: (-(m[1] - m[0]), -len(m[3]), m[0]))
+        return {"symbol": symbol, "company_name": self.names[symbol], "alias": alias}
+
+    def lookup(self, name):
+        """Return the symbol for an exact company name or alias, or None."""
+        return self._aliases.get(tuple(tokenize(name)))
+
+    def company_name(self, symbol):
+        return self.names.get(symbol.upper())
+
+    def __contains__(self, symbol):
+        return symbol.upper() in self.names
+
+    def __len__(self):
+        return len(self.names)
+
+    def load_csv(self, path):
+        """
+        Load a listing file with symbol, name and optional '|'-separated aliases columns.
+
+        Returns:
+            int: Number of rows loaded
+        """
+        count = 0
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if not row.get("symbol") or not row.get("name"):
+                    continue
+                aliases = [a for a in (row.get("aliases") or "").split("|") if a]
+                self.add(row["symbol"], row["name"], aliases)
+                count += 1
+        return count
+
+@lru_cache(maxsize=1)
+def get_symbol_index():
+    """
+    Return the process-wide symbol index.
+
+    The curated bundled listing is loaded first so its aliases take precedence,
+    then the full listing at SYMBOL_LISTING_PATH if one has been downloaded.
+    """
+    index = SymbolIndex()
+    for path in (BUNDLED_LISTING_PATH, SYMBOL_LISTING_PATH):
+        if os.path.exists(path):
+            count = index.load_csv(path)
+            logger.info(f"Loaded {count} listings from {path}")
+    index._compile()
+    return index
+
+def refresh_listing(api_key, path=SYMBOL_LISTING_PATH):
+    """
+    Download the US-listed stock universe from FMP into a listing file.
+
+    Args:
+        api_key (str): FMP API key
+        path (str): Destination CSV path
+
+    Returns:
+        int: Number of listings written
+    """
+    from api import http_client
+
+    response = http_client.get(f"https://financialmodelingprep.com/api/v3/stock/list?apikey={api_key}", timeout=60)
+    response.raise_for_status()
+
+    rows = [
+        item for item in response.json()
+        if item.get("symbol") and item.get("name")
+        and item.get("type") in ("stock", "etf")
+        and item.get("exchangeShortName") in ("NASDAQ", "NYSE", "AMEX")
+    ]
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["symbol", "name", "aliases"])
+        for item in rows:
+            writer.writerow([item["symbol"], item["name"], ""])
+    os.replace(tmp_path, path)
+    get_symbol_index.cache_clear()
+    return len(rows)
+
+if __name__ == "__main__":
+    import sys
+
+    if "--refresh" in sys.argv:
+        written = refresh_listing(os.getenv("FMP_API_KEY"))
+        print(f"Wrote {written} listings to {SYMBOL_LISTING_PATH}")
+    else:
+        for query in sys.argv[1:]:
+            print(query, "->", get_symbol_index().best_match(query))